@@ -0,0 +1,91 @@
+"""
+Benchmark: legacy JSON cache files vs the binary .wlc format
+
+Reads every *.json file of the cache folder (read-only; files are written
+to a temporary folder) and compares, for the whole set:
+
+    - bytes on disk
+    - write time: json.dump(indent=2) vs encode_cache + atomic rename
+    - read time:  json.load vs decode_cache
+
+Usage (from the backend folder):
+    python benchmarks/cache_format.py [--cache-dir cache]
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cache_format import decode_cache, read_cache_file, write_cache_file
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cache-dir", default=str(Path(__file__).resolve().parent.parent / "cache"))
+    args = parser.parse_args()
+
+    sources = sorted(Path(args.cache_dir).glob("*.json"))
+    if not sources:
+        print(f"No *.json cache files in {args.cache_dir}")
+        return
+
+    payloads = {}
+    for path in sources:
+        with open(path, "r", encoding="utf-8") as f:
+            payloads[path.stem] = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir = Path(tmp) / "json"
+        wlc_dir = Path(tmp) / "wlc"
+        json_dir.mkdir()
+        wlc_dir.mkdir()
+
+        def write_json():
+            for key, payload in payloads.items():
+                with open(json_dir / f"{key}.json", "w", encoding="utf-8") as f:
+                    json.dump(payload, f, ensure_ascii=False, indent=2)
+
+        def write_wlc():
+            for key, payload in payloads.items():
+                write_cache_file(wlc_dir / key, payload)
+
+        def read_json():
+            for key in payloads:
+                with open(json_dir / f"{key}.json", "r", encoding="utf-8") as f:
+                    json.load(f)
+
+        def read_wlc():
+            for key in payloads:
+                read_cache_file(wlc_dir / key)
+
+        results = {
+            "json": (timed(write_json), timed(read_json), sum(p.stat().st_size for p in json_dir.iterdir())),
+            "wlc": (timed(write_wlc), timed(read_wlc), sum(p.stat().st_size for p in wlc_dir.iterdir()))
+        }
+
+        # Comprobación: el formato binario devuelve los mismos datos
+        for key, payload in payloads.items():
+            assert decode_cache((wlc_dir / f"{key}.wlc").read_bytes()) == payload, key
+
+    total_mb = results["json"][2] / 1e6
+    print(f"{len(payloads)} cache files ({total_mb:.1f} MB as indented JSON)")
+    print(f"{'format':>6} | {'disk MB':>8} | {'write s':>8} | {'write MB/s':>10} | {'read s':>7} | {'read MB/s':>9}")
+    for name, (write_s, read_s, size) in results.items():
+        print(f"{name:>6} | {size / 1e6:>8.2f} | {write_s:>8.3f} | {total_mb / write_s:>10.1f} | "
+              f"{read_s:>7.3f} | {total_mb / read_s:>9.1f}")
+    print("(MB/s relative to the indented JSON size, i.e. logical cache throughput)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: per-candle decoding loop vs bulk candle_codec decoding
+
+Compares the original /api/historical post-processing loop (five float()
+calls, a timezone-aware datetime and strftime per candle, in_progress per
+row) with decode_klines + candles_to_records, and checks both produce the
+same output.
+
+Usage (from the backend folder):
+    python benchmarks/candle_decode.py --sizes 1000 10000 100000
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from candle_codec import decode_klines, candles_to_records
+
+COLOMBIA_TZ = timezone(timedelta(hours=-5))
+INTERVAL_MINUTES = 15
+
+
+def make_rows(n, now_ms):
+    step = INTERVAL_MINUTES * 60 * 1000
+    start = now_ms - (n - 1) * step - step // 2  # La última vela sigue abierta
+    price = 50000.0
+    rows = []
+    for i in range(n):
+        o = price
+        price += random.uniform(-50, 50)
+        rows.append([
+            str(start + i * step), f"{o:.2f}", f"{max(o, price) + 10:.2f}",
+            f"{min(o, price) - 10:.2f}", f"{price:.2f}", f"{random.uniform(1, 500):.3f}", "0"
+        ])
+    return rows
+
+
+def old_loop(all_candles, current_time_utc):
+    """Copia del bucle original de get_historical"""
+    candles = []
+    for c in all_candles:
+        ts_ms = int(c[0])
+        open_ = float(c[1])
+        high = float(c[2])
+        low = float(c[3])
+        close = float(c[4])
+        volume = float(c[5])
+
+        ts_seconds = ts_ms / 1000
+        dt_utc = datetime.fromtimestamp(ts_seconds, tz=timezone.utc)
+        dt_colombia = dt_utc.astimezone(COLOMBIA_TZ)
+
+        time_diff_minutes = (current_time_utc - ts_ms) / (1000 * 60)
+        is_in_progress = time_diff_minutes < INTERVAL_MINUTES
+
+        candles.append({
+            "timestamp": ts_ms,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+            "in_progress": is_in_progress,
+            "datetime_colombia": dt_colombia.strftime("%Y-%m-%d %H:%M:%S")
+        })
+    return candles
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    now_ms = int(time.time() * 1000)
+    print(f"{'candles':>8} | {'old ms':>8} | {'new ms':>8} | {'new, no local time':>18} | {'speedup':>7}")
+    for n in args.sizes:
+        rows = make_rows(n, now_ms)
+
+        assert old_loop(rows, now_ms) == candles_to_records(decode_klines(rows), INTERVAL_MINUTES, now_ms)
+
+        old_ms = best_of(lambda: old_loop(rows, now_ms), args.repeat)
+        new_ms = best_of(lambda: candles_to_records(decode_klines(rows), INTERVAL_MINUTES, now_ms), args.repeat)
+        bare_ms = best_of(
+            lambda: candles_to_records(decode_klines(rows), INTERVAL_MINUTES, now_ms, local_time=False),
+            args.repeat
+        )
+        print(f"{n:>8} | {old_ms:>8.1f} | {new_ms:>8.1f} | {bare_ms:>18.1f} | {old_ms / new_ms:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Report: what dropping the volume delta cache family saves on a cache folder
+
+Volume delta / CVD are now computed on demand from the shared candle series
+(candle_indicators.py) instead of being stored per symbol/interval. For the
+*_volumedelta files of an existing cache folder this reports:
+
+    disk     bytes of the legacy JSON files, and of the same points as rows
+             of an SQLite table laid out like the store's former indicators
+             table; both are freed, the candles are stored anyway
+    memory   peak traced memory of serving one window from the legacy file
+             vs computing it from candle records, and what the memo holds
+             once every window is memoised (bounded by CANDLE_MEMO_MAX_MB)
+    time     recomputing every window, and serving them from the memo
+
+It also checks that recomputing each window from its own OHLCV gives the
+stored volumeDelta / cvd values bit-for-bit.
+
+Usage (from the backend folder):
+    python benchmarks/candle_indicators.py --cache-dir cache
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from candle_indicators import CandleIndicators, POINT_BYTES, volume_delta_series
+from cvd_engine import candle_columns
+
+MB = 1024 * 1024
+
+# Tabla que tenía el SQLite store para los indicadores antes de calcularlos al vuelo
+LEGACY_TABLE = """
+CREATE TABLE indicators (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    indicator TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (symbol, interval, indicator, ts)
+) WITHOUT ROWID
+"""
+
+
+def legacy_response(path):
+    """Lo que hacía el endpoint con un archivo *_volumedelta.json en cache"""
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    return [
+        {"timestamp": k["timestamp"], "volumeDelta": k["volumeDelta"], "cvd": k["cvd"], "volume": k["volume"]}
+        for k in payload["klines"]
+    ]
+
+
+def candle_records(klines):
+    """Registros de /api/historical que llegan a candle_indicators"""
+    return [
+        {"timestamp": k["timestamp"], "open": k["open"], "high": k["high"], "low": k["low"],
+         "close": k["close"], "volume": k["volume"], "in_progress": False}
+        for k in klines
+    ]
+
+
+def legacy_sqlite_bytes(path, series):
+    """Bytes the volume delta points took as rows of the former indicators table"""
+    conn = sqlite3.connect(str(path), isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(LEGACY_TABLE)
+    conn.execute("BEGIN")
+    for _, payload in series:
+        conn.executemany(
+            "INSERT OR REPLACE INTO indicators (symbol, interval, indicator, ts, data) VALUES (?, ?, ?, ?, ?)",
+            [
+                (payload["symbol"], payload["timeframe"], "volumedelta", int(k["timestamp"]),
+                 json.dumps({"volume": k["volume"], "volumeDelta": k["volumeDelta"], "cvd": k["cvd"]},
+                            separators=(',', ':')))
+                for k in payload["klines"]
+            ]
+        )
+    conn.execute("COMMIT")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    conn.close()
+    return page_count * page_size
+
+
+def traced(fn):
+    """(bytes still held by fn's result, peak bytes) while running fn"""
+    tracemalloc.start()
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cache-dir", default=str(Path(__file__).resolve().parent.parent / "cache"))
+    args = parser.parse_args()
+
+    paths = sorted(Path(args.cache_dir).glob("*_volumedelta.json"))
+    if not paths:
+        print(f"No *_volumedelta.json files in {args.cache_dir}")
+        return
+
+    series = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        series.append((path, payload))
+
+    file_bytes = sum(path.stat().st_size for path, _ in series)
+    points = sum(len(payload["klines"]) for _, payload in series)
+
+    with tempfile.TemporaryDirectory() as folder:
+        sqlite_bytes = legacy_sqlite_bytes(Path(folder) / "report.sqlite3", series)
+
+    records = [(payload, candle_records(payload["klines"])) for _, payload in series]
+
+    identical = sum(
+        json.dumps(volume_delta_series(candle_columns(candles))) == json.dumps(legacy_response(path))
+        for (path, _), (_, candles) in zip(series, records)
+    )
+
+    largest = max(range(len(series)), key=lambda i: len(series[i][1]["klines"]))
+    legacy_peak = traced(lambda: legacy_response(series[largest][0]))[1]
+    compute_peak = traced(lambda: volume_delta_series(candle_columns(records[largest][1])))[1]
+
+    # Presupuesto sin límite: aquí se mide el cálculo y el acierto, no el desalojo
+    indicators = CandleIndicators(max_bytes=2 ** 40)
+    t0 = time.perf_counter()
+    for payload, candles in records:
+        indicators.get(payload["symbol"], payload["timeframe"], "volumedelta", candles)
+    compute_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    for payload, candles in records:
+        indicators.get(payload["symbol"], payload["timeframe"], "volumedelta", candles)
+    hit_ms = (time.perf_counter() - t0) * 1000
+
+    def memoise_all():
+        memo = CandleIndicators(max_bytes=2 ** 40)
+        for p, c in records:
+            memo.get(p["symbol"], p["timeframe"], "volumedelta", c)
+        return memo
+
+    memo_held = traced(memoise_all)[0]
+
+    print(f"cache folder: {args.cache_dir}")
+    print(f"  volume delta series: {len(series)} ({points} points), recomputed bit-for-bit: {identical}/{len(series)}")
+    print("disk freed")
+    print(f"  legacy *_volumedelta.json files:   {file_bytes / MB:8.2f} MB")
+    print(f"  same points in the SQLite store:   {sqlite_bytes / MB:8.2f} MB")
+    print(f"memory (largest window, {len(series[largest][1]['klines'])} candles, peak traced)")
+    print(f"  served from the legacy file:       {legacy_peak / MB:8.2f} MB")
+    print(f"  computed from candle records:      {compute_peak / MB:8.2f} MB")
+    print("memo, every window memoised")
+    print(f"  held (traced):                     {memo_held / MB:8.2f} MB")
+    print(f"  counted against CANDLE_MEMO_MAX_MB:{indicators.memo.bytes / MB:8.2f} MB ({POINT_BYTES} bytes/point)")
+    print(f"  measured per point:                {memo_held / points:8.0f} bytes")
+    print("time")
+    print(f"  compute all windows:               {compute_ms:8.1f} ms")
+    print(f"  serve all from the memo:           {hit_ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark: per-candle volume delta loop vs the cvd_engine columns
+
+Compares the original /api/volume-delta post-processing (calculate_volume_delta
+building a dict per candle, then a second dict per candle for the response)
+with candle_columns + compute_volume_delta + volume_delta_points, and the
+incremental path that appends one new candle to an existing series by
+carrying its last CVD. The compute step alone is timed on list columns (the
+loop), on NumPy array columns, and on lists converted to arrays. Outputs are
+checked to be bit-for-bit identical (compared through their JSON text, so
+-0.0 and 0.0 differ).
+
+Usage (from the backend folder):
+    python benchmarks/cvd_engine.py --sizes 10000 1000000
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cvd_engine
+from cvd_engine import candle_columns, compute_volume_delta, volume_delta_points
+
+
+def make_candles(n):
+    step = 15 * 60 * 1000
+    start = 1_700_000_000_000
+    price = 50000.0
+    candles = []
+    for i in range(n):
+        o = price
+        price = round(price + random.uniform(-50, 50), 2)
+        # Algunas velas planas y de volumen cero: casos de >= y de -0.0
+        close = o if i % 97 == 0 else price
+        volume = 0.0 if i % 89 == 0 else round(random.uniform(1, 500), 3)
+        candles.append({
+            "timestamp": start + i * step, "open": o, "high": max(o, close) + 10, "low": min(o, close) - 10,
+            "close": close, "volume": volume, "in_progress": False
+        })
+    return candles
+
+
+def calculate_volume_delta(candles_data):
+    """Copia de la función original de main.py"""
+    klines = []
+    cvd = 0
+
+    for candle in candles_data:
+        open_price = candle['open']
+        close_price = candle['close']
+        volume = candle['volume']
+
+        if close_price >= open_price:
+            volume_delta = volume
+        else:
+            volume_delta = -volume
+
+        cvd += volume_delta
+
+        kline = {
+            'timestamp': candle['timestamp'],
+            'open': open_price,
+            'high': candle['high'],
+            'low': candle['low'],
+            'close': close_price,
+            'volume': volume,
+            'volumeDelta': volume_delta,
+            'cvd': cvd
+        }
+        klines.append(kline)
+
+    return klines
+
+
+def old_path(candles):
+    """calculate_volume_delta + la copia a processed_data de get_volume_delta"""
+    processed_data = []
+    for candle in calculate_volume_delta(candles):
+        processed_data.append({
+            "timestamp": candle["timestamp"],
+            "volumeDelta": candle["volumeDelta"],
+            "cvd": candle["cvd"],
+            "volume": candle["volume"]
+        })
+    return processed_data
+
+
+def new_path(candles):
+    columns = candle_columns(candles)
+    deltas, cvds = compute_volume_delta(columns["open"], columns["close"], columns["volume"])
+    return volume_delta_points(columns["timestamp"], columns["volume"], deltas, cvds)
+
+
+def append_path(candles, stored_cvd):
+    """Última vela recalculada sobre una serie guardada"""
+    last = candles[-1:]
+    deltas, cvds = compute_volume_delta(
+        [c["open"] for c in last], [c["close"] for c in last], [c["volume"] for c in last], stored_cvd
+    )
+    return volume_delta_points([c["timestamp"] for c in last], [c["volume"] for c in last], deltas, cvds)
+
+
+def array_compute(columns):
+    return compute_volume_delta(columns["open"], columns["close"], columns["volume"])
+
+
+def converted_compute(columns):
+    """Listas convertidas a arrays en cada llamada"""
+    return compute_volume_delta(*(cvd_engine.np.asarray(columns[name]) for name in ("open", "close", "volume")))
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"NumPy: {cvd_engine.np.__version__ if cvd_engine.np is not None else 'not installed (pure Python)'}")
+    print(f"{'candles':>9} | {'old ms':>8} | {'new ms':>8} | {'speedup':>7} | {'append 1 ms':>11} | "
+          f"{'compute: lists':>14} | {'arrays':>7} | {'lists->arrays':>13}")
+    for n in args.sizes:
+        candles = make_candles(n)
+
+        expected = old_path(candles)
+        assert json.dumps(new_path(candles)) == json.dumps(expected)
+        # Incremental: la serie hasta n-1 más la última vela con el CVD arrastrado
+        assert json.dumps(append_path(candles, expected[-2]["cvd"])) == json.dumps(expected[-1:])
+        half = n // 2
+        head, tail = new_path(candles[:half]), candles[half:]
+        columns = candle_columns(tail)
+        deltas, cvds = compute_volume_delta(columns["open"], columns["close"], columns["volume"], head[-1]["cvd"])
+        assert json.dumps(head + volume_delta_points(columns["timestamp"], columns["volume"], deltas, cvds)) == json.dumps(expected)
+
+        columns = candle_columns(candles)
+        old_ms = best_of(lambda: old_path(candles), args.repeat)
+        new_ms = best_of(lambda: new_path(candles), args.repeat)
+        append_ms = best_of(lambda: append_path(candles, expected[-2]["cvd"]), args.repeat)
+        loop_ms = best_of(lambda: array_compute(columns), args.repeat)
+        line = f"{n:>9} | {old_ms:>8.1f} | {new_ms:>8.1f} | {old_ms / new_ms:>6.1f}x | {append_ms:>11.3f} | {loop_ms:>14.1f}"
+
+        if cvd_engine.np is not None:
+            arrays = {name: cvd_engine.np.asarray(values) for name, values in columns.items()}
+            assert json.dumps(array_compute(arrays)) == json.dumps(array_compute(columns))
+            array_ms = best_of(lambda: array_compute(arrays), args.repeat)
+            converted_ms = best_of(lambda: converted_compute(columns), args.repeat)
+            line += f" | {array_ms:>7.1f} | {converted_ms:>13.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
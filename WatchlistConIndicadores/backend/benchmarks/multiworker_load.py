@@ -0,0 +1,208 @@
+"""
+Multi-worker load test for refresh leases
+
+Runs `uvicorn main:app --workers N` against a local fake Bybit that counts
+every upstream request, then fires bursts of identical concurrent requests
+(historical candles and open interest) for a handful of symbols. Without
+cross-worker coordination each worker downloads the same data once; with
+REFRESH_LEASES the first worker to take the lease downloads it and the others
+read it from the shared store.
+
+Each backend is measured with leases on and off:
+    file     cache files + shared SQLite store in a temp folder
+    sqlite   cache entries in the SQLite store too
+    redis    cache entries in the RESP stand-in (benchmarks/resp_standin.py)
+
+Usage (from the backend folder):
+    python benchmarks/multiworker_load.py --workers 4 --symbols 5 --burst 32
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR / "benchmarks"))
+
+import resp_standin
+
+OI_STEP_MINUTES = {"5min": 5, "15min": 15, "30min": 30, "1h": 60, "4h": 240, "1d": 1440}
+
+
+class FakeBybit(BaseHTTPRequestHandler):
+    """Deterministic kline / open-interest pages with latency; counts requests per (path, symbol)"""
+
+    protocol_version = "HTTP/1.1"
+    hits = Counter()
+    latency = 0.05
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path in ("/v5/market/kline", "/v5/market/open-interest"):
+            FakeBybit.hits[(url.path.rsplit("/", 1)[1], query.get("symbol"))] += 1
+            time.sleep(self.latency)
+
+        if url.path == "/v5/market/kline":
+            interval = query["interval"]
+            step = {"D": 1440, "W": 10080}.get(interval, None) or int(interval)
+            step *= 60000
+            start, limit = int(query["start"]), int(query.get("limit", 200))
+            end = min(int(query.get("end", 10 ** 14)), int(time.time() * 1000))
+            rows = []
+            ts = (start + step - 1) // step * step
+            while ts <= end and len(rows) < limit:
+                price = 100 + (ts // step) % 17
+                rows.append([str(ts), str(price), str(price + 2), str(price - 2),
+                             str(price + (ts // step) % 3 - 1), str(10 + (ts // step) % 7), "0"])
+                ts += step
+            rows.reverse()
+            body = {"retCode": 0, "result": {"list": rows}}
+        elif url.path == "/v5/market/open-interest":
+            step = OI_STEP_MINUTES[query["intervalTime"]] * 60000
+            end = int(query["endTime"]) // step * step
+            start = int(query.get("startTime", 0))
+            rows = [{"timestamp": str(end - i * step), "openInterest": str(1000 + (end - i * step) // step % 50)}
+                    for i in range(int(query["limit"])) if end - i * step >= start]
+            body = {"retCode": 0, "result": {"list": rows, "nextPageCursor": ""}}
+        else:
+            body = {"retCode": 0, "result": {"timeSecond": str(int(time.time()))}}
+
+        raw = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_standin() -> int:
+    """RESP stand-in in a background thread; returns its port"""
+    port = free_port()
+    ready = threading.Event()
+
+    def run():
+        async def serve():
+            server, _ = await resp_standin.serve(port)
+            ready.set()
+            async with server:
+                await server.serve_forever()
+        asyncio.run(serve())
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return port
+
+
+async def wait_ready(client: httpx.AsyncClient, base: str, seconds: float = 30):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{base}/api/status", timeout=2)).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not start")
+
+
+async def burst(client: httpx.AsyncClient, base: str, args) -> float:
+    paths = []
+    for i in range(args.symbols):
+        symbol = f"LOAD{i}USDT"
+        paths += [f"/api/historical/{symbol}?interval={args.interval}&days={args.days}"] * args.burst
+        paths += [f"/api/open-interest/{symbol}?interval={args.interval}&days={args.days}"] * args.burst
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(client.get(base + p, timeout=120) for p in paths))
+    elapsed = time.perf_counter() - started
+    failed = [r for r in responses if r.status_code != 200 or r.json().get("success") is False]
+    if failed:
+        print(f"    {len(failed)} failed responses, e.g. {failed[0].text[:200]}")
+    return elapsed
+
+
+async def run_case(backend: str, leases: bool, upstream_port: int, args) -> dict:
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="watchlist-load-")
+    env = dict(
+        os.environ,
+        BYBIT_BASE_URL=f"http://127.0.0.1:{upstream_port}",
+        BYBIT_WS_ENABLED="0",
+        SQLITE_STORE_PATH=str(Path(workdir) / "watchlist.db"),
+        CACHE_BACKEND=backend,
+        REFRESH_LEASES="1" if leases else "0",
+    )
+    if backend == "redis":
+        env["REDIS_URL"] = f"redis://127.0.0.1:{start_standin()}/0"
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(BACKEND_DIR),
+         "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        limits = httpx.Limits(max_connections=args.symbols * args.burst * 2)
+        async with httpx.AsyncClient(limits=limits) as client:
+            await wait_ready(client, base)
+            FakeBybit.hits.clear()
+            elapsed = await burst(client, base, args)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    kline = [FakeBybit.hits[("kline", f"LOAD{i}USDT")] for i in range(args.symbols)]
+    oi = [FakeBybit.hits[("open-interest", f"LOAD{i}USDT")] for i in range(args.symbols)]
+    return {"kline": sum(kline) / args.symbols, "oi": sum(oi) / args.symbols, "seconds": elapsed}
+
+
+async def main(args):
+    upstream_port = free_port()
+    FakeBybit.latency = args.latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", upstream_port), FakeBybit)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"{args.workers} workers, {args.symbols} symbols x {args.burst} identical requests per endpoint, "
+          f"interval {args.interval}, {args.days} days, upstream latency {args.latency_ms} ms")
+    print(f"{'backend':<8} {'leases':<7} {'kline req/symbol':>17} {'OI req/symbol':>14} {'burst s':>8}")
+    for backend in args.backends.split(","):
+        for leases in (False, True):
+            result = await run_case(backend, leases, upstream_port, args)
+            print(f"{backend:<8} {'on' if leases else 'off':<7} {result['kline']:>17.1f} "
+                  f"{result['oi']:>14.1f} {result['seconds']:>8.2f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--symbols", type=int, default=5)
+    parser.add_argument("--burst", type=int, default=32)
+    parser.add_argument("--interval", default="15")
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--backends", default="file,sqlite,redis")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,120 @@
+"""
+Benchmark: per-row Decimal resampling loop vs the columnar resampler
+
+Builds a synthetic series of base klines (Bybit REST rows, strings) and
+resamples it to a coarser minute timeframe with the original per-row loop
+(a Decimal per row for volume and turnover) and with resampler.resample_klines,
+with NumPy and with the builtin fallback. Outputs are checked to be
+identical row for row.
+
+Usage (from the backend folder):
+    python benchmarks/resampler.py --rows 1000 100000 --base 5 --target 60
+"""
+
+import sys
+import time
+import random
+import argparse
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import resampler
+from resampler import resample_klines
+
+
+def make_rows(n, base_minutes):
+    step = base_minutes * 60 * 1000
+    # Empieza a mitad de un bucket para probar el corte del inicio
+    start = 1_700_000_000_000 // step * step + step
+    price = 50000.0
+    rows = []
+    for i in range(n):
+        o = price
+        price = round(price + random.uniform(-50, 50), 1)
+        high = round(max(o, price) + random.choice([0, 0, 5.5, 12.3]), 1)
+        low = round(min(o, price) - random.choice([0, 0, 4.2, 9.9]), 1)
+        volume = random.choice(["0", f"{random.uniform(0, 900):.3f}", f"{random.randint(1, 500)}"])
+        turnover = f"{random.uniform(0, 5e7):.4f}"
+        rows.append([str(start + i * step), str(o), str(high), str(low), str(price), volume, turnover])
+    return rows
+
+
+def resample_loop(rows, base_minutes, target_minutes, open_bucket_start=None):
+    """Copia del resample_klines original (un Decimal por fila)"""
+    step_ms = target_minutes * 60 * 1000
+    per_bucket = target_minutes // base_minutes
+    result = []
+
+    bucket_start = None
+    o = h = l = c = None
+    high_value = low_value = 0.0
+    volume = turnover = Decimal(0)
+    count = 0
+
+    def flush():
+        if bucket_start is not None and (count == per_bucket or bucket_start == open_bucket_start):
+            result.append([str(bucket_start), o, h, l, c, str(volume), str(turnover)])
+
+    for row in rows:
+        start = int(row[0]) // step_ms * step_ms
+        if start != bucket_start:
+            flush()
+            bucket_start = start
+            o, h, l = row[1], row[2], row[3]
+            high_value, low_value = float(h), float(l)
+            volume = turnover = Decimal(0)
+            count = 0
+
+        if float(row[2]) > high_value:
+            h, high_value = row[2], float(row[2])
+        if float(row[3]) < low_value:
+            l, low_value = row[3], float(row[3])
+        c = row[4]
+        volume += Decimal(row[5])
+        turnover += Decimal(row[6]) if len(row) > 6 else Decimal(0)
+        count += 1
+
+    flush()
+    return result
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--base", type=int, default=5)
+    parser.add_argument("--target", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    numpy_module = resampler.np
+    print(f"{args.base}m -> {args.target}m, best of {args.repeat}")
+    print(f"{'rows':>8} | {'loop ms':>8} | {'numpy ms':>8} | {'builtin ms':>10} | {'speedup':>7} | identical")
+    for n in args.rows:
+        rows = make_rows(n, args.base)
+        open_bucket = int(rows[-1][0]) // (args.target * 60000) * (args.target * 60000)
+        loop_ms, expected = timed(lambda: resample_loop(rows, args.base, args.target, open_bucket), args.repeat)
+
+        resampler.np = numpy_module
+        numpy_ms, with_numpy = timed(lambda: resample_klines(rows, args.base, args.target, open_bucket), args.repeat)
+        resampler.np = None
+        builtin_ms, builtin = timed(lambda: resample_klines(rows, args.base, args.target, open_bucket), args.repeat)
+        resampler.np = numpy_module
+
+        fastest = min(numpy_ms if numpy_module is not None else float("inf"), builtin_ms)
+        identical = with_numpy == expected and builtin == expected
+        print(f"{n:>8} | {loop_ms:>8.1f} | {numpy_ms:>8.1f} | {builtin_ms:>10.1f} | {loop_ms / fastest:>6.1f}x | {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+In-memory Redis-protocol stand-in
+
+Just enough of the Redis protocol (RESP) to exercise the redis cache backend
+and its leases without a Redis install: PING, GET, SET (EX/PX/NX/XX), DEL,
+EXISTS, HGET, HSET, HGETALL, SELECT, AUTH, DBSIZE and FLUSHALL, with lazy
+key expiry. Every database index shares one keyspace.
+
+Usage (from the backend folder):
+    python benchmarks/resp_standin.py --port 6390
+    CACHE_BACKEND=redis REDIS_URL=redis://127.0.0.1:6390/0 uvicorn main:app --workers 4
+"""
+
+import time
+import asyncio
+import argparse
+
+
+class RespStandin:
+    def __init__(self):
+        self.data = {}  # key -> (value, expires_at or None)
+        self.commands = 0
+
+    def _alive(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def execute(self, args):
+        self.commands += 1
+        cmd = args[0].upper()
+        if cmd == b"PING":
+            return "+PONG"
+        if cmd in (b"SELECT", b"AUTH"):
+            return "+OK"
+        if cmd == b"GET":
+            entry = self._alive(args[1])
+            return None if entry is None else entry[0]
+        if cmd == b"SET":
+            key, value = args[1], args[2]
+            expires_at = None
+            nx = xx = False
+            options = [a.upper() for a in args[3:]]
+            i = 0
+            while i < len(options):
+                if options[i] == b"NX":
+                    nx = True
+                elif options[i] == b"XX":
+                    xx = True
+                elif options[i] in (b"EX", b"PX"):
+                    amount = float(args[3 + i + 1])
+                    expires_at = time.monotonic() + (amount if options[i] == b"EX" else amount / 1000)
+                    i += 1
+                i += 1
+            exists = self._alive(key) is not None
+            if (nx and exists) or (xx and not exists):
+                return None
+            self.data[key] = (value, expires_at)
+            return "+OK"
+        if cmd == b"DEL":
+            return sum(1 for key in args[1:] if self._alive(key) is not None and self.data.pop(key))
+        if cmd == b"EXISTS":
+            return sum(1 for key in args[1:] if self._alive(key) is not None)
+        if cmd == b"HGET":
+            entry = self._alive(args[1])
+            return None if entry is None else entry[0].get(args[2])
+        if cmd == b"HSET":
+            entry = self._alive(args[1])
+            fields = dict(entry[0]) if entry else {}
+            added = 0
+            for i in range(2, len(args) - 1, 2):
+                added += args[i] not in fields
+                fields[args[i]] = args[i + 1]
+            self.data[args[1]] = (fields, entry[1] if entry else None)
+            return added
+        if cmd == b"HGETALL":
+            entry = self._alive(args[1])
+            return [item for pair in (entry[0].items() if entry else ()) for item in pair]
+        if cmd == b"DBSIZE":
+            return sum(1 for key in list(self.data) if self._alive(key) is not None)
+        if cmd == b"FLUSHALL":
+            self.data.clear()
+            return "+OK"
+        return "-ERR unknown command"
+
+    @staticmethod
+    def encode(reply):
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, str):
+            return reply.encode() + b"\r\n"
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(RespStandin.encode(item) for item in reply)
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                count = int(line[1:-2])
+                args = []
+                for _ in range(count):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(self.encode(self.execute(args)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(port: int, host: str = "127.0.0.1"):
+    """Starts the stand-in; returns (server, RespStandin)"""
+    standin = RespStandin()
+    server = await asyncio.start_server(standin.handle, host, port)
+    return server, standin
+
+
+async def main(args):
+    server, _ = await serve(args.port, args.host)
+    print(f"RESP stand-in on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
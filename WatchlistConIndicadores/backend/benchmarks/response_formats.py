@@ -0,0 +1,92 @@
+"""
+Benchmark: payload size and encode time of ?format=json|columnar|binary
+
+Builds synthetic /api/historical, /api/volume-delta and /api/open-interest
+results and reports, per 1000 points, the bytes on the wire (raw and gzip)
+and the time to serialise them the way FastAPI would (json.dumps of the
+dict, or the packed binary body).
+
+Usage (from the backend folder):
+    python benchmarks/response_formats.py --points 10000
+"""
+
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from candle_codec import decode_klines, candles_to_records
+from response_format import FORMATS, format_response, decode_binary
+
+
+def make_results(n):
+    now_ms = int(time.time() * 1000)
+    step = 15 * 60 * 1000
+    start = now_ms - n * step
+    price = 50000.0
+    rows = []
+    for i in range(n):
+        o = price
+        price += random.uniform(-50, 50)
+        rows.append([str(start + i * step), f"{o:.2f}", f"{max(o, price) + 10:.2f}",
+                     f"{min(o, price) - 10:.2f}", f"{price:.2f}", f"{random.uniform(1, 500):.3f}", "0"])
+    candles = candles_to_records(decode_klines(rows), 15, now_ms)
+
+    cvd = 0.0
+    vd = []
+    for c in candles:
+        delta = c["volume"] if c["close"] >= c["open"] else -c["volume"]
+        cvd += delta
+        vd.append({"timestamp": c["timestamp"], "volumeDelta": delta, "cvd": cvd, "volume": c["volume"]})
+
+    oi = [{"timestamp": c["timestamp"], "openInterest": random.uniform(1e5, 2e5), "datetime_colombia": c["datetime_colombia"]}
+          for c in candles]
+
+    envelope = {"symbol": "BTCUSDT", "interval": "15", "success": True}
+    return {
+        "historical": dict(envelope, data=candles),
+        "volume-delta": dict(envelope, indicator="volumeDelta", data=vd),
+        "open-interest": dict(envelope, indicator="openInterest", data=oi)
+    }
+
+
+def serialise(result, fmt):
+    encoded = format_response(result, fmt)
+    if isinstance(encoded, dict):
+        return json.dumps(encoded, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+    return encoded.body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    per_k = 1000 / args.points
+    print(f"Per 1000 points (measured on {args.points})")
+    print(f"{'endpoint':>14} | {'format':>8} | {'bytes':>8} | {'gzip':>7} | {'encode ms':>9}")
+
+    for endpoint, result in make_results(args.points).items():
+        for fmt in FORMATS:
+            body = serialise(result, fmt)
+            if fmt == "binary":
+                assert decode_binary(body)["count"] == args.points
+
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                serialise(result, fmt)
+                best = min(best, time.perf_counter() - t0)
+
+            print(f"{endpoint:>14} | {fmt:>8} | {len(body) * per_k:>8.0f} | "
+                  f"{len(gzip.compress(body)) * per_k:>7.0f} | {best * 1000 * per_k:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: public trade aggregation throughput and memory for the top perps
+
+Writes a synthetic recording of Bybit publicTrade messages (the same JSON the
+stream receives; trade_aggregator.py --record captures a real one) for a
+number of symbols, then replays it through json.loads + TradeAggregator with
+periodic flushes into a temporary SQLite store, on one core. Reports trades
+per second of CPU time against a target rate and, in a second pass, the
+peak traced memory of the replay across recording lengths: it should stay
+flat as the recording grows, since only open buckets and not-yet-flushed
+closed buckets are kept.
+
+The default target rate (20000 trades/s) is an assumption of the combined
+burst rate of the 50 most active USDT perps, not a measured figure; pass a
+real recording with --replay to measure against actual traffic.
+
+Usage (from the backend folder):
+    python benchmarks/trade_aggregator.py --symbols 50 --minutes 1 4 16
+    python benchmarks/trade_aggregator.py --replay trades.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlite_store import SQLiteStore
+from trade_aggregator import TradeAggregator, replay_messages
+
+
+def write_recording(path, symbols, minutes, trades_per_second):
+    """publicTrade messages of every symbol, one message per symbol and 100 ms"""
+    start = 1_700_000_000_000
+    per_message = max(1, trades_per_second // (10 * symbols))
+    trades = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for tick in range(minutes * 60 * 10):
+            ts = start + tick * 100
+            for s in range(symbols):
+                symbol = f"SYM{s:02d}USDT"
+                data = [{
+                    "T": ts + i, "s": symbol, "S": "Buy" if random.random() < 0.5 else "Sell",
+                    "v": f"{random.uniform(0.001, 5):.3f}", "p": "100.0", "L": "PlusTick",
+                    "i": f"{tick}-{s}-{i}", "BT": False
+                } for i in range(per_message)]
+                f.write(json.dumps({"topic": f"publicTrade.{symbol}", "type": "snapshot", "ts": ts, "data": data}) + "\n")
+                trades += per_message
+    return trades
+
+
+def replay(path, flush_every, trace=False):
+    """(trades, CPU seconds, peak traced bytes or None, aggregator stats)"""
+    with tempfile.TemporaryDirectory() as folder:
+        db = SQLiteStore(os.path.join(folder, "bench.sqlite3"))
+        aggregator = TradeAggregator(db, max_symbols=10 ** 6)
+        peak = None
+        with open(path, "r", encoding="utf-8") as f:
+            if trace:
+                tracemalloc.start()
+            t0 = time.process_time()
+            replay_messages(aggregator, f, flush_every=flush_every)
+            elapsed = time.process_time() - t0
+            if trace:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        stats = aggregator.get_stats()
+        db.close()
+    return stats["trades"], elapsed, peak, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--minutes", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--rate", type=int, default=20000, help="Trades per second in the synthetic recording")
+    parser.add_argument("--target-rate", type=int, default=20000, help="Trades per second the aggregator must sustain")
+    parser.add_argument("--flush-every", type=int, default=5000, help="Messages between flushes")
+    parser.add_argument("--replay", help="Replay this recording instead of synthetic ones")
+    args = parser.parse_args()
+
+    runs = []
+    if args.replay:
+        runs.append((args.replay, None))
+    else:
+        for minutes in args.minutes:
+            path = os.path.join(tempfile.gettempdir(), f"trades_{args.symbols}x{minutes}m.jsonl")
+            write_recording(path, args.symbols, minutes, args.rate)
+            runs.append((path, minutes))
+
+    print(f"target: {args.target_rate} trades/s on one core")
+    print(f"{'recording':>12} | {'trades':>10} | {'CPU s':>7} | {'trades/s':>9} | {'x target':>8} | "
+          f"{'peak MB':>7} | {'buckets':>8}")
+    for path, minutes in runs:
+        # tracemalloc ralentiza mucho: tiempo y memoria en pasadas separadas
+        trades, elapsed, _, stats = replay(path, args.flush_every)
+        peak = replay(path, args.flush_every, trace=True)[2]
+        rate = trades / elapsed if elapsed else float("inf")
+        label = f"{args.symbols}x{minutes}m" if minutes else Path(path).name
+        print(f"{label:>12} | {trades:>10} | {elapsed:>7.2f} | {rate:>9.0f} | {rate / args.target_rate:>7.1f}x | "
+              f"{peak / 2 ** 20:>7.2f} | {stats['buckets_persisted']:>8}")
+        if minutes:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Load test for the /ws fan-out hub
+
+Starts a uvicorn server in this process with a FanoutHub, connects hundreds
+of local WebSocket subscribers and publishes kline updates as a single
+upstream feed would. A share of the clients are deliberately slow to show
+drop-to-latest backpressure: they subscribe to every symbol (a wall screen)
+but read slowly; once their socket buffers fill, pending updates are
+replaced instead of queued, so server memory stays flat and fast clients
+keep their latency.
+
+Usage (from the backend folder):
+    python benchmarks/ws_fanout_load.py --clients 500 --symbols 20 --rate 50 --seconds 15
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import uvicorn
+import websockets
+from fastapi import FastAPI, WebSocket
+
+from ws_fanout import FanoutHub
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def subscriber(url, symbols, slow, results, ready):
+    received = 0
+    latencies = []
+    last_seq = -1
+    async with websockets.connect(url, max_queue=None if not slow else 16) as ws:
+        args = [{"topic": "kline", "symbol": s, "interval": "1"} for s in symbols]
+        await ws.send(json.dumps({"op": "subscribe", "args": args}))
+        ready.release()
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg.get("t") != "kline":
+                    continue
+                if msg["d"][0] == -1:  # Fin del test
+                    break
+                received += 1
+                last_seq = max(last_seq, msg["d"][0])
+                latencies.append(time.time() * 1000 - msg["d"][5])
+                if slow:
+                    await asyncio.sleep(0.05)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            results.append({
+                "slow": slow,
+                "received": received,
+                "last_seq": last_seq,
+                "latencies": latencies
+            })
+
+
+async def main(args):
+    hub = FanoutHub()
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def ws_endpoint(websocket: WebSocket):
+        await hub.serve(websocket)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    url = f"ws://127.0.0.1:{args.port}/ws"
+    symbols = [f"SYM{i}USDT" for i in range(args.symbols)]
+    results = []
+    ready = asyncio.Semaphore(0)
+
+    t0 = time.perf_counter()
+    # 1 de cada 10 clientes es una "pared" lenta suscrita a todos los símbolos
+    clients = [
+        asyncio.create_task(subscriber(
+            url,
+            symbols if i % 10 == 0 else [symbols[i % len(symbols)]],
+            i % 10 == 0,
+            results,
+            ready
+        ))
+        for i in range(args.clients)
+    ]
+    for _ in range(args.clients):
+        await ready.acquire()
+    await asyncio.sleep(0.5)  # Que el hub procese todas las suscripciones
+    connect_s = time.perf_counter() - t0
+
+    # Un solo "feed": cada tick publica una vela por símbolo.
+    # d = [seq, o, h, l, c, sent_at_ms] (el volumen se usa como marca de tiempo)
+    ticks = int(args.rate * args.seconds)
+    t0 = time.perf_counter()
+    for seq in range(ticks):
+        now_ms = time.time() * 1000
+        for symbol in symbols:
+            hub.publish("kline", symbol, "1", {"t": "kline", "s": symbol, "i": "1", "d": [seq, 1.0, 1.0, 1.0, 1.0, now_ms]})
+        await asyncio.sleep(1 / args.rate)
+    publish_s = time.perf_counter() - t0
+
+    await asyncio.sleep(1.0)
+    for symbol in symbols:
+        hub.publish("kline", symbol, "1", {"t": "kline", "s": symbol, "i": "1", "d": [-1, 0, 0, 0, 0, 0]})
+    _, still_reading = await asyncio.wait(clients, timeout=10)
+    for task in still_reading:
+        task.cancel()
+    await asyncio.gather(*still_reading, return_exceptions=True)
+
+    fast = [r for r in results if not r["slow"]]
+    slow = [r for r in results if r["slow"]]
+    fast_lat = [l for r in fast for l in r["latencies"]]
+    stats = hub.get_stats()
+
+    print(f"Clients connected:        {len(results)}/{args.clients} in {connect_s:.2f}s")
+    print(f"Symbols / ticks:          {len(symbols)} / {ticks} ({ticks * len(symbols)} upstream updates in {publish_s:.1f}s)")
+    print(f"Messages delivered:       {stats['sent']}")
+    print(f"Fast clients received:    avg {sum(r['received'] for r in fast) / max(1, len(fast)):.1f} of {ticks}")
+    print(f"Fast client latency (ms): p50 {percentile(fast_lat, 50):.1f} | p95 {percentile(fast_lat, 95):.1f} | p99 {percentile(fast_lat, 99):.1f}")
+    print(f"Slow clients received:    avg {sum(r['received'] for r in slow) / max(1, len(slow)):.1f} of {ticks * len(symbols)} "
+          f"(newest seq seen: {min((r['last_seq'] for r in slow), default=-1)}..{max((r['last_seq'] for r in slow), default=-1)} of {ticks - 1})")
+    print(f"Dropped (drop-to-latest): {stats['dropped_for_slow_clients']}")
+    print(f"Peak RSS:                 {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test for the /ws fan-out hub")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=50, help="Updates per second per symbol")
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,282 @@
+"""
+Bybit Upstream Client Module
+
+Process-wide pooled HTTP client used by every Bybit REST call in the backend.
+Connections are kept alive between requests (HTTP/2 multiplexed when the `h2`
+package is installed) and each request records connect / TTFB timings so the
+pool savings can be observed from /api/status.
+
+Configuration (environment variables):
+    BYBIT_BASE_URL           Upstream base URL (default https://api.bybit.com)
+    BYBIT_HTTP2              "0" to force HTTP/1.1 (default "1")
+    BYBIT_MAX_CONNECTIONS    Max open connections in the pool (default 20)
+    BYBIT_MAX_KEEPALIVE      Max idle keep-alive connections (default 10)
+    BYBIT_KEEPALIVE_EXPIRY   Seconds an idle connection is kept (default 60)
+    BYBIT_TIMEOUT            Request timeout in seconds (default 30)
+
+Every request first takes a token from the shared rate limiter
+(see rate_limiter.py); the time spent queued is reported per request.
+"""
+
+import os
+import time
+import asyncio
+import httpx
+import logging
+from collections import deque
+from typing import Dict, Optional
+
+from rate_limiter import TokenBucketLimiter
+
+logger = logging.getLogger(__name__)
+
+BYBIT_BASE_URL = os.getenv("BYBIT_BASE_URL", "https://api.bybit.com")
+BYBIT_HTTP2 = os.getenv("BYBIT_HTTP2", "1") != "0"
+BYBIT_MAX_CONNECTIONS = int(os.getenv("BYBIT_MAX_CONNECTIONS", "20"))
+BYBIT_MAX_KEEPALIVE = int(os.getenv("BYBIT_MAX_KEEPALIVE", "10"))
+BYBIT_KEEPALIVE_EXPIRY = float(os.getenv("BYBIT_KEEPALIVE_EXPIRY", "60"))
+BYBIT_TIMEOUT = float(os.getenv("BYBIT_TIMEOUT", "30"))
+
+# Endpoint barato usado para abrir la conexión al arrancar
+WARMUP_PATH = "/v5/market/time"
+
+# Respuestas de Bybit por exceso de peticiones (retCode 10006 / HTTP 403, 429)
+RATE_LIMIT_RET_CODES = {10006}
+RATE_LIMIT_STATUS_CODES = {403, 429}
+RATE_LIMIT_RETRIES = 2
+RATE_LIMIT_BACKOFF_SECONDS = 1.0
+
+
+def _http2_available() -> bool:
+    """HTTP/2 in httpx requires the optional `h2` package"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class BybitClient:
+    """Shared pooled client for Bybit REST traffic with timing metrics"""
+
+    def __init__(
+        self,
+        base_url: str = BYBIT_BASE_URL,
+        http2: bool = BYBIT_HTTP2,
+        max_connections: int = BYBIT_MAX_CONNECTIONS,
+        max_keepalive: int = BYBIT_MAX_KEEPALIVE,
+        keepalive_expiry: float = BYBIT_KEEPALIVE_EXPIRY,
+        timeout: float = BYBIT_TIMEOUT
+    ):
+        self.base_url = base_url
+        self.http2 = http2 and _http2_available()
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+        self.limiter = TokenBucketLimiter()
+
+        # Métricas
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.failed_requests = 0
+        self.new_connections = 0
+        self.rate_limited_responses = 0
+        self.samples: deque = deque(maxlen=500)
+
+    async def start(self, warmup: bool = True):
+        """Create the pooled client and optionally open the first connection"""
+        if self.client is not None:
+            return
+
+        if BYBIT_HTTP2 and not self.http2:
+            logger.info("ℹ️ h2 not installed, Bybit client falling back to HTTP/1.1")
+
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=self.http2,
+            limits=self.limits,
+            timeout=self.timeout
+        )
+        logger.info(
+            f"🚀 Bybit client started ({'HTTP/2' if self.http2 else 'HTTP/1.1'}, "
+            f"max_connections={self.limits.max_connections}, "
+            f"keepalive={self.limits.max_keepalive_connections})"
+        )
+
+        if warmup:
+            await self.warmup()
+
+    async def stop(self):
+        """Close all pooled connections"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        logger.info("🛑 Bybit client stopped")
+
+    async def warmup(self) -> bool:
+        """Open a connection ahead of the first real request (TCP + TLS)"""
+        try:
+            await self.get_json(WARMUP_PATH)
+            logger.info("🔥 Bybit connection warmed up")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Bybit warm-up failed: {str(e)}")
+            return False
+
+    async def get_json(
+        self,
+        path: str,
+        params: Optional[Dict] = None,
+        priority: Optional[str] = None
+    ) -> Dict:
+        """
+        Performs a rate-limited GET against Bybit and returns the JSON body
+
+        Rate-limit rejections from Bybit are retried after a short backoff.
+
+        Args:
+            path: Path relative to the base URL (e.g. /v5/market/kline)
+            params: Query parameters
+            priority: Limiter lane ("interactive" / "background");
+                defaults to the lane of the current task
+
+        Returns:
+            Parsed JSON response
+        """
+        if self.client is None:
+            await self.start(warmup=False)
+
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            status_code, data = await self._get_once(path, params, priority)
+
+            rate_limited = (
+                status_code in RATE_LIMIT_STATUS_CODES
+                or (isinstance(data, dict) and data.get("retCode") in RATE_LIMIT_RET_CODES)
+            )
+            if not rate_limited:
+                return data
+
+            self.rate_limited_responses += 1
+            logger.warning(f"⚠️ Bybit rate limit hit on {path} (attempt {attempt + 1})")
+            if attempt < RATE_LIMIT_RETRIES:
+                await asyncio.sleep(RATE_LIMIT_BACKOFF_SECONDS * (attempt + 1))
+
+        if not isinstance(data, dict):
+            data = {"retCode": -1, "retMsg": f"Rate limited by Bybit (HTTP {status_code})"}
+        return data
+
+    async def _get_once(self, path: str, params: Optional[Dict], priority: Optional[str]):
+        queue_wait = await self.limiter.acquire(priority)
+
+        timing = {
+            "queue_wait_ms": queue_wait * 1000,
+            "connect_ms": 0.0,
+            "ttfb_ms": None,
+            "total_ms": None,
+            "new_connection": False
+        }
+        marks: Dict[str, float] = {}
+        t0 = time.perf_counter()
+
+        async def trace(event_name: str, info: Dict):
+            now = time.perf_counter()
+            if event_name == "connection.connect_tcp.started":
+                marks["connect_start"] = now
+                timing["new_connection"] = True
+            elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+                if "connect_start" in marks:
+                    timing["connect_ms"] = (now - marks["connect_start"]) * 1000
+            elif event_name.endswith("receive_response_headers.complete"):
+                timing["ttfb_ms"] = (now - t0) * 1000
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.total_requests += 1
+        try:
+            response = await self.client.get(path, params=params, extensions={"trace": trace})
+            data = response.json() if response.status_code not in RATE_LIMIT_STATUS_CODES else None
+        except Exception:
+            self.failed_requests += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            timing["total_ms"] = (time.perf_counter() - t0) * 1000
+            if timing["new_connection"]:
+                self.new_connections += 1
+            self.samples.append(timing)
+
+        return response.status_code, data
+
+    def get_pool_stats(self) -> Dict:
+        """Open / idle connections currently held by the pool"""
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for c in connections if c.is_idle())
+        return {
+            "open_connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "in_flight_requests": self.in_flight,
+            "peak_in_flight_requests": self.peak_in_flight
+        }
+
+    def get_stats(self) -> Dict:
+        """Pool utilisation plus connect / TTFB timings of recent requests"""
+        samples = list(self.samples)
+
+        def percentile(values, pct):
+            if not values:
+                return None
+            values = sorted(values)
+            idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+            return round(values[idx], 2)
+
+        queue_wait = [s["queue_wait_ms"] for s in samples]
+        ttfb = [s["ttfb_ms"] for s in samples if s["ttfb_ms"] is not None]
+        total = [s["total_ms"] for s in samples if s["total_ms"] is not None]
+        connects = [s["connect_ms"] for s in samples if s["new_connection"]]
+        reused = sum(1 for s in samples if not s["new_connection"])
+
+        return {
+            "started": self.client is not None,
+            "http2": self.http2,
+            "base_url": self.base_url,
+            "pool": self.get_pool_stats(),
+            "total_requests": self.total_requests,
+            "failed_requests": self.failed_requests,
+            "new_connections": self.new_connections,
+            "rate_limited_responses": self.rate_limited_responses,
+            "reused_connection_ratio": round(reused / len(samples), 3) if samples else None,
+            "timings_ms": {
+                "samples": len(samples),
+                "queue_wait_p50": percentile(queue_wait, 50),
+                "queue_wait_p95": percentile(queue_wait, 95),
+                "connect_avg": round(sum(connects) / len(connects), 2) if connects else None,
+                "ttfb_p50": percentile(ttfb, 50),
+                "ttfb_p95": percentile(ttfb, 95),
+                "total_p50": percentile(total, 50),
+                "total_p95": percentile(total, 95)
+            },
+            "rate_limiter": self.limiter.get_stats()
+        }
+
+
+# Global instance
+bybit_client = BybitClient()
+
+
+async def initialize_bybit_client():
+    """Initialize the global Bybit client and warm up its connection"""
+    await bybit_client.start(warmup=True)
+
+
+async def shutdown_bybit_client():
+    """Shutdown the global Bybit client"""
+    await bybit_client.stop()
@@ -0,0 +1,274 @@
+"""
+Bybit Stream Module
+
+One backend-owned, multiplexed WebSocket subscription to Bybit's public
+linear stream (kline + ticker topics) for every symbol/interval the app uses,
+plus publicTrade topics for the symbols whose trades are aggregated.
+Recent candles are kept in bounded in-memory ring buffers per (symbol,
+interval) so the candle store can serve tails without REST calls.
+
+The buffers are cleared on every reconnect, so a buffer never contains gaps.
+Listeners (e.g. the /ws fan-out hub) are notified of every parsed update, and
+of every reconnect with kind "reset".
+
+Configuration (environment variables):
+    BYBIT_WS_ENABLED     "0" to disable the stream (default "1")
+    BYBIT_WS_URL         Stream URL (default wss://stream.bybit.com/v5/public/linear)
+    BYBIT_WS_RING_SIZE   Candles kept per (symbol, interval) (default 500)
+    BYBIT_WS_MAX_TOPICS  Max subscribed topics (default 500)
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import websockets
+except ImportError:  # Viene con uvicorn[standard]; sin él el stream queda deshabilitado
+    websockets = None
+
+BYBIT_WS_ENABLED = os.getenv("BYBIT_WS_ENABLED", "1") != "0"
+BYBIT_WS_URL = os.getenv("BYBIT_WS_URL", "wss://stream.bybit.com/v5/public/linear")
+BYBIT_WS_RING_SIZE = int(os.getenv("BYBIT_WS_RING_SIZE", "500"))
+BYBIT_WS_MAX_TOPICS = int(os.getenv("BYBIT_WS_MAX_TOPICS", "500"))
+
+# Bybit cierra conexiones sin ping en ~30s
+PING_INTERVAL_SECONDS = 20
+# Bybit acepta hasta 10 topics por mensaje de suscripción
+SUBSCRIBE_CHUNK = 10
+RECONNECT_MAX_BACKOFF_SECONDS = 30
+
+
+class BybitKlineStream:
+    """Multiplexed kline/ticker subscription with per-series ring buffers"""
+
+    def __init__(
+        self,
+        url: str = BYBIT_WS_URL,
+        ring_size: int = BYBIT_WS_RING_SIZE,
+        max_topics: int = BYBIT_WS_MAX_TOPICS
+    ):
+        self.url = url
+        self.ring_size = ring_size
+        self.max_topics = max_topics
+        self.enabled = BYBIT_WS_ENABLED and websockets is not None
+
+        self.topics: Set[str] = set()
+        self.buffers: Dict[Tuple[str, str], deque] = {}
+        self.updated_at: Dict[Tuple[str, str], int] = {}
+        self.tickers: Dict[str, Dict] = {}
+
+        self.listeners: List[Callable] = []
+
+        self.connected = False
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"connects": 0, "messages": 0, "kline_updates": 0, "ticker_updates": 0,
+                      "trade_messages": 0, "errors": 0}
+
+    # ---------- Subscriptions ----------
+
+    def subscribe(self, symbol: str, interval: str):
+        """Adds kline + ticker topics for a pair (no-op if already subscribed)"""
+        if not self.enabled:
+            return
+
+        new_topics = [t for t in (f"kline.{interval}.{symbol}", f"tickers.{symbol}") if t not in self.topics]
+        if not new_topics:
+            return
+        if len(self.topics) + len(new_topics) > self.max_topics:
+            logger.warning(f"⚠️ Bybit stream topic limit reached, not subscribing {symbol} {interval}")
+            return
+
+        self.topics.update(new_topics)
+        if self.connected:
+            asyncio.create_task(self._send_subscribe(new_topics))
+
+    def subscribe_trades(self, symbol: str):
+        """Adds the publicTrade topic of a symbol (no-op if already subscribed)"""
+        topic = f"publicTrade.{symbol}"
+        if not self.enabled or topic in self.topics:
+            return
+        if len(self.topics) >= self.max_topics:
+            logger.warning(f"⚠️ Bybit stream topic limit reached, not subscribing {topic}")
+            return
+
+        self.topics.add(topic)
+        if self.connected:
+            asyncio.create_task(self._send_subscribe([topic]))
+
+    async def _send_subscribe(self, topics: List[str]):
+        try:
+            for i in range(0, len(topics), SUBSCRIBE_CHUNK):
+                await self._ws.send(json.dumps({"op": "subscribe", "args": topics[i:i + SUBSCRIBE_CHUNK]}))
+        except Exception as e:
+            # La reconexión vuelve a suscribir todos los topics
+            logger.warning(f"⚠️ Bybit stream subscribe failed: {str(e)}")
+
+    def add_listener(self, callback: Callable):
+        """callback(kind, symbol, interval, data) for "kline" rows, "ticker" dicts, "trades" lists and "reset" (None)"""
+        self.listeners.append(callback)
+
+    def _notify(self, kind: str, symbol: str, interval: Optional[str], data):
+        for callback in self.listeners:
+            try:
+                callback(kind, symbol, interval, data)
+            except Exception as e:
+                logger.error(f"❌ Stream listener error: {str(e)}")
+
+    # ---------- Connection ----------
+
+    async def start(self):
+        if not self.enabled:
+            logger.info("ℹ️ Bybit stream disabled")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=None, max_size=2 ** 22) as ws:
+                    self._ws = ws
+                    self._reset_buffers()
+                    self._notify("reset", None, None, None)
+                    self.connected = True
+                    self.stats["connects"] += 1
+                    backoff = 1
+                    logger.info(f"🔌 Bybit stream connected ({len(self.topics)} topics)")
+
+                    if self.topics:
+                        await self._send_subscribe(sorted(self.topics))
+
+                    pinger = asyncio.create_task(self._ping(ws))
+                    try:
+                        async for message in ws:
+                            self._handle_message(message)
+                    finally:
+                        pinger.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ Bybit stream error: {str(e)}")
+            finally:
+                self.connected = False
+                self._ws = None
+
+            await asyncio.sleep(backoff)
+            backoff = min(RECONNECT_MAX_BACKOFF_SECONDS, backoff * 2)
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(PING_INTERVAL_SECONDS)
+            await ws.send(json.dumps({"op": "ping"}))
+
+    def _reset_buffers(self):
+        """Tras reconectar puede haber huecos: se empieza de cero"""
+        self.buffers.clear()
+        self.updated_at.clear()
+
+    # ---------- Messages ----------
+
+    def _handle_message(self, message):
+        self.stats["messages"] += 1
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            return
+
+        topic = payload.get("topic")
+        if not topic:
+            return  # Respuestas a subscribe / pong
+
+        if topic.startswith("publicTrade."):
+            self.stats["trade_messages"] += 1
+            self._notify("trades", topic[12:], None, payload.get("data", []))
+        elif topic.startswith("kline."):
+            _, interval, symbol = topic.split(".", 2)
+            for k in payload.get("data", []):
+                self._apply_kline(symbol, interval, k)
+        elif topic.startswith("tickers."):
+            symbol = topic.split(".", 1)[1]
+            data = payload.get("data", {})
+            if payload.get("type") == "snapshot" or symbol not in self.tickers:
+                self.tickers[symbol] = dict(data)
+            else:
+                self.tickers[symbol].update(data)
+            self.stats["ticker_updates"] += 1
+            self._notify("ticker", symbol, None, self.tickers[symbol])
+
+    def _apply_kline(self, symbol: str, interval: str, k: Dict) -> List[str]:
+        # Mismo formato que las filas REST: [start, open, high, low, close, volume, turnover]
+        row = [str(k["start"]), k["open"], k["high"], k["low"], k["close"], k["volume"], k.get("turnover", "0")]
+        key = (symbol, interval)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = self.buffers[key] = deque(maxlen=self.ring_size)
+
+        ts = int(row[0])
+        if buffer and int(buffer[-1][0]) == ts:
+            buffer[-1] = row  # Actualización de la vela en curso
+        elif not buffer or int(buffer[-1][0]) < ts:
+            buffer.append(row)
+
+        self.updated_at[key] = int(k.get("timestamp") or time.time() * 1000)
+        self.stats["kline_updates"] += 1
+        self._notify("kline", symbol, interval, row)
+        return row
+
+    # ---------- Reads ----------
+
+    def get_tail(self, symbol: str, interval: str, since_ms: int) -> Optional[Tuple[List[List[str]], int]]:
+        """
+        Buffered candles with open time >= since_ms
+
+        Returns:
+            (rows ascending, as-of timestamp in ms) or None if the buffer
+            does not reach back to since_ms
+        """
+        if not self.connected:
+            return None
+
+        key = (symbol, interval)
+        buffer = self.buffers.get(key)
+        if not buffer or int(buffer[0][0]) > since_ms:
+            return None
+
+        rows = [r for r in buffer if int(r[0]) >= since_ms]
+        return rows, self.updated_at.get(key, 0)
+
+    def get_ticker(self, symbol: str) -> Optional[Dict]:
+        return self.tickers.get(symbol)
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "connected": self.connected,
+            "topics": len(self.topics),
+            "buffers": len(self.buffers),
+            "buffered_candles": sum(len(b) for b in self.buffers.values()),
+            "ring_size": self.ring_size,
+            **self.stats
+        }
+
+
+# Global instance
+bybit_stream = BybitKlineStream()
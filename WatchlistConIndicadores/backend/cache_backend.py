@@ -0,0 +1,450 @@
+"""
+Cache Backend Module
+
+Pluggable storage for the indicator cache (the disk tier behind
+load_cache/save_cache) plus the state shared by several uvicorn workers:
+named leases and the cache generation counters (cache_namespace.py). Every
+backend stores the same encode_cache bytes (cache_format.py).
+
+Backends:
+    file     One .wlc file per key in the cache folder; per-key lock files
+             (flock, or msvcrt on Windows) serialize writers and legacy-JSON
+             migration; leases and generations are lock-protected files
+             (lease locks are a fixed set of shard files, so expired lease
+             files can be deleted).
+    sqlite   `kv`, `leases` and `generations` tables of the shared SQLite store.
+    redis    Any server speaking the Redis protocol (RESP); leases are
+             SET NX PX, generations a hash. Talks RESP directly over a socket, so it needs no
+             client library and can be tested against benchmarks/resp_standin.py.
+
+Configuration (environment variables):
+    CACHE_BACKEND   "file" (default), "sqlite" or "redis"
+    REDIS_URL       redis://host:port/db (default redis://127.0.0.1:6379/0)
+
+With several workers, set WEB_CONCURRENCY to the worker count as well: the
+Bybit rate limiter is per process and splits BYBIT_RATE_PER_SEC between
+them (rate_limiter.py); it is not shared through this backend.
+"""
+
+import os
+import re
+import json
+import time
+import socket
+import zlib
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from typing import Dict, Optional, Tuple
+
+from cache_format import encode_cache, decode_cache, read_cache_file, write_cache_file, atomic_write
+from sqlite_store import SQLiteStore
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "file")
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+
+# Archivos de lock de leases (backend file): número fijo, nunca se borran
+LEASE_LOCK_SHARDS = 64
+
+
+class CacheBackend:
+    """Interface: payload get/set/delete by key, plus named leases"""
+
+    name = "base"
+
+    def __init__(self):
+        self.stats = {"gets": 0, "hits": 0, "sets": 0, "deletes": 0, "leases_acquired": 0, "leases_denied": 0}
+
+    def get(self, key: str) -> Optional[Tuple[Dict, int]]:
+        """(payload, stored size in bytes) or None"""
+        raise NotImplementedError
+
+    def set(self, key: str, payload: Dict, ttl: Optional[float] = None) -> int:
+        """Stores payload (ttl in seconds; None keeps it until deleted); returns the stored size"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """True if owner now holds the lease (free, expired, or already its own)"""
+        raise NotImplementedError
+
+    def release_lease(self, name: str, owner: str):
+        raise NotImplementedError
+
+    def lease_held(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def purge_expired_leases(self) -> int:
+        """Deletes expired leases (claims are never released); returns how many"""
+        return 0
+
+    def load_generations(self) -> Dict[str, int]:
+        """Every namespace generation counter"""
+        raise NotImplementedError
+
+    def bump_generation(self, name: str, value: int) -> int:
+        """Raises a generation to at least value (never lowers it); returns the stored value"""
+        raise NotImplementedError
+
+    def _count_lease(self, acquired: bool) -> bool:
+        self.stats["leases_acquired" if acquired else "leases_denied"] += 1
+        return acquired
+
+    def get_stats(self) -> Dict:
+        return {"backend": self.name, **self.stats}
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Exclusive inter-process lock on path (created if missing)"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+
+class FileCacheBackend(CacheBackend):
+    """One file per key; TTL is left to the cache janitor"""
+
+    name = "file"
+
+    def __init__(self, directory: Path):
+        super().__init__()
+        self.directory = Path(directory)
+        self.lock_dir = self.directory / ".locks"
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+
+    def _lock(self, key: str):
+        return file_lock(self.lock_dir / f"{_safe_name(key)}.lock")
+
+    def get(self, key: str) -> Optional[Tuple[Dict, int]]:
+        self.stats["gets"] += 1
+        base = self.directory / key
+        payload, path = read_cache_file(base)
+        if payload is None:
+            return None
+        self.stats["hits"] += 1
+        if path.suffix == ".json":
+            # JSON antiguo: se migra al formato binario bajo el lock de la clave
+            with self._lock(key):
+                return payload, write_cache_file(base, payload)
+        return payload, path.stat().st_size
+
+    def set(self, key: str, payload: Dict, ttl: Optional[float] = None) -> int:
+        self.stats["sets"] += 1
+        with self._lock(key):
+            return write_cache_file(self.directory / key, payload)
+
+    def delete(self, key: str) -> bool:
+        self.stats["deletes"] += 1
+        deleted = False
+        with self._lock(key):
+            for suffix in (".wlc", ".json"):
+                path = self.directory / f"{key}{suffix}"
+                if path.exists():
+                    path.unlink()
+                    deleted = True
+        return deleted
+
+    def _lease_path(self, name: str) -> Path:
+        return self.lock_dir / f"lease_{_safe_name(name)}.json"
+
+    def _read_lease(self, name: str) -> Optional[Dict]:
+        try:
+            with open(self._lease_path(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _lease_lock(self, name: str):
+        # Un lock por shard y no por lease: borrar el archivo de un lease vencido
+        # no puede dejar a dos procesos con locks distintos para el mismo nombre
+        return file_lock(self.lock_dir / f"leases_{zlib.crc32(name.encode()) % LEASE_LOCK_SHARDS}.lock")
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        with self._lease_lock(name):
+            lease = self._read_lease(name)
+            if lease and lease["owner"] != owner and lease["expires_at"] > time.time():
+                return self._count_lease(False)
+            atomic_write(self._lease_path(name), json.dumps(
+                {"name": name, "owner": owner, "expires_at": time.time() + ttl}
+            ).encode())
+            return self._count_lease(True)
+
+    def release_lease(self, name: str, owner: str):
+        with self._lease_lock(name):
+            lease = self._read_lease(name)
+            if lease and lease["owner"] == owner:
+                self._lease_path(name).unlink()
+
+    def lease_held(self, name: str) -> bool:
+        lease = self._read_lease(name)
+        return bool(lease) and lease["expires_at"] > time.time()
+
+    def purge_expired_leases(self) -> int:
+        removed = 0
+        for path in self.lock_dir.glob("lease_*.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    lease = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if lease.get("expires_at", 0) > time.time():
+                continue
+            try:
+                if "name" not in lease:
+                    # Formato anterior sin nombre: nadie más lo renueva
+                    path.unlink()
+                    removed += 1
+                    continue
+                with self._lease_lock(lease["name"]):
+                    lease = self._read_lease(lease["name"])
+                    if lease and lease["expires_at"] <= time.time():
+                        path.unlink()
+                        removed += 1
+            except OSError:
+                pass
+        # Locks por lease de versiones anteriores: ya no los usa nadie
+        for path in self.lock_dir.glob("lease_*.lock"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        return removed
+
+    def load_generations(self) -> Dict[str, int]:
+        try:
+            with open(self.lock_dir / "generations.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def bump_generation(self, name: str, value: int) -> int:
+        with file_lock(self.lock_dir / "generations.lock"):
+            generations = self.load_generations()
+            generations[name] = max(generations.get(name, 0), value)
+            atomic_write(self.lock_dir / "generations.json", json.dumps(generations).encode())
+            return generations[name]
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """kv / leases tables of the shared SQLite store"""
+
+    name = "sqlite"
+
+    def __init__(self, db: SQLiteStore):
+        super().__init__()
+        self.db = db
+
+    def get(self, key: str) -> Optional[Tuple[Dict, int]]:
+        self.stats["gets"] += 1
+        content = self.db.kv_get(key)
+        if content is None:
+            return None
+        self.stats["hits"] += 1
+        return decode_cache(content), len(content)
+
+    def set(self, key: str, payload: Dict, ttl: Optional[float] = None) -> int:
+        self.stats["sets"] += 1
+        content = encode_cache(payload)
+        self.db.kv_set(key, content, ttl)
+        return len(content)
+
+    def delete(self, key: str) -> bool:
+        self.stats["deletes"] += 1
+        return self.db.kv_delete(key)
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        return self._count_lease(self.db.acquire_lease(name, owner, ttl))
+
+    def release_lease(self, name: str, owner: str):
+        self.db.release_lease(name, owner)
+
+    def lease_held(self, name: str) -> bool:
+        return self.db.lease_held(name)
+
+    def purge_expired_leases(self) -> int:
+        return self.db.purge_expired_leases()
+
+    def load_generations(self) -> Dict[str, int]:
+        return self.db.load_generations()
+
+    def bump_generation(self, name: str, value: int) -> int:
+        return self.db.bump_generation(name, value)
+
+
+class RespClient:
+    """Minimal blocking Redis-protocol client (one socket, reconnects on error)"""
+
+    def __init__(self, url: str = REDIS_URL, timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._file = self._sock.makefile("rb")
+        if self.password:
+            self._roundtrip("AUTH", self.password)
+        if self.db:
+            self._roundtrip("SELECT", self.db)
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._file = None
+
+    def _roundtrip(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RuntimeError(f"Unexpected RESP reply {line!r}")
+
+    def execute(self, *args):
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._roundtrip(*args)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt == 2:
+                        raise
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+class RedisCacheBackend(CacheBackend):
+    """Keys under a prefix; TTLs and leases are native Redis expiries"""
+
+    name = "redis"
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "watchlist:"):
+        super().__init__()
+        self.client = RespClient(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Tuple[Dict, int]]:
+        self.stats["gets"] += 1
+        content = self.client.execute("GET", self.prefix + key)
+        if content is None:
+            return None
+        self.stats["hits"] += 1
+        return decode_cache(content), len(content)
+
+    def set(self, key: str, payload: Dict, ttl: Optional[float] = None) -> int:
+        self.stats["sets"] += 1
+        content = encode_cache(payload)
+        if ttl:
+            self.client.execute("SET", self.prefix + key, content, "PX", max(1, int(ttl * 1000)))
+        else:
+            self.client.execute("SET", self.prefix + key, content)
+        return len(content)
+
+    def delete(self, key: str) -> bool:
+        self.stats["deletes"] += 1
+        return self.client.execute("DEL", self.prefix + key) > 0
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        lease_key = f"{self.prefix}lease:{name}"
+        acquired = self.client.execute("SET", lease_key, owner, "NX", "PX", max(1, int(ttl * 1000))) == "OK"
+        if not acquired and self.client.execute("GET", lease_key) == owner.encode():
+            # Ya es nuestro: renovar
+            acquired = self.client.execute("SET", lease_key, owner, "XX", "PX", max(1, int(ttl * 1000))) == "OK"
+        return self._count_lease(acquired)
+
+    def release_lease(self, name: str, owner: str):
+        # GET + DEL (sin Lua, para que funcione con cualquier servidor RESP); si el lease
+        # vence entre ambos se podría borrar el de otro worker, que solo pierde su exclusividad
+        lease_key = f"{self.prefix}lease:{name}"
+        if self.client.execute("GET", lease_key) == owner.encode():
+            self.client.execute("DEL", lease_key)
+
+    def lease_held(self, name: str) -> bool:
+        return self.client.execute("EXISTS", f"{self.prefix}lease:{name}") > 0
+
+    def load_generations(self) -> Dict[str, int]:
+        reply = self.client.execute("HGETALL", f"{self.prefix}generations") or []
+        return {reply[i].decode(): int(reply[i + 1]) for i in range(0, len(reply), 2)}
+
+    def bump_generation(self, name: str, value: int) -> int:
+        # HGET + HSET: dos bumps simultáneos dejan el menor de ambos, que igual es
+        # posterior a todo lo escrito antes de cualquiera de los dos
+        current = self.client.execute("HGET", f"{self.prefix}generations", name)
+        value = max(int(current or 0), value)
+        self.client.execute("HSET", f"{self.prefix}generations", name, value)
+        return value
+
+
+def create_cache_backend(kind: str, directory: Path, db: SQLiteStore) -> CacheBackend:
+    """Backend named by kind ("file", "sqlite", "redis")"""
+    if kind == "sqlite":
+        return SQLiteCacheBackend(db)
+    if kind == "redis":
+        return RedisCacheBackend(REDIS_URL)
+    if kind != "file":
+        print(f"[CACHE BACKEND] Backend desconocido '{kind}', usando 'file'")
+    return FileCacheBackend(directory)
@@ -0,0 +1,187 @@
+"""
+Cache Format Module
+
+Versioned binary format for the indicator cache files (`*.wlc`), plus the
+atomic temp-file-and-rename write used by every on-disk cache.
+
+Layout:
+
+    magic     3 bytes  b"WLC"
+    version   1 byte   CACHE_FORMAT_VERSION
+    body      zlib-compressed:
+                  uint32  header length
+                  header  JSON {"meta": {...}, "tables": [{"field", "count", "columns": [{"name", "type", "nbytes"}]}]}
+                  column bytes, in header order
+
+Lists of uniform dicts (e.g. "klines", "data") are stored as tables, one
+column per key: "i8" int64, "f8" float64, "u1" bool, or "json" for anything
+else (strings, None, nested values). A column mixing ints and floats is
+stored as float64 (equal values, ints come back as floats). Every other
+top-level field goes into "meta".
+
+Legacy `.json` cache files are still readable; see read_cache_file.
+"""
+
+import os
+import json
+import zlib
+import struct
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+CACHE_FORMAT_MAGIC = b"WLC"
+CACHE_FORMAT_VERSION = 1
+CACHE_FORMAT_SUFFIX = ".wlc"
+ZLIB_LEVEL = 6
+
+ARRAY_CODES = {"i8": "q", "f8": "d", "u1": "B"}
+
+
+def atomic_write(path: Path, content: bytes):
+    """Writes to a temp file in the same folder and renames it over path"""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)  # Atómico: un lector ve el archivo viejo o el nuevo, nunca uno a medias
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def _is_table(value: Any) -> bool:
+    if not isinstance(value, list) or not value or not isinstance(value[0], dict):
+        return False
+    keys = list(value[0])
+    return all(isinstance(row, dict) and list(row) == keys for row in value)
+
+
+def _column_type(values: List) -> str:
+    if all(type(v) is bool for v in values):
+        return "u1"
+    if all(type(v) is int for v in values):
+        return "i8"
+    if all(type(v) in (int, float) for v in values):
+        return "f8"
+    return "json"
+
+
+def encode_cache(payload: Dict) -> bytes:
+    """Dict -> versioned, compressed, columnar bytes"""
+    meta = {}
+    tables = []
+    chunks = []
+
+    for field, value in payload.items():
+        if not _is_table(value):
+            meta[field] = value
+            continue
+
+        columns = []
+        for name in value[0]:
+            values = [row[name] for row in value]
+            kind = _column_type(values)
+            if kind == "json":
+                data = json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+            else:
+                try:
+                    data = array(ARRAY_CODES[kind], values).tobytes()
+                except OverflowError:
+                    kind = "json"
+                    data = json.dumps(values, separators=(',', ':')).encode("utf-8")
+            columns.append({"name": name, "type": kind, "nbytes": len(data)})
+            chunks.append(data)
+        tables.append({"field": field, "count": len(value), "columns": columns})
+
+    # Orden original de los campos para que decode devuelva el mismo dict
+    header = json.dumps(
+        {"meta": meta, "tables": tables, "order": list(payload)},
+        ensure_ascii=False, separators=(',', ':')
+    ).encode("utf-8")
+
+    body = struct.pack("<I", len(header)) + header + b"".join(chunks)
+    return CACHE_FORMAT_MAGIC + bytes([CACHE_FORMAT_VERSION]) + zlib.compress(body, ZLIB_LEVEL)
+
+
+def decode_cache(content: bytes) -> Dict:
+    """Inverse of encode_cache"""
+    if content[:3] != CACHE_FORMAT_MAGIC:
+        raise ValueError("Not a WLC cache file")
+    if content[3] != CACHE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported cache format version {content[3]}")
+
+    body = zlib.decompress(content[4:])
+    (header_length,) = struct.unpack_from("<I", body, 0)
+    header = json.loads(body[4:4 + header_length])
+    position = 4 + header_length
+
+    fields = dict(header["meta"])
+    for table in header["tables"]:
+        names, columns = [], []
+        for column in table["columns"]:
+            data = body[position:position + column["nbytes"]]
+            position += column["nbytes"]
+            if column["type"] == "json":
+                values = json.loads(data)
+            else:
+                values = array(ARRAY_CODES[column["type"]])
+                values.frombytes(data)
+                values = values.tolist()
+                if column["type"] == "u1":
+                    values = [bool(v) for v in values]
+            names.append(column["name"])
+            columns.append(values)
+        fields[table["field"]] = [dict(zip(names, row)) for row in zip(*columns)]
+
+    return {field: fields[field] for field in header["order"]}
+
+
+def read_cache_file(base_path: Path) -> Tuple[Optional[Dict], Optional[Path]]:
+    """
+    Reads "<base_path>.wlc", falling back to the legacy "<base_path>.json"
+
+    Returns:
+        (payload or None, path it was read from)
+    """
+    binary_path = base_path.with_name(base_path.name + CACHE_FORMAT_SUFFIX)
+    if binary_path.exists():
+        return decode_cache(binary_path.read_bytes()), binary_path
+
+    legacy_path = base_path.with_name(base_path.name + ".json")
+    if legacy_path.exists():
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            return json.load(f), legacy_path
+
+    return None, None
+
+
+def write_cache_file(base_path: Path, payload: Dict) -> int:
+    """Atomically writes "<base_path>.wlc" and drops any legacy JSON; returns bytes written"""
+    content = encode_cache(payload)
+    atomic_write(base_path.with_name(base_path.name + CACHE_FORMAT_SUFFIX), content)
+
+    legacy_path = base_path.with_name(base_path.name + ".json")
+    if legacy_path.exists():
+        legacy_path.unlink()
+    return len(content)
+
+
+def migrate_json_cache(directory: Path) -> Dict:
+    """Converts every legacy *.json cache file in directory to the binary format"""
+    migrated, failed, bytes_before, bytes_after = 0, 0, 0, 0
+    for legacy_path in sorted(Path(directory).glob("*.json")):
+        try:
+            bytes_before += legacy_path.stat().st_size
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            bytes_after += write_cache_file(legacy_path.with_suffix(""), payload)
+            migrated += 1
+        except Exception as e:
+            print(f"[CACHE MIGRATION ERROR] {legacy_path.name}: {str(e)}")
+            failed += 1
+    return {"migrated": migrated, "failed": failed, "bytes_before": bytes_before, "bytes_after": bytes_after}
@@ -0,0 +1,303 @@
+"""
+Cache Janitor Module
+
+Keeps the cache folder bounded. A background sweep (run in a worker thread,
+off the event loop) first reclaims entries superseded by a newer namespace
+generation (cache_namespace.py: what /api/clear-cache leaves behind), then
+removes entries past their per-indicator retention and, while the folder is
+over its byte budget, evicts the least recently used entries. Entries are the indicator cache files
+("{symbol}_{interval}_{indicator}[~generation].wlc|.json", plus legacy
+candles/*.json) and
+the series of the SQLite store; last use is the latest of their write time
+and the last time the API read them (see touch). Entries of indicators now
+computed on demand from candles (candle_indicators.py) are reclaimed like
+superseded ones, once the SQLite store has been migrated (its candles
+imported from them; see SQLiteStore.migrate_once).
+
+Selective invalidation by symbol / interval / indicator uses the same entry
+listing.
+
+Every sweep also deletes expired refresh leases (refresh_lease.py): claim()
+never releases its leases, so they would otherwise pile up.
+
+Configuration (environment variables):
+    CACHE_MAX_MB               Byte budget of the cache folder (default 512)
+    CACHE_RETENTION_HOURS      Per-indicator retention since last use,
+                               "sr=24,openinterest=168,candles=720"
+                               (listed indicators override these defaults;
+                               "default" applies to anything else)
+    CACHE_JANITOR_INTERVAL     Seconds between sweeps (default 300)
+"""
+
+import os
+import time
+import asyncio
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from cache_backend import CacheBackend
+from cache_format import CACHE_FORMAT_SUFFIX
+from cache_namespace import CacheNamespaces, indicator_family, split_generation
+from candle_indicators import INDICATORS
+from sqlite_store import SQLiteStore, SCHEMA_VERSION
+
+CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", "512"))
+CACHE_JANITOR_INTERVAL = float(os.getenv("CACHE_JANITOR_INTERVAL", "300"))
+
+DEFAULT_RETENTION_HOURS = {"sr": 24, "openinterest": 168, "candles": 720, "default": 168}
+
+# Ya no se guardan: se calculan de las velas (candle_indicators.INDICATORS)
+DERIVED_INDICATORS = set(INDICATORS)
+
+
+def parse_retention(spec: str) -> Dict[str, float]:
+    """"sr=24,candles=720" -> {"sr": 86400.0, ...} over the defaults, in seconds"""
+    hours = dict(DEFAULT_RETENTION_HOURS)
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            hours[name.strip()] = float(value)
+    return {name: h * 3600 for name, h in hours.items()}
+
+
+CACHE_RETENTION = parse_retention(os.getenv("CACHE_RETENTION_HOURS", ""))
+
+
+def key_matches(
+    cache_key: str,
+    symbol: Optional[str] = None,
+    interval: Optional[str] = None,
+    indicator: Optional[str] = None
+) -> bool:
+    """Whether "{symbol}_{interval}_{indicator}[~generation]" passes every given filter (indicator: exact or family)"""
+    parts = split_generation(cache_key)[0].split("_", 2)
+    if len(parts) != 3:
+        return False
+    if symbol is not None and parts[0] != symbol:
+        return False
+    if interval is not None and parts[1] != interval:
+        return False
+    return indicator is None or indicator in (parts[2], indicator_family(parts[2]))
+
+
+class CacheJanitor:
+    """Retention, byte budget (LRU) and selective invalidation for the cache folder"""
+
+    def __init__(
+        self,
+        directory: Path,
+        db: SQLiteStore,
+        namespaces: Optional[CacheNamespaces] = None,
+        backend: Optional[CacheBackend] = None,
+        max_bytes: int = int(CACHE_MAX_MB * 1024 * 1024),
+        retention: Optional[Dict[str, float]] = None,
+        interval_seconds: float = CACHE_JANITOR_INTERVAL
+    ):
+        self.directory = Path(directory)
+        self.db = db
+        self.namespaces = namespaces
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.retention = retention or CACHE_RETENTION
+        self.interval_seconds = interval_seconds
+        self._last_used: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self.last_sweep: Optional[Dict] = None
+        self.stats = {"sweeps": 0, "superseded": 0, "expired": 0, "evicted": 0, "invalidated": 0, "bytes_freed": 0, "leases_purged": 0, "errors": 0}
+
+    def touch(self, cache_key: str):
+        """Marks a cache key as used now (memory hits never reach the disk)"""
+        self._last_used[cache_key] = time.time()
+
+    # ---------- entradas ----------
+
+    def _files(self) -> List[Path]:
+        paths = [p for p in self.directory.glob("*") if p.suffix in (CACHE_FORMAT_SUFFIX, ".json")]
+        return paths + list((self.directory / "candles").glob("*_candles.json"))
+
+    def _entries(self) -> List[Dict]:
+        """Every cache entry: files and SQLite series, with size, last use and whether it is superseded"""
+        entries = []
+        # Hasta que la migración importe sus velas, los archivos de Volume Delta no se tocan
+        migrated = self.db.schema_version() >= SCHEMA_VERSION
+        # Las series importadas conservan el fetched_at de su archivo: su último uso es la importación
+        imported_at = self.db.legacy_imported_at()
+        for path in self._files():
+            base_key, generation = split_generation(path.stem)
+            parts = base_key.split("_", 2)
+            if len(parts) != 3:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Borrado entre el glob y el stat
+            if parts[2] in DERIVED_INDICATORS and not migrated:
+                continue
+            key = path.stem
+            entries.append({
+                "key": key, "symbol": parts[0], "interval": parts[1], "indicator": parts[2],
+                "path": path, "bytes": stat.st_size,
+                "last_used": max(stat.st_mtime, self._last_used.get(key, 0)),
+                "superseded": parts[2] in DERIVED_INDICATORS or generation < self._generation(parts[0], parts[2])
+            })
+
+        for kind, symbol, interval, fetched_at in self.db.list_series():
+            if kind in DERIVED_INDICATORS and not migrated:
+                continue
+            key = f"{symbol}_{interval}_{kind}"
+            entries.append({
+                "key": key, "symbol": symbol, "interval": interval, "indicator": kind,
+                "series": (kind, symbol, interval), "bytes": None,
+                "last_used": max(fetched_at / 1000, imported_at, self._last_used.get(key, 0)),
+                "superseded": kind in DERIVED_INDICATORS or fetched_at <= self._generation(symbol, kind)
+            })
+        return entries
+
+    def _generation(self, symbol: str, indicator: str) -> int:
+        return self.namespaces.generation(symbol, indicator) if self.namespaces else 0
+
+    def _folder_bytes(self) -> int:
+        """Cache files plus the space the SQLite store actually uses"""
+        total = 0
+        for path in self._files():
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+        return total + self.db.used_bytes()
+
+    def _remove(self, entry: Dict) -> int:
+        """Deletes one entry; returns the bytes freed"""
+        self._last_used.pop(entry["key"], None)
+        if "path" in entry:
+            try:
+                entry["path"].unlink()
+            except FileNotFoundError:
+                return 0
+            return entry["bytes"]
+
+        before = self.db.used_bytes()
+        self.db.delete_series(*entry["series"])
+        return max(0, before - self.db.used_bytes())
+
+    # ---------- barrido ----------
+
+    def sweep(self) -> Dict:
+        """One generation + retention + budget pass (blocking: call it from a worker thread)"""
+        started = time.time()
+        superseded = expired = evicted = freed = 0
+
+        # Entradas de backends sqlite vencidas (redis las vence solo, los archivos se listan abajo)
+        self.db.kv_purge_expired()
+        # Leases vencidos: claim() nunca los libera y sus nombres llevan la vela o el patrón
+        leases = self.backend.purge_expired_leases() if self.backend else self.db.purge_expired_leases()
+        self.stats["leases_purged"] += leases
+
+        entries = self._entries()
+        kept = []
+        for entry in entries:
+            family = indicator_family(entry["indicator"])
+            retention = self.retention.get(family, self.retention["default"])
+            if entry["superseded"]:
+                freed += self._remove(entry)
+                superseded += 1
+            elif started - entry["last_used"] > retention:
+                freed += self._remove(entry)
+                expired += 1
+            else:
+                kept.append(entry)
+
+        folder_bytes = self._folder_bytes()
+        # LRU: lo menos usado primero hasta volver al presupuesto
+        for entry in sorted(kept, key=lambda e: e["last_used"]):
+            if folder_bytes <= self.max_bytes:
+                break
+            released = self._remove(entry)
+            folder_bytes -= released
+            freed += released
+            evicted += 1
+
+        self.stats["sweeps"] += 1
+        self.stats["superseded"] += superseded
+        self.stats["expired"] += expired
+        self.stats["evicted"] += evicted
+        self.stats["bytes_freed"] += freed
+        self.last_sweep = {
+            "at": int(started),
+            "duration_ms": round((time.time() - started) * 1000, 1),
+            "entries": len(entries) - superseded - expired - evicted,
+            "folder_bytes": folder_bytes,
+            "superseded": superseded,
+            "expired": expired,
+            "evicted": evicted,
+            "bytes_freed": freed,
+            "leases_purged": leases
+        }
+        return self.last_sweep
+
+    def invalidate(
+        self,
+        symbol: Optional[str] = None,
+        interval: Optional[str] = None,
+        indicator: Optional[str] = None
+    ) -> Dict:
+        """
+        Deletes the entries matching every given filter (blocking: call it
+        from a worker thread). indicator matches exactly or by family, so
+        "sr" removes every support/resistance parameter combination.
+        """
+        removed = freed = 0
+        for entry in self._entries():
+            if not key_matches(entry["key"], symbol, interval, indicator):
+                continue
+            freed += self._remove(entry)
+            removed += 1
+
+        self.stats["invalidated"] += removed
+        self.stats["bytes_freed"] += freed
+        return {"removed": removed, "bytes_freed": freed}
+
+    # ---------- tarea en segundo plano ----------
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print(f"[CACHE JANITOR] Iniciado: presupuesto {self.max_bytes / 1024 / 1024:.0f} MB, cada {self.interval_seconds:.0f}s")
+
+    def request_sweep(self):
+        """Runs the next sweep now instead of waiting for the interval"""
+        self._wake.set()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                self._wake.clear()
+                result = await asyncio.to_thread(self.sweep)
+                if result["superseded"] or result["expired"] or result["evicted"]:
+                    print(f"[CACHE JANITOR] {result['superseded']} invalidadas, {result['expired']} vencidas, "
+                          f"{result['evicted']} desalojadas, {result['bytes_freed'] / 1024 / 1024:.1f} MB liberados")
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[CACHE JANITOR ERROR] {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def get_stats(self) -> Dict:
+        return {
+            "max_bytes": self.max_bytes,
+            "retention_hours": {name: seconds / 3600 for name, seconds in self.retention.items()},
+            "last_sweep": self.last_sweep,
+            **self.stats
+        }
@@ -0,0 +1,152 @@
+"""
+Cache Namespace Module
+
+Generation counters that make cache invalidation a constant-time write.
+Every cache entry belongs to a set of namespaces: global, its symbol, its
+indicator (exact name and family, so "sr" covers every support/resistance
+parameter combination) and the symbol+indicator pairs. Invalidating a scope
+bumps that namespace's generation; entries written under an older generation
+stop being found, and the cache janitor reclaims them later in the
+background.
+
+Generations are epoch milliseconds, always increasing. That lets one number
+serve both storage layouts:
+    indicator caches   the key carries the generation it was written under,
+                       "{symbol}_{interval}_{indicator}~{generation}"
+                       (no suffix while the generation is 0)
+    SQLite series      a series is current only if fetched after the generation
+
+The counters live in the cache backend, so every uvicorn worker sees a bump
+within CACHE_GENERATION_REFRESH seconds (the worker that bumps sees it at once).
+A background task (start) reloads them in a worker thread; key() and
+generation() only read the local copy, so the request path never waits on
+the backend.
+
+Configuration (environment variables):
+    CACHE_GENERATION_REFRESH   Seconds between reloads of the counters (default 1)
+"""
+
+import os
+import time
+import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from cache_backend import CacheBackend
+
+CACHE_GENERATION_REFRESH = float(os.getenv("CACHE_GENERATION_REFRESH", "1"))
+
+GENERATION_SEPARATOR = "~"
+
+
+def indicator_family(indicator: str) -> str:
+    """Group of an indicator: every "sr_<params>" cache is "sr" """
+    return "sr" if indicator.startswith("sr_") else indicator
+
+
+def scope_name(symbol: Optional[str] = None, indicator: Optional[str] = None) -> str:
+    """Namespace of a scope: "*", "symbol:BTCUSDT", "indicator:sr" or "symbol:BTCUSDT/indicator:sr" """
+    parts = []
+    if symbol:
+        parts.append(f"symbol:{symbol}")
+    if indicator:
+        parts.append(f"indicator:{indicator}")
+    return "/".join(parts) or "*"
+
+
+def entry_scopes(symbol: str, indicator: str) -> List[str]:
+    """Every namespace an entry of (symbol, indicator) belongs to"""
+    indicators = {indicator, indicator_family(indicator)}
+    scopes = [scope_name(), scope_name(symbol)]
+    for name in indicators:
+        scopes += [scope_name(indicator=name), scope_name(symbol, name)]
+    return scopes
+
+
+def split_generation(cache_key: str) -> Tuple[str, int]:
+    """"BTCUSDT_15_sr_x~1700000000000" -> ("BTCUSDT_15_sr_x", 1700000000000); no suffix -> generation 0"""
+    base, separator, generation = cache_key.rpartition(GENERATION_SEPARATOR)
+    if not separator or not generation.isdigit():
+        return cache_key, 0
+    return base, int(generation)
+
+
+def versioned_key(base_key: str, generation: int) -> str:
+    return f"{base_key}{GENERATION_SEPARATOR}{generation}" if generation else base_key
+
+
+class CacheNamespaces:
+    """Generation counters per namespace, cached locally and shared through the cache backend"""
+
+    def __init__(self, backend: CacheBackend, refresh_seconds: float = CACHE_GENERATION_REFRESH):
+        self.backend = backend
+        self.refresh_seconds = refresh_seconds
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"bumps": 0, "reloads": 0, "reload_errors": 0}
+
+    def reload(self):
+        """Reads the counters from the backend (blocking: call it from a worker thread)"""
+        try:
+            loaded = self.backend.load_generations()
+        except Exception as e:
+            # Backend caído: seguir con los últimos contadores conocidos
+            self.stats["reload_errors"] += 1
+            print(f"[CACHE NAMESPACE ERROR] {str(e)}")
+            return
+        with self._lock:
+            # Nunca retroceder: un bump local puede ser más nuevo que lo leído
+            for name, value in self._generations.items():
+                loaded[name] = max(loaded.get(name, 0), value)
+            self._generations = loaded
+        self.stats["reloads"] += 1
+
+    async def start(self):
+        if self._task is None:
+            # Primera carga antes de servir: sin ella todo se vería en la generación 0
+            await asyncio.to_thread(self.reload)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            await asyncio.to_thread(self.reload)
+
+    def generation(self, symbol: str, indicator: str) -> int:
+        """Current generation of an entry: the newest of its namespaces"""
+        generations = self._generations
+        return max(generations.get(scope, 0) for scope in entry_scopes(symbol, indicator))
+
+    def key(self, symbol: str, interval: str, indicator: str) -> str:
+        """Cache key of (symbol, interval, indicator) under the current generation"""
+        return versioned_key(f"{symbol}_{interval}_{indicator}", self.generation(symbol, indicator))
+
+    def bump(self, symbol: Optional[str] = None, indicator: Optional[str] = None) -> int:
+        """
+        Invalidates a scope (blocking: one backend write); returns its new generation
+
+        symbol and indicator are optional: neither is everything, both is one
+        indicator (or family) of one symbol.
+        """
+        name = scope_name(symbol, indicator)
+        generations = self._generations
+        # Mayor que cualquier generación vista: cada entrada escrita antes queda atrás
+        value = max(int(time.time() * 1000), max(generations.values(), default=0) + 1)
+        stored = self.backend.bump_generation(name, value)
+        with self._lock:
+            self._generations = {**self._generations, name: stored}
+        self.stats["bumps"] += 1
+        return stored
+
+    def get_stats(self) -> Dict:
+        return {"refresh_seconds": self.refresh_seconds, "generations": dict(self._generations), **self.stats}
@@ -0,0 +1,121 @@
+"""
+Cache Policy Module
+
+Interval-aware expiry for the indicator caches (volume delta, open interest,
+support/resistance) plus stale-while-revalidate.
+
+A value computed during a candle is fresh until that candle closes, plus a
+short grace so Bybit has published the closed candle. After that it is
+stale: it is still served immediately while a single background task per key
+recomputes it, for up to CACHE_STALE_INTERVALS more candle lengths. Anything
+older is expired and recomputed inline.
+
+Configuration (environment variables):
+    CACHE_EXPIRY_GRACE_SECONDS   Delay after the candle close (default 10)
+    CACHE_STALE_INTERVALS        Candle lengths a stale value may still be served (default 1)
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from candle_time import next_candle_close, MINUTE_MS
+
+logger = logging.getLogger(__name__)
+
+CACHE_EXPIRY_GRACE_SECONDS = float(os.getenv("CACHE_EXPIRY_GRACE_SECONDS", "10"))
+CACHE_STALE_INTERVALS = float(os.getenv("CACHE_STALE_INTERVALS", "1"))
+
+# Un worker que revalida una clave la reserva este tiempo frente a los demás
+REVALIDATE_CLAIM_SECONDS = 60
+
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+
+def cache_expiry(interval_minutes: int, fetched_at: float) -> Tuple[float, float]:
+    """
+    (expires_at, stale_until) in epoch seconds for a value computed at fetched_at
+
+    expires_at is the close of the candle in progress at fetched_at plus the
+    grace; stale_until adds CACHE_STALE_INTERVALS candle lengths.
+    """
+    close_ms = next_candle_close(interval_minutes, int(fetched_at * 1000))
+    expires_at = close_ms / 1000 + CACHE_EXPIRY_GRACE_SECONDS
+    stale_until = expires_at + interval_minutes * MINUTE_MS / 1000 * CACHE_STALE_INTERVALS
+    return expires_at, stale_until
+
+
+def cache_state(interval_minutes: int, fetched_at: float, now: Optional[float] = None) -> str:
+    """FRESH, STALE or EXPIRED"""
+    now = time.time() if now is None else now
+    expires_at, stale_until = cache_expiry(interval_minutes, fetched_at)
+    if now < expires_at:
+        return FRESH
+    if now < stale_until:
+        return STALE
+    return EXPIRED
+
+
+class Revalidator:
+    """
+    Background refreshes of stale cache entries, at most one in flight per key
+
+    claim, if set, is an async (key, ttl) -> bool that lets only one worker
+    process run each revalidation (see refresh_lease.RefreshCoordinator.claim).
+    """
+
+    def __init__(self, claim: Optional[Callable[[Hashable, float], Awaitable[bool]]] = None):
+        self.claim = claim
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {"scheduled": 0, "deduplicated": 0, "completed": 0, "failed": 0, "claimed_elsewhere": 0}
+
+    def schedule(self, key: Hashable, refresh: Callable[[], Awaitable]) -> bool:
+        """Starts refresh() in the background unless one is already running for key"""
+        task = self._tasks.get(key)
+        if task is not None and not task.done():
+            self.stats["deduplicated"] += 1
+            return False
+
+        self._tasks[key] = asyncio.create_task(self._run(key, refresh))
+        self.stats["scheduled"] += 1
+        return True
+
+    async def _run(self, key: Hashable, refresh: Callable[[], Awaitable]):
+        try:
+            if self.claim is not None and not await self.claim(("revalidate", key), REVALIDATE_CLAIM_SECONDS):
+                self.stats["claimed_elsewhere"] += 1
+                return
+            result = await refresh()
+            # Los endpoints no lanzan excepciones: devuelven {"success": False}
+            if isinstance(result, dict) and result.get("success") is False:
+                self.stats["failed"] += 1
+                logger.warning(f"⚠️ Revalidation failed for {key}: {result.get('error') or result.get('message')}")
+            else:
+                self.stats["completed"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"❌ Revalidation error for {key}: {e}")
+        finally:
+            self._tasks.pop(key, None)
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def get_stats(self) -> Dict:
+        return {
+            "in_flight": len(self._tasks),
+            "grace_seconds": CACHE_EXPIRY_GRACE_SECONDS,
+            "stale_intervals": CACHE_STALE_INTERVALS,
+            **self.stats
+        }
+
+
+revalidator = Revalidator()
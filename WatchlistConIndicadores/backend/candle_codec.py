@@ -0,0 +1,119 @@
+"""
+Candle Codec Module
+
+Bulk decoding of Bybit kline rows (arrays of strings) into numeric columns
+in a single pass, plus the conversions the endpoints need on top of them:
+per-candle records and Colombia local-time strings.
+
+Colombia has a fixed UTC-5 offset (no DST), so local time is plain
+arithmetic on the timestamp; only the date part is formatted, once per day.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List
+
+COLOMBIA_OFFSET_MS = -5 * 60 * 60 * 1000
+DAY_MS = 24 * 60 * 60 * 1000
+
+CANDLE_COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+
+
+def decode_klines(rows: List[List[str]]) -> Dict[str, List]:
+    """
+    Converts raw kline rows into numeric columns
+
+    Args:
+        rows: Bybit rows [start, open, high, low, close, volume, turnover, ...]
+
+    Returns:
+        Dict with "timestamp" (int ms) and "open"/"high"/"low"/"close"/"volume"
+        (float) lists, in the same order as the rows
+    """
+    if not rows:
+        return {name: [] for name in CANDLE_COLUMNS}
+
+    # Transponer una vez y convertir cada columna con map (sin bucle por vela)
+    ts, o, h, l, c, v = list(zip(*rows))[:6]
+    return {
+        "timestamp": list(map(int, ts)),
+        "open": list(map(float, o)),
+        "high": list(map(float, h)),
+        "low": list(map(float, l)),
+        "close": list(map(float, c)),
+        "volume": list(map(float, v))
+    }
+
+
+# Segundo del día -> "HH:MM:SS" (máx. 86400 entradas; las velas caen en pocos valores)
+_TIME_OF_DAY: Dict[int, str] = {}
+
+
+def format_colombia_times(timestamps: List[int]) -> List[str]:
+    """Formats UTC ms timestamps as "%Y-%m-%d %H:%M:%S" in Colombia time"""
+    result = []
+    day_cache: Dict[int, str] = {}
+
+    for ts in timestamps:
+        day, ms_of_day = divmod(ts + COLOMBIA_OFFSET_MS, DAY_MS)
+
+        date = day_cache.get(day)
+        if date is None:
+            date = day_cache[day] = datetime.fromtimestamp(day * 86400, tz=timezone.utc).strftime("%Y-%m-%d ")
+
+        seconds = ms_of_day // 1000
+        clock = _TIME_OF_DAY.get(seconds)
+        if clock is None:
+            clock = _TIME_OF_DAY[seconds] = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+        result.append(date + clock)
+
+    return result
+
+
+def last_candle_in_progress(timestamps: List[int], interval_minutes: int, now_ms: int) -> bool:
+    """Only the newest candle can still be open"""
+    return bool(timestamps) and now_ms - timestamps[-1] < interval_minutes * 60 * 1000
+
+
+def candles_to_records(
+    columns: Dict[str, List],
+    interval_minutes: int,
+    now_ms: int,
+    local_time: bool = True
+) -> List[Dict]:
+    """
+    Builds the per-candle dicts returned by /api/historical
+
+    Args:
+        columns: Output of decode_klines
+        interval_minutes: Candle size in minutes
+        now_ms: Reference time for the in-progress flag
+        local_time: Include "datetime_colombia"
+
+    Returns:
+        List of candle dicts (timestamp, OHLCV, in_progress[, datetime_colombia])
+    """
+    timestamps = columns["timestamp"]
+
+    if local_time:
+        records = [
+            {"timestamp": ts, "open": o, "high": h, "low": l, "close": c, "volume": v,
+             "in_progress": False, "datetime_colombia": dt}
+            for ts, o, h, l, c, v, dt in zip(
+                timestamps, columns["open"], columns["high"], columns["low"],
+                columns["close"], columns["volume"], format_colombia_times(timestamps)
+            )
+        ]
+    else:
+        records = [
+            {"timestamp": ts, "open": o, "high": h, "low": l, "close": c, "volume": v, "in_progress": False}
+            for ts, o, h, l, c, v in zip(
+                timestamps, columns["open"], columns["high"], columns["low"],
+                columns["close"], columns["volume"]
+            )
+        ]
+
+    if last_candle_in_progress(timestamps, interval_minutes, now_ms):
+        records[-1]["in_progress"] = True
+
+    return records
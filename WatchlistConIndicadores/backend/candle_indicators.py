@@ -0,0 +1,103 @@
+"""
+Candle Indicators Module
+
+Indicators that are pure functions of a candle window (volume delta / CVD)
+computed on demand from the shared candle series that /api/historical
+serves, instead of being downloaded again and stored as a cache family of
+their own.
+
+Results are memoised in a byte-bounded LRU (memory_cache.MemoryCache) per
+(symbol, interval, indicator), together with the version of the window they
+were computed from. Closed candles never change, so a window is identified
+by its length, its first and last open time and the close/volume of its
+last (possibly in-progress) candle. When only that last candle moved, the
+memoised points are kept and the indicator is extended from it.
+
+Configuration (environment variables):
+    CANDLE_MEMO_MAX_MB   Byte budget of the memoised results (default 32)
+"""
+
+import os
+import bisect
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cvd_engine import candle_columns, compute_volume_delta, volume_delta_points
+from memory_cache import MemoryCache
+
+CANDLE_MEMO_MAX_MB = float(os.getenv("CANDLE_MEMO_MAX_MB", "32"))
+
+# Memoria de un punto memoizado (dict + floats, medido con benchmarks/candle_indicators.py):
+# el presupuesto de la memo se cuenta así
+POINT_BYTES = 228
+
+
+def series_version(candles: List[Dict]) -> Tuple:
+    """Identity of a candle window (/api/historical records)"""
+    if not candles:
+        return (0,)
+    last = candles[-1]
+    return (len(candles), candles[0]["timestamp"], last["timestamp"], last["close"], last["volume"])
+
+
+def volume_delta_series(columns: Dict[str, List], previous: Optional[List[Dict]] = None) -> List[Dict]:
+    """
+    Volume delta / CVD points of a window, the CVD starting at its first candle
+
+    previous: points of an earlier version of the same window; if it starts
+    at the same candle and its last candle is still in the window, only the
+    candles from that one on are computed (bit-for-bit the full result)
+    """
+    timestamps = columns["timestamp"]
+    resume = 0
+    if previous and timestamps and previous[0]["timestamp"] == timestamps[0]:
+        last = len(previous) - 1
+        i = bisect.bisect_left(timestamps, previous[last]["timestamp"])
+        if i == last and i < len(timestamps) and timestamps[i] == previous[last]["timestamp"]:
+            resume = i
+
+    carry = previous[resume - 1]["cvd"] if resume else 0.0
+    deltas, cvds = compute_volume_delta(
+        columns["open"][resume:], columns["close"][resume:], columns["volume"][resume:], carry
+    )
+    head = previous[:resume] if resume else []
+    return head + volume_delta_points(timestamps[resume:], columns["volume"][resume:], deltas, cvds)
+
+
+# indicador -> fn(columnas, puntos de la versión anterior o None)
+INDICATORS: Dict[str, Callable[[Dict[str, List], Optional[List[Dict]]], List[Dict]]] = {
+    "volumedelta": volume_delta_series,
+}
+
+
+class CandleIndicators:
+    """On-demand candle indicators, memoised per series version"""
+
+    def __init__(self, max_bytes: int = int(CANDLE_MEMO_MAX_MB * 1024 * 1024)):
+        self.memo = MemoryCache(max_bytes)
+        self.stats = {"memo_hits": 0, "computed": 0, "extended": 0}
+
+    def get(self, symbol: str, interval: str, indicator: str, candles: List[Dict], refresh: bool = False) -> Tuple[List[Dict], bool]:
+        """
+        (points, memo hit) of an indicator over /api/historical records
+
+        The points are shared with the memo: treat them as read-only.
+        refresh=True recomputes the whole window even if memoised.
+        """
+        key = f"{symbol}_{interval}_{indicator}"
+        version = series_version(candles)
+
+        entry = None if refresh else self.memo.get(key)
+        if entry is not None and entry[0] == version:
+            self.stats["memo_hits"] += 1
+            return entry[1], True
+
+        previous = entry[1] if entry is not None else None
+        points = INDICATORS[indicator](candle_columns(candles), previous)
+        if previous and points and points[0] is previous[0]:
+            self.stats["extended"] += 1
+        self.stats["computed"] += 1
+        self.memo.put(key, (version, points), len(points) * POINT_BYTES)
+        return points, False
+
+    def get_stats(self) -> Dict:
+        return {"indicators": list(INDICATORS), **self.stats, "memo": self.memo.get_stats()}
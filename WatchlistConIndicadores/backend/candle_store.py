@@ -0,0 +1,250 @@
+"""
+Candle Store Module
+
+Persistent append-only store of raw Bybit klines per (symbol, interval),
+kept in the SQLite store (see sqlite_store.py). Once a window has been
+downloaded, later requests only fetch the tail since the last closed candle,
+overwrite the in-progress candle and upsert it into the stored series. When a live source (the backend's Bybit WebSocket ring
+buffers) already holds that tail, no REST call is made at all. A tail longer
+than the page cap (MAX_KLINE_PAGES) would leave a permanent hole, so the
+whole window is downloaded again instead.
+
+If any page of a download fails, nothing is written (the stored coverage,
+tail and fetched_at stay as they were) and CandleFetchError is raised, so
+the endpoint reports the error instead of a window with a gap.
+
+A minute timeframe that is not stored yet is first built by resampling a
+finer stored series of the same symbol (see resampler.py); only when no
+base covers the window is it downloaded from Bybit.
+
+SQLite reads and writes run in a worker thread (asyncio.to_thread): a write
+waits up to the busy timeout for another worker's transaction, and that
+must not stall this worker's event loop.
+
+Configuration (environment variables):
+    CANDLE_RESAMPLE   "0" to always download each timeframe (default "1")
+"""
+
+import os
+import time
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from kline_fetcher import fetch_kline_window, first_page_start, MAX_KLINE_PAGES, BYBIT_KLINE_LIMIT
+from resampler import base_candidates, resample_klines
+from sqlite_store import SQLiteStore, CANDLES
+
+CANDLE_RESAMPLE = os.getenv("CANDLE_RESAMPLE", "1") != "0"
+
+# Máximo de velas retenidas por serie (lo mismo que cabe en una ventana completa)
+MAX_STORED_CANDLES = MAX_KLINE_PAGES * BYBIT_KLINE_LIMIT
+
+
+class CandleFetchError(Exception):
+    """A kline page failed upstream; the window was not stored"""
+
+
+class CandleStore:
+    """Per-(symbol, interval) kline series persisted in the SQLite store"""
+
+    def __init__(self, db: SQLiteStore, max_candles: int = MAX_STORED_CANDLES, live_source=None):
+        self.db = db
+        self.live_source = live_source
+        self.max_candles = max_candles
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self.stats = {"full_fetches": 0, "tail_fetches": 0, "live_tails": 0, "range_fetches": 0, "tail_gaps": 0, "resampled": 0, "shared_refreshes": 0, "upstream_requests": 0, "fetch_errors": 0}
+
+    def _check(self, symbol: str, interval: str, request_count: int, error: Optional[str]):
+        """Raises CandleFetchError if a page failed (before anything is written)"""
+        if error is not None:
+            self.stats["upstream_requests"] += request_count
+            self.stats["fetch_errors"] += 1
+            raise CandleFetchError(f"Bybit kline {symbol} {interval}: {error}")
+
+    async def _tail_start(self, symbol: str, interval: str, series: Dict, step_ms: int) -> int:
+        """First candle that was still open when the series was last fetched"""
+        last_closed = await asyncio.to_thread(
+            self.db.candle_open_time, symbol, interval, at_most=series["fetched_at"] - step_ms
+        )
+        if last_closed is not None:
+            return last_closed + step_ms
+        return await asyncio.to_thread(self.db.candle_open_time, symbol, interval)
+
+    async def get_window(
+        self,
+        symbol: str,
+        interval: str,
+        start_ms: int,
+        end_ms: int,
+        interval_minutes: int,
+        refreshed_after: Optional[int] = None
+    ) -> Tuple[List[List[str]], int]:
+        """
+        Returns raw klines in [start_ms, end_ms], fetching only what is missing
+
+        Args:
+            symbol: Trading pair symbol
+            interval: Bybit interval ("15", "60", "D", ...)
+            start_ms: Window start (ms)
+            end_ms: Window end (ms)
+            interval_minutes: Candle size in minutes
+            refreshed_after: fetched_at the caller saw before waiting for another
+                worker's refresh; if the stored series is newer and covers the
+                window it is returned as is, without any upstream call
+
+        Returns:
+            (raw rows ascending by timestamp, number of upstream requests)
+
+        Raises:
+            CandleFetchError: a page failed; the stored series is untouched
+        """
+        key = (symbol, interval)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        step_ms = interval_minutes * 60 * 1000
+
+        async with lock:
+            series = await asyncio.to_thread(self.db.get_series, CANDLES, symbol, interval)
+            if (refreshed_after is not None and series and series["fetched_at"] > refreshed_after
+                    and series["covered_from"] <= start_ms):
+                # Otro worker acaba de refrescar la serie en el store compartido
+                self.stats["shared_refreshes"] += 1
+                return await asyncio.to_thread(self.db.read_candles, symbol, interval, start_ms, end_ms), 0
+
+            fetched_at = int(time.time() * 1000)
+
+            tail_start = live = None
+            if series and series["covered_from"] <= start_ms:
+                # Solo la cola: desde la primera vela que seguía abierta
+                tail_start = await self._tail_start(symbol, interval, series, step_ms)
+                live = self.live_source.get_tail(symbol, interval, tail_start) if self.live_source else None
+                if live is None and first_page_start(tail_start, end_ms, interval_minutes) > tail_start:
+                    # La cola supera el tope de páginas: quedaría un hueco permanente
+                    self.stats["tail_gaps"] += 1
+                    print(f"[CANDLE STORE] {symbol} {interval} cola de más de {MAX_KLINE_PAGES} páginas, descargando la ventana completa")
+                    tail_start = None
+
+            if tail_start is not None:
+                if live is not None:
+                    # La cola ya está en el ring buffer del WebSocket
+                    rows, as_of = live
+                    request_count = 0
+                    fetched_at = min(fetched_at, as_of)
+                    self.stats["live_tails"] += 1
+                else:
+                    rows, request_count, error = await fetch_kline_window(
+                        symbol, interval, tail_start, end_ms, interval_minutes
+                    )
+                    self._check(symbol, interval, request_count, error)
+                    self.stats["tail_fetches"] += 1
+                    print(f"[CANDLE STORE] {symbol} {interval} cola: {len(rows)} velas nuevas en {request_count} requests")
+
+                # La cola almacenada se reemplaza por la recién obtenida
+                replace_from = tail_start
+                covered_from = series["covered_from"]
+            else:
+                resampled = await self._resample_from_base(symbol, interval, start_ms, end_ms) if CANDLE_RESAMPLE else None
+                if resampled is not None:
+                    # Construida localmente desde una serie más fina del mismo par
+                    rows, fetched_at = resampled
+                    request_count = 0
+                    self.stats["resampled"] += 1
+                else:
+                    rows, request_count, error = await fetch_kline_window(
+                        symbol, interval, start_ms, end_ms, interval_minutes
+                    )
+                    self._check(symbol, interval, request_count, error)
+                    self.stats["full_fetches"] += 1
+                # Lo almacenado fuera de la ventana descargada se conserva (upsert),
+                # pero la cobertura empieza donde empieza lo descargado
+                replace_from = None
+                covered_from = start_ms if resampled is not None else first_page_start(start_ms, end_ms, interval_minutes)
+
+            self.stats["upstream_requests"] += request_count
+
+            await asyncio.to_thread(
+                self.db.write_candles, symbol, interval, rows, covered_from, fetched_at,
+                replace_from=replace_from, max_candles=self.max_candles
+            )
+
+        if self.live_source:
+            self.live_source.subscribe(symbol, interval)
+
+        # Lectura por rango sobre el índice (symbol, interval, ts)
+        return await asyncio.to_thread(self.db.read_candles, symbol, interval, start_ms, end_ms), request_count
+
+    async def _resample_from_base(
+        self,
+        symbol: str,
+        interval: str,
+        start_ms: int,
+        end_ms: int
+    ) -> Optional[Tuple[List[List[str]], int]]:
+        """
+        Target klines aggregated from the coarsest stored finer series that
+        covers the window (its tail is refreshed first)
+
+        Returns:
+            (rows, fetched_at of the base) or None if no base covers the window
+        """
+        target_minutes = int(interval)
+        step_ms = target_minutes * 60 * 1000
+        # Desde el inicio del bucket que contiene start_ms
+        bucket_start = start_ms // step_ms * step_ms
+
+        for base_interval in base_candidates(interval):
+            base = await asyncio.to_thread(self.db.get_series, CANDLES, symbol, base_interval)
+            if not base or base["covered_from"] > bucket_start:
+                continue
+
+            base_minutes = int(base_interval)
+            base_rows, _ = await self.get_window(symbol, base_interval, bucket_start, end_ms, base_minutes)
+            fetched_at = (await asyncio.to_thread(self.db.get_series, CANDLES, symbol, base_interval))["fetched_at"]
+
+            rows = resample_klines(
+                base_rows, base_minutes, target_minutes,
+                open_bucket_start=(fetched_at - 1) // step_ms * step_ms
+            )
+            print(f"[CANDLE STORE] {symbol} {interval} remuestreado desde {base_interval}: {len(rows)} velas")
+            return rows, fetched_at
+
+        return None
+
+    async def get_closed_range(
+        self,
+        symbol: str,
+        interval: str,
+        start_ms: int,
+        end_ms: int,
+        interval_minutes: int
+    ) -> List[List[str]]:
+        """
+        Raw klines with open time in [start_ms, end_ms) for already closed history
+
+        Served from the stored series when it already holds every candle of
+        the range as closed; ranges older than the stored coverage are fetched
+        directly and not merged, so the stored series never has gaps.
+        """
+        step_ms = interval_minutes * 60 * 1000
+        series = await asyncio.to_thread(self.db.get_series, CANDLES, symbol, interval)
+
+        if series and series["covered_from"] <= start_ms:
+            if await self._tail_start(symbol, interval, series, step_ms) >= end_ms:
+                return await asyncio.to_thread(self.db.read_candles, symbol, interval, start_ms, end_ms - 1)
+            rows, _ = await self.get_window(symbol, interval, start_ms, end_ms - 1, interval_minutes)
+            return rows
+
+        rows, request_count, error = await fetch_kline_window(symbol, interval, start_ms, end_ms - 1, interval_minutes)
+        self._check(symbol, interval, request_count, error)
+        self.stats["range_fetches"] += 1
+        self.stats["upstream_requests"] += request_count
+        return [r for r in rows if start_ms <= int(r[0]) < end_ms]
+
+    def clear(self) -> int:
+        """Drops every stored series"""
+        return self.db.clear(CANDLES)
+
+    def get_stats(self) -> Dict:
+        return {
+            "series_stored": self.db.count_series(CANDLES),
+            **self.stats
+        }
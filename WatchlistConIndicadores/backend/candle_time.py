@@ -0,0 +1,32 @@
+"""
+Candle Time Module
+
+Helpers to locate candle boundaries for the Bybit intervals used by the app.
+Minute and daily candles are aligned to the Unix epoch (UTC); weekly candles
+open on Monday 00:00 UTC.
+"""
+
+MINUTE_MS = 60 * 1000
+WEEK_MINUTES = 10080
+
+# 1970-01-01 fue jueves: las velas semanales de Bybit abren el lunes 1970-01-05
+WEEK_OFFSET_MS = 4 * 24 * 60 * MINUTE_MS
+
+
+def candle_open_time(interval_minutes: int, ts_ms: int) -> int:
+    """Open time of the candle containing ts_ms"""
+    step_ms = interval_minutes * MINUTE_MS
+    offset = WEEK_OFFSET_MS if interval_minutes == WEEK_MINUTES else 0
+    return (ts_ms - offset) // step_ms * step_ms + offset
+
+
+def next_candle_close(interval_minutes: int, now_ms: int) -> int:
+    """Close time (= next open) of the candle in progress at now_ms"""
+    return candle_open_time(interval_minutes, now_ms) + interval_minutes * MINUTE_MS
+
+
+def chunk_open_time(interval_minutes: int, ts_ms: int, candles_per_chunk: int) -> int:
+    """Start of the fixed block of candles_per_chunk candles containing ts_ms"""
+    span_ms = interval_minutes * MINUTE_MS * candles_per_chunk
+    offset = WEEK_OFFSET_MS if interval_minutes == WEEK_MINUTES else 0
+    return (ts_ms - offset) // span_ms * span_ms + offset
@@ -0,0 +1,278 @@
+"""
+Response Compression Module
+
+ASGI middleware that compresses API responses with zstd, brotli or gzip
+(whichever the client accepts and is installed, in that order of
+preference), with a size threshold and compression levels per route
+pattern. Streaming responses are compressed incrementally and flushed per
+chunk so each streamed line still reaches the client immediately.
+
+Per-encoding ratio and compression time are collected for /api/status.
+
+Configuration (environment variables):
+    COMPRESSION_ENABLED     "0" to disable (default "1")
+    COMPRESSION_MIN_SIZE    Default threshold in bytes (default 1024)
+    COMPRESSION_GZIP_LEVEL  Default gzip level 1-9 (default 6)
+    COMPRESSION_BR_QUALITY  Default brotli quality 0-11 (default 5)
+    COMPRESSION_ZSTD_LEVEL  Default zstd level 1-22 (default 3)
+
+brotli and zstandard are optional; without them only gzip is offered.
+"""
+
+import os
+import time
+import zlib
+import fnmatch
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") != "0"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+DEFAULT_LEVELS = {
+    "gzip": int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+    "br": int(os.getenv("COMPRESSION_BR_QUALITY", "5")),
+    "zstd": int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+}
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/octet-stream", "text/")
+
+
+def available_encodings() -> List[str]:
+    """Encodings this process can produce, in order of preference"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, encodings: List[str]) -> Optional[str]:
+    """Best server-preferred encoding the client accepts (q=0 excluded)"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def merge_vary(values: List[bytes]) -> bytes:
+    """Vary header listing the response's own fields plus Accept-Encoding"""
+    fields = [f.strip() for v in values for f in v.split(b",") if f.strip()]
+    if b"*" in fields:
+        return b"*"
+    if not any(f.lower() == b"accept-encoding" for f in fields):
+        fields.append(b"Accept-Encoding")
+    return b", ".join(fields)
+
+
+class _Compressor:
+    """Incremental compressor with a common compress/flush/finish interface"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=level)
+        else:
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        if self.encoding == "gzip":
+            out = self._obj.compress(data)
+            return out + self._obj.flush(zlib.Z_SYNC_FLUSH) if flush else out
+        if self.encoding == "br":
+            out = self._obj.process(data)
+            return out + self._obj.flush() if flush else out
+        out = self._obj.compress(data)
+        return out + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else out
+
+    def finish(self) -> bytes:
+        if self.encoding == "gzip":
+            return self._obj.flush(zlib.Z_FINISH)
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class CompressionStats:
+    """Bytes in/out and compression time per encoding and per route"""
+
+    def __init__(self):
+        self.by_encoding: Dict[str, Dict] = {}
+        self.by_route: Dict[str, Dict] = {}
+        self.skipped = {"below_threshold": 0, "not_accepted": 0, "not_compressible": 0}
+
+    @staticmethod
+    def _bump(bucket: Dict, bytes_in: int, bytes_out: int, seconds: float):
+        bucket["responses"] = bucket.get("responses", 0) + 1
+        bucket["bytes_in"] = bucket.get("bytes_in", 0) + bytes_in
+        bucket["bytes_out"] = bucket.get("bytes_out", 0) + bytes_out
+        bucket["compress_ms"] = bucket.get("compress_ms", 0.0) + seconds * 1000
+
+    def record(self, encoding: str, route: str, bytes_in: int, bytes_out: int, seconds: float):
+        self._bump(self.by_encoding.setdefault(encoding, {}), bytes_in, bytes_out, seconds)
+        self._bump(self.by_route.setdefault(route, {}), bytes_in, bytes_out, seconds)
+
+    @staticmethod
+    def _summary(bucket: Dict) -> Dict:
+        return {
+            "responses": bucket["responses"],
+            "bytes_in": bucket["bytes_in"],
+            "bytes_out": bucket["bytes_out"],
+            "ratio": round(bucket["bytes_in"] / bucket["bytes_out"], 2) if bucket["bytes_out"] else None,
+            "compress_ms_total": round(bucket["compress_ms"], 2),
+            "compress_ms_avg": round(bucket["compress_ms"] / bucket["responses"], 3)
+        }
+
+    def get_stats(self) -> Dict:
+        return {
+            "by_encoding": {k: self._summary(v) for k, v in self.by_encoding.items()},
+            "by_route": {k: self._summary(v) for k, v in self.by_route.items()},
+            "skipped": dict(self.skipped)
+        }
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses according to per-route rules
+
+    Args:
+        app: ASGI application
+        routes: {path_pattern: {"min_size": int, "levels": {"gzip": 6, "br": 5, "zstd": 3}}}
+            Patterns are fnmatch globs ("/api/historical*"); the longest
+            matching pattern wins and unmatched paths use the defaults.
+        min_size: Default threshold in bytes
+        levels: Default level per encoding
+    """
+
+    def __init__(
+        self,
+        app,
+        routes: Optional[Dict[str, Dict]] = None,
+        min_size: int = COMPRESSION_MIN_SIZE,
+        levels: Optional[Dict[str, int]] = None,
+        stats: CompressionStats = compression_stats
+    ):
+        self.app = app
+        self.routes = sorted((routes or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.min_size = min_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.stats = stats
+        self.encodings = available_encodings()
+
+    def _rule(self, path: str) -> Tuple[str, int, Dict[str, int]]:
+        for pattern, rule in self.routes:
+            if fnmatch.fnmatchcase(path, pattern):
+                return pattern, rule.get("min_size", self.min_size), {**self.levels, **rule.get("levels", {})}
+        return "default", self.min_size, self.levels
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        encoding = choose_encoding(headers.get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            self.stats.skipped["not_accepted"] += 1
+            await self.app(scope, receive, send)
+            return
+
+        route, min_size, levels = self._rule(scope.get("path", ""))
+        state = {"start": None, "compressor": None, "passthrough": False, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if state["compressor"] is None:
+                start = state["start"]
+                response_headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in start["headers"]}
+                content_type = response_headers.get("content-type", "")
+
+                skip = None
+                if "content-encoding" in response_headers or start["status"] in (204, 304):
+                    skip = "not_compressible"
+                elif not content_type.startswith(COMPRESSIBLE_TYPES):
+                    skip = "not_compressible"
+                elif not more_body and len(body) < min_size:
+                    skip = "below_threshold"
+
+                if skip:
+                    self.stats.skipped[skip] += 1
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                state["compressor"] = _Compressor(encoding, levels[encoding])
+                new_headers = [
+                    (k, v) for k, v in start["headers"]
+                    if k.lower() not in (b"content-length", b"vary")
+                ]
+                new_headers.append((b"content-encoding", encoding.encode()))
+                # Se conserva el Vary de la respuesta y se le añade Accept-Encoding
+                new_headers.append((b"vary", merge_vary([v for k, v in start["headers"] if k.lower() == b"vary"])))
+                # El cuerpo cambia: el ETag fuerte pasa a débil (como hace nginx)
+                new_headers = [
+                    (k, b"W/" + v if k.lower() == b"etag" and not v.startswith(b"W/") else v)
+                    for k, v in new_headers
+                ]
+
+                t0 = time.perf_counter()
+                if more_body:
+                    out = state["compressor"].compress(body, flush=True)
+                else:
+                    out = state["compressor"].compress(body, flush=False) + state["compressor"].finish()
+                    new_headers.append((b"content-length", str(len(out)).encode()))
+                state["seconds"] += time.perf_counter() - t0
+
+                await send({**start, "headers": new_headers})
+            else:
+                t0 = time.perf_counter()
+                out = state["compressor"].compress(body, flush=more_body)
+                if not more_body:
+                    out += state["compressor"].finish()
+                state["seconds"] += time.perf_counter() - t0
+
+            state["bytes_in"] += len(body)
+            state["bytes_out"] += len(out)
+            await send({"type": "http.response.body", "body": out, "more_body": more_body})
+
+            if not more_body:
+                self.stats.record(encoding, route, state["bytes_in"], state["bytes_out"], state["seconds"])
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,109 @@
+"""
+CVD Engine Module
+
+Volume delta and cumulative volume delta (CVD) over candle columns. The delta
+of a candle is +volume when it closes at or above its open and -volume
+otherwise; the CVD is the running sum of the deltas.
+
+Columns that are NumPy arrays go through two vector operations (np.where
+and np.cumsum); Python lists, which is what the endpoints hold, go through a
+single loop, because converting them to arrays and back costs more than the
+vector math saves (see benchmarks/cvd_engine.py). Both paths add in float64
+from left to right, starting from `carry`, exactly like the original
+per-candle loop, so the output is bit-for-bit identical to it. Passing the
+last CVD of a stored series as carry extends that series with only the new
+candles.
+
+NumPy is optional: without it every column takes the loop.
+
+compute_trade_delta is the same running sum over taker buy/sell volume
+aggregated from trades (trade_aggregator.py) instead of the candle colour.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def candle_columns(candles: List[Dict]) -> Dict[str, List]:
+    """timestamp / open / close / volume columns of /api/historical records"""
+    return {
+        name: [candle[name] for candle in candles]
+        for name in ("timestamp", "open", "close", "volume")
+    }
+
+
+def compute_volume_delta(
+    opens: Sequence[float],
+    closes: Sequence[float],
+    volumes: Sequence[float],
+    carry: float = 0.0
+) -> Tuple[List[float], List[float]]:
+    """
+    (volume deltas, CVD) of a run of candles, as lists
+
+    Args:
+        carry: CVD of the candle right before the run (0 for a new series)
+    """
+    if np is None or not isinstance(volumes, np.ndarray):
+        deltas = []
+        cvds = []
+        cvd = carry
+        for o, c, v in zip(opens, closes, volumes):
+            delta = v if c >= o else -v
+            cvd += delta
+            deltas.append(delta)
+            cvds.append(cvd)
+        return deltas, cvds
+
+    deltas = np.where(
+        np.asarray(closes, dtype=np.float64) >= np.asarray(opens, dtype=np.float64),
+        volumes.astype(np.float64, copy=False),
+        -volumes.astype(np.float64, copy=False)
+    )
+    # cumsum suma en orden; empezar por carry reproduce 0 + (-0.0) == 0.0 del bucle
+    cvds = np.cumsum(np.concatenate(([carry], deltas)))[1:]
+    return deltas.tolist(), cvds.tolist()
+
+
+def volume_delta_points(
+    timestamps: Sequence[int],
+    volumes: Sequence[float],
+    deltas: Sequence[float],
+    cvds: Sequence[float]
+) -> List[Dict]:
+    """Points returned by /api/volume-delta (memoised by candle_indicators.py)"""
+    return [
+        {"timestamp": ts, "volumeDelta": delta, "cvd": cvd, "volume": volume}
+        for ts, delta, cvd, volume in zip(timestamps, deltas, cvds, volumes)
+    ]
+
+
+def compute_trade_delta(
+    buys: Sequence[float],
+    sells: Sequence[float],
+    carry: float = 0.0
+) -> Tuple[List[float], List[float]]:
+    """(taker buy - sell volume, CVD) of a run of trade-aggregated candles"""
+    deltas = []
+    cvds = []
+    cvd = carry
+    for buy, sell in zip(buys, sells):
+        delta = buy - sell
+        cvd += delta
+        deltas.append(delta)
+        cvds.append(cvd)
+    return deltas, cvds
+
+
+def trade_delta_points(buckets: Sequence[Tuple], carry: float = 0.0) -> List[Dict]:
+    """/api/volume-delta?source=trades points from (open time, buy, sell, trades, complete) buckets"""
+    deltas, cvds = compute_trade_delta([b[1] for b in buckets], [b[2] for b in buckets], carry)
+    return [
+        {"timestamp": ts, "volumeDelta": delta, "cvd": cvd, "volume": buy + sell,
+         "buyVolume": buy, "sellVolume": sell, "trades": trades, "complete": complete}
+        for (ts, buy, sell, trades, complete), delta, cvd in zip(buckets, deltas, cvds)
+    ]
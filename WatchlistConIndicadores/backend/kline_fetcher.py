@@ -0,0 +1,137 @@
+"""
+Kline Fetcher Module
+
+Fetches long Bybit kline windows by planning every page up front and
+requesting them concurrently (bounded by a semaphore) through the shared
+Bybit client, then merging, de-duplicating and ordering the results.
+"""
+
+import os
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from bybit_client import bybit_client
+
+# Máximo de velas por request permitido por Bybit
+BYBIT_KLINE_LIMIT = 1000
+
+# Páginas en vuelo a la vez por cada ventana histórica
+KLINE_PAGE_CONCURRENCY = int(os.getenv("KLINE_PAGE_CONCURRENCY", "4"))
+
+# Mismo tope de requests que usaba el bucle secuencial
+MAX_KLINE_PAGES = 10
+
+
+def plan_kline_pages(
+    start_ms: int,
+    end_ms: int,
+    interval_minutes: int,
+    limit_per_request: int = BYBIT_KLINE_LIMIT,
+    max_pages: int = MAX_KLINE_PAGES
+) -> List[Dict]:
+    """
+    Splits [start_ms, end_ms] into consecutive kline pages
+
+    Each page spans exactly `limit_per_request` candles, so no page can
+    return more than the limit regardless of candle alignment.
+
+    Args:
+        start_ms: Window start (ms)
+        end_ms: Window end (ms)
+        interval_minutes: Candle size in minutes
+        limit_per_request: Max candles per page
+        max_pages: Hard cap on the number of pages
+
+    Returns:
+        List of pages: {start, end, limit}, oldest first
+    """
+    if end_ms <= start_ms or limit_per_request <= 0:
+        return []
+
+    step_ms = interval_minutes * 60 * 1000
+    page_span_ms = step_ms * limit_per_request
+
+    pages = []
+    page_start = start_ms
+    while page_start <= end_ms:
+        page_end = min(page_start + page_span_ms - 1, end_ms)
+        pages.append({"start": page_start, "end": page_end, "limit": limit_per_request})
+        page_start = page_end + 1
+
+    # Si la ventana supera el tope, conservar las páginas más recientes
+    if len(pages) > max_pages:
+        pages = pages[-max_pages:]
+
+    return pages
+
+
+def first_page_start(
+    start_ms: int,
+    end_ms: int,
+    interval_minutes: int,
+    limit_per_request: int = BYBIT_KLINE_LIMIT,
+    max_pages: int = MAX_KLINE_PAGES
+) -> int:
+    """Oldest ms a capped fetch of [start_ms, end_ms] covers (start_ms if nothing is cut)"""
+    pages = plan_kline_pages(start_ms, end_ms, interval_minutes, limit_per_request, max_pages)
+    return pages[0]["start"] if pages else start_ms
+
+
+def merge_kline_pages(pages: List[List[List[str]]]) -> List[List[str]]:
+    """Merges raw Bybit kline pages into one ascending, de-duplicated list"""
+    by_ts = {}
+    for batch in pages:
+        for row in batch:
+            by_ts[int(row[0])] = row
+    return [by_ts[ts] for ts in sorted(by_ts)]
+
+
+async def fetch_kline_window(
+    symbol: str,
+    interval: str,
+    start_ms: int,
+    end_ms: int,
+    interval_minutes: int,
+    limit_per_request: int = BYBIT_KLINE_LIMIT,
+    concurrency: int = KLINE_PAGE_CONCURRENCY
+) -> Tuple[List[List[str]], int, Optional[str]]:
+    """
+    Fetches every kline page of a window concurrently
+
+    Args:
+        symbol: Trading pair symbol
+        interval: Bybit interval ("15", "60", "D", ...)
+        start_ms: Window start (ms)
+        end_ms: Window end (ms)
+        interval_minutes: Candle size in minutes
+        limit_per_request: Max candles per page
+        concurrency: Max pages in flight at once
+
+    Returns:
+        (raw rows ascending by timestamp, number of upstream requests, error
+        message of the first failed page or None). With an error the rows
+        have a gap: the caller must not store them as a complete window.
+    """
+    pages = plan_kline_pages(start_ms, end_ms, interval_minutes, limit_per_request)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch_page(page: Dict) -> Tuple[List[List[str]], Optional[str]]:
+        async with semaphore:
+            data = await bybit_client.get_json("/v5/market/kline", params={
+                "category": "linear",
+                "symbol": symbol,
+                "interval": interval,
+                "start": page["start"],
+                "end": page["end"],
+                "limit": page["limit"]
+            })
+
+        if data.get("retCode") != 0:
+            print(f"[ERROR {symbol}] Bybit error: {data.get('retMsg')}")
+            return [], data.get("retMsg") or "Unknown error"
+
+        return data["result"]["list"] or [], None
+
+    results = await asyncio.gather(*(fetch_page(p) for p in pages))
+    error = next((e for _, e in results if e is not None), None)
+    return merge_kline_pages([rows for rows, _ in results]), len(pages), error
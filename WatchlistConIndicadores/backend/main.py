@@ -1,12 +1,31 @@
 # -*- coding: utf-8 -*-
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import httpx
 import asyncio
 import time
 import json
+import bisect
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
+from typing import Optional
+from bybit_client import bybit_client, initialize_bybit_client, shutdown_bybit_client
+from singleflight import upstream_flight
+from candle_store import CandleStore
+from bybit_stream import bybit_stream
+from candle_codec import decode_klines, candles_to_records, format_colombia_times
+from response_format import format_response
+from compression import CompressionMiddleware, compression_stats
+from memory_cache import MemoryCache, json_size
+from sqlite_store import sqlite_store, kline_rows, CANDLES, OPEN_INTEREST, SCHEMA_VERSION
+from cache_policy import cache_state, cache_expiry, revalidator, STALE, EXPIRED
+from cache_janitor import CacheJanitor, key_matches
+from cache_namespace import CacheNamespaces
+from cvd_engine import trade_delta_points
+from candle_indicators import CandleIndicators
+from trade_aggregator import TradeAggregator
+from cache_backend import create_cache_backend, CACHE_BACKEND
+from refresh_lease import RefreshCoordinator
+from candle_time import candle_open_time, chunk_open_time
 
 app = FastAPI(
     title="Crypto Watchlist Backend",
@@ -22,12 +41,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión zstd/br/gzip de las respuestas grandes (velas, indicadores, S/R)
+app.add_middleware(
+    CompressionMiddleware,
+    routes={
+        "/api/historical*": {"min_size": 1024},
+        "/api/volume-delta*": {"min_size": 1024},
+        "/api/open-interest*": {"min_size": 1024},
+        "/api/support-resistance*": {"min_size": 1024, "levels": {"gzip": 7, "br": 6, "zstd": 6}},
+        # Bloques inmutables: se comprimen una vez y los cachea el navegador/proxy
+        "/api/historical/*/chunk/*": {"min_size": 512, "levels": {"gzip": 9, "br": 9, "zstd": 12}}
+    }
+)
+
 COLOMBIA_TZ = timezone(timedelta(hours=-5))
 CACHE_DIR = Path("cache")
 CACHE_DIR.mkdir(exist_ok=True)
 
-# Cache reducido a 30 minutos para datos más frescos
-CACHE_MAX_AGE = 1800  # 30 minutos en segundos
+# Series de velas crudas en SQLite; solo se descarga la cola desde la última vela
+# cerrada (o se toma del ring buffer del WebSocket de Bybit si ya la tiene)
+candle_store = CandleStore(sqlite_store, live_source=bybit_stream)
+
+# Volume Delta / CVD: calculados de la serie de velas compartida, memoizados por versión
+candle_indicators = CandleIndicators()
+
+# Volumen taker comprador/vendedor por vela a partir de los trades públicos
+# (Volume Delta real, /api/volume-delta?source=trades)
+trade_aggregator = TradeAggregator(sqlite_store, subscribe=bybit_stream.subscribe_trades)
+bybit_stream.add_listener(trade_aggregator.on_stream_update)
+
+# Los caches de indicadores vencen al cierre de la vela en curso (+ gracia) y
+# después se sirven "stale" mientras se recalculan en segundo plano (cache_policy.py)
+
+# Capa LRU en memoria delante del backend de cache (S/R)
+memory_cache = MemoryCache()
+
+# Backend del cache (file / sqlite / redis, ver CACHE_BACKEND) y leases entre workers:
+# solo un worker de uvicorn hace cada refresco a Bybit, los demás leen el resultado
+cache_backend = create_cache_backend(CACHE_BACKEND, CACHE_DIR, sqlite_store)
+refresh_coordinator = RefreshCoordinator(cache_backend)
+revalidator.claim = refresh_coordinator.claim
+
+# Generaciones por namespace (global / símbolo / indicador): invalidar es subir un
+# contador; las claves y series de generaciones anteriores dejan de encontrarse
+cache_namespaces = CacheNamespaces(cache_backend)
+sqlite_store.generation = cache_namespaces.generation
+
+# Retención por indicador, presupuesto de bytes de CACHE_DIR y limpieza de
+# generaciones viejas (barrido en segundo plano)
+cache_janitor = CacheJanitor(CACHE_DIR, sqlite_store, cache_namespaces, backend=cache_backend)
 
 # Límites máximos de días por timeframe
 MAX_DAYS_BY_INTERVAL = {
@@ -43,78 +105,76 @@ MAX_DAYS_BY_INTERVAL = {
     "W": 730,    # 1 semana -> máx 730 días
 }
 
-def load_cache(symbol: str, interval: str, indicator: str):
-    """Carga datos del cache si existen y son recientes"""
-    cache_file = CACHE_DIR / f"{symbol}_{interval}_{indicator}.json"
-    if cache_file.exists():
-        try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if 'timestamp' in data:
-                    cache_age = time.time() - data['timestamp']
-                    if cache_age < CACHE_MAX_AGE:
-                        return data
-                    else:
-                        print(f"[CACHE EXPIRED] {symbol} {interval} {indicator} - {cache_age:.0f}s old")
-        except Exception as e:
-            print(f"[CACHE ERROR] {symbol} {interval} {indicator}: {str(e)}")
-    return None
-
-def save_cache(symbol: str, interval: str, indicator: str, data: dict):
-    """Guarda datos en cache con timestamp"""
+async def load_cache(symbol: str, interval: str, indicator: str):
+    """Carga datos del cache si no han expirado, aunque estén stale (memoria primero, luego el backend)"""
+    cache_key = cache_namespaces.key(symbol, interval, indicator)
+    cache_janitor.touch(cache_key)
+    memory_data = None
+    data = memory_cache.get(cache_key)
+    if data is not None:
+        if cache_state(get_interval_minutes(interval), data['timestamp']) != STALE:
+            return data
+        # Stale en memoria: quizá otro worker ya lo revalidó en el backend compartido
+        memory_data = data
+
+    try:
+        # Backend file: .wlc binario (los .json antiguos se migran al vuelo); sqlite/redis: mismos bytes.
+        # En un hilo: flock, SQLite o el socket de redis no deben bloquear el event loop
+        stored = await asyncio.to_thread(cache_backend.get, cache_key)
+        data = stored[0] if stored else None
+        if data is not None and 'timestamp' in data:
+            interval_minutes = get_interval_minutes(interval)
+            if cache_state(interval_minutes, data['timestamp']) != EXPIRED:
+                _, stale_until = cache_expiry(interval_minutes, data['timestamp'])
+                size = await asyncio.to_thread(json_size, data)
+                memory_cache.put(cache_key, data, size, stored_at=data['timestamp'], ttl=stale_until - data['timestamp'])
+                return data
+            else:
+                print(f"[CACHE EXPIRED] {symbol} {interval} {indicator} - {time.time() - data['timestamp']:.0f}s old")
+    except Exception as e:
+        print(f"[CACHE ERROR] {symbol} {interval} {indicator}: {str(e)}")
+    return memory_data
+
+async def save_cache(symbol: str, interval: str, indicator: str, data: dict):
+    """Guarda datos en cache con timestamp (memoria + backend)"""
     data['timestamp'] = time.time()
-    cache_file = CACHE_DIR / f"{symbol}_{interval}_{indicator}.json"
-    with open(cache_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def calculate_volume_delta(candles_data):
-    """Calcula Volume Delta y CVD a partir de datos de velas"""
-    klines = []
-    cvd = 0
-    
-    for candle in candles_data:
-        open_price = candle['open']
-        close_price = candle['close']
-        volume = candle['volume']
-        
-        if close_price >= open_price:
-            volume_delta = volume
-        else:
-            volume_delta = -volume
-        
-        cvd += volume_delta
-        
-        kline = {
-            'timestamp': candle['timestamp'],
-            'open': open_price,
-            'high': candle['high'],
-            'low': candle['low'],
-            'close': close_price,
-            'volume': volume,
-            'volumeDelta': volume_delta,
-            'cvd': cvd
-        }
-        klines.append(kline)
-    
-    return klines
+    cache_key = cache_namespaces.key(symbol, interval, indicator)
+    _, stale_until = cache_expiry(get_interval_minutes(interval), data['timestamp'])
+    await asyncio.to_thread(cache_backend.set, cache_key, data, ttl=stale_until - data['timestamp'])
+    # La memoria se cuenta por el JSON, no por los bytes comprimidos del backend
+    size = await asyncio.to_thread(json_size, data)
+    memory_cache.put(cache_key, data, size, stored_at=data['timestamp'], ttl=stale_until - data['timestamp'])
 
 @app.get("/api/status")
 def status():
     now_utc = datetime.now(timezone.utc)
     now_colombia = now_utc.astimezone(COLOMBIA_TZ)
     
-    cache_files = list(CACHE_DIR.glob("*_volumedelta.json"))
-    
     return {
         "status": "ok",
         "time_utc": int(now_utc.timestamp()),
         "time_colombia": now_colombia.strftime("%Y-%m-%d %H:%M:%S"),
         "timezone": "America/Bogota (UTC-5)",
-        "cache_files": len(cache_files),
+        "cache_files": sqlite_store.count_series(CANDLES),
         "version": "2.5.0 - FIX: Volume Delta respeta límites por timeframe",
-        "cache_duration": "30 minutos",
-        "cache_max_age_seconds": CACHE_MAX_AGE,
-        "max_days_limits": MAX_DAYS_BY_INTERVAL
+        "cache_duration": "hasta el cierre de la vela en curso + gracia, luego stale-while-revalidate",
+        "cache_revalidation": revalidator.get_stats(),
+        "max_days_limits": MAX_DAYS_BY_INTERVAL,
+        "upstream": bybit_client.get_stats(),
+        "singleflight": upstream_flight.get_stats(),
+        "candle_store": candle_store.get_stats(),
+        "prefetch": prefetch_scheduler.get_stats(),
+        "stream": bybit_stream.get_stats(),
+        "fanout": fanout_hub.get_stats(),
+        "compression": compression_stats.get_stats(),
+        "memory_cache": memory_cache.get_stats(),
+        "candle_indicators": candle_indicators.get_stats(),
+        "sqlite_store": sqlite_store.get_stats(),
+        "cache_janitor": cache_janitor.get_stats(),
+        "cache_backend": cache_backend.get_stats(),
+        "refresh_leases": refresh_coordinator.get_stats(),
+        "cache_namespaces": cache_namespaces.get_stats(),
+        "trade_aggregator": trade_aggregator.get_stats()
     }
 
 INTERVAL_MAP = {
@@ -138,20 +198,28 @@ def get_interval_minutes(interval: str) -> int:
     else:
         return int(interval)
 
+def normalize_interval(interval: str) -> str:
+    """Convierte "15m", "4h", "1d"... al intervalo de Bybit ("15", "240", "D")"""
+    interval_clean = (
+        interval.replace("m", "")
+        .replace("h", "")
+        .replace("d", "D")
+        .replace("w", "W")
+    )
+
+    if "h" in interval.lower() and interval_clean.isdigit():
+        interval_clean = str(int(interval_clean) * 60)
+
+    return INTERVAL_MAP.get(interval_clean, "15")
+
+def points_since(points: list, since: int) -> list:
+    """Puntos con timestamp >= since (incluye la última fila que el cliente ya tenía, revisada)"""
+    return points[bisect.bisect_left(points, since, key=lambda p: p["timestamp"]):]
+
 @app.get("/api/historical/{symbol}")
-async def get_historical(symbol: str, interval: str = "15", days: int = 30):
+async def get_historical(symbol: str, interval: str = "15", days: int = 30, local_time: bool = True, since: Optional[int] = None, format: str = "json"):
     try:
-        interval_clean = (
-            interval.replace("m", "")
-            .replace("h", "")
-            .replace("d", "D")
-            .replace("w", "W")
-        )
-        
-        if "h" in interval.lower() and interval_clean.isdigit():
-            interval_clean = str(int(interval_clean) * 60)
-        
-        interval_final = INTERVAL_MAP.get(interval_clean, "15")
+        interval_final = normalize_interval(interval)
 
         # CRÍTICO: Aplicar límite máximo por timeframe
         max_days_allowed = MAX_DAYS_BY_INTERVAL.get(interval_final, 30)
@@ -163,97 +231,58 @@ async def get_historical(symbol: str, interval: str = "15", days: int = 30):
         minutes_in_period = days_to_fetch * 24 * 60
         total_candles_needed = int(minutes_in_period / interval_minutes)
         
-        # CRÍTICO: Limitar a 1000 velas por request (máximo de Bybit)
-        limit_per_request = min(1000, total_candles_needed)
-        
         now_ms = int(time.time() * 1000)
         # Buffer de 10 minutos al futuro
         end_ms = now_ms + (10 * 60 * 1000)
         start_ms = now_ms - (days_to_fetch * 24 * 60 * 60 * 1000)
 
-        all_candles = []
-        current_start = start_ms
-        
-        async with httpx.AsyncClient(timeout=30) as client:
-            request_count = 0
-            max_requests = 10
-            
-            while len(all_candles) < total_candles_needed and request_count < max_requests:
-                request_count += 1
-                candles_remaining = total_candles_needed - len(all_candles)
-                fetch_limit = min(limit_per_request, candles_remaining)
-                
-                url = (
-                    "https://api.bybit.com/v5/market/kline?"
-                    f"category=linear&symbol={symbol}&interval={interval_final}"
-                    f"&start={current_start}&limit={fetch_limit}"
-                )
-                
-                r = await client.get(url)
-                data = r.json()
-
-                if data.get("retCode") != 0:
-                    print(f"[ERROR {symbol}] Bybit error: {data.get('retMsg')}")
-                    break
-
-                batch_candles = data["result"]["list"]
-                if not batch_candles:
-                    break
-                
-                batch_candles.reverse()
-                all_candles.extend(batch_candles)
-                
-                last_candle_ts = int(batch_candles[-1][0])
-                current_start = last_candle_ts + (interval_minutes * 60 * 1000)
-                
-                if current_start >= end_ms:
-                    break
-                
-                # Si ya tenemos suficientes velas, salir
-                if len(all_candles) >= total_candles_needed:
-                    break
-                
-                await asyncio.sleep(0.1)
-
-        candles = []
-        current_time_utc = int(time.time() * 1000)
-        
-        for c in all_candles:
-            ts_ms = int(c[0])
-            
-            open_ = float(c[1])
-            high = float(c[2])
-            low = float(c[3])
-            close = float(c[4])
-            volume = float(c[5])
-            
-            ts_seconds = ts_ms / 1000
-            dt_utc = datetime.fromtimestamp(ts_seconds, tz=timezone.utc)
-            dt_colombia = dt_utc.astimezone(COLOMBIA_TZ)
-            
-            time_diff_minutes = (current_time_utc - ts_ms) / (1000 * 60)
-            is_in_progress = time_diff_minutes < interval_minutes
-            
-            candles.append({
-                "timestamp": ts_ms,
-                "open": open_,
-                "high": high,
-                "low": low,
-                "close": close,
-                "volume": volume,
-                "in_progress": is_in_progress,
-                "datetime_colombia": dt_colombia.strftime("%Y-%m-%d %H:%M:%S")
-            })
+        # since=<timestamp>: solo velas desde el cursor (la del cursor va revisada)
+        if since is not None:
+            start_ms = max(start_ms, since)
+
+        cache_janitor.touch(f"{symbol}_{interval_final}_candles")
+
+        # Lo que este worker ve en el store antes de esperar a otro worker
+        seen = await asyncio.to_thread(sqlite_store.get_series, CANDLES, symbol, interval_final)
+        seen_at = seen["fetched_at"] if seen else -1
+
+        def window(refreshed_after=None):
+            return candle_store.get_window(
+                symbol,
+                interval_final,
+                start_ms,
+                end_ms,
+                interval_minutes,
+                refreshed_after=refreshed_after
+            )
+
+        # El store devuelve la ventana y solo pide a Bybit la cola que falta
+        # (páginas de máx. 1000 velas en paralelo)
+        # Peticiones idénticas concurrentes comparten una sola descarga (en este
+        # worker: singleflight; entre workers: lease, los demás leen del store)
+        all_candles, request_count = await upstream_flight.do(
+            ("kline", symbol, interval_final, days_to_fetch, since),
+            lambda: refresh_coordinator.run(
+                ("kline", symbol, interval_final),
+                window,
+                lambda: window(refreshed_after=seen_at)
+            )
+        )
 
         # CRÍTICO: Limitar resultado final al número exacto de velas solicitadas
-        if len(candles) > total_candles_needed:
-            candles = candles[-total_candles_needed:]
+        if len(all_candles) > total_candles_needed:
+            all_candles = all_candles[-total_candles_needed:]
+
+        # Decodificación en bloque; solo la última vela puede estar en curso
+        columns = decode_klines(all_candles)
+        candles = candles_to_records(columns, interval_minutes, int(time.time() * 1000), local_time=local_time)
 
         now_colombia = datetime.now(COLOMBIA_TZ)
         
-        print(f"[{symbol}] Historical: ✅ Devolviendo {len(candles)} velas (esperadas: {total_candles_needed})")
+        print(f"[{symbol}] Historical: ✅ Devolviendo {len(candles)} velas (esperadas: {total_candles_needed}) en {request_count} requests")
         
-        return {
+        # format=columnar|binary: mismo contenido, codificación más compacta
+        return format_response({
             "symbol": symbol,
             "interval": interval_final,
             "data": candles,
@@ -265,8 +294,10 @@ async def get_historical(symbol: str, interval: str = "15", days: int = 30):
             "requested_candles": total_candles_needed,
             "days_requested": days,
             "days_fetched": days_to_fetch,
-            "max_days_allowed": max_days_allowed
-        }
+            "max_days_allowed": max_days_allowed,
+            "since": since,
+            "cursor": candles[-1]["timestamp"] if candles else since
+        }, format)
 
     except Exception as e:
         print(f"[ERROR {symbol}] {str(e)}")
@@ -278,21 +309,49 @@ async def get_historical(symbol: str, interval: str = "15", days: int = 30):
             "success": False
         }
 
+def trade_volume_delta(symbol: str, interval_final: str, expected_candles: int, since: Optional[int]) -> dict:
+    """
+    Volume Delta real: volumen taker comprador - vendedor de cada vela, agregado
+    de los trades. Solo hay datos desde que el símbolo se empezó a agregar.
+    """
+    base = {"symbol": symbol, "interval": interval_final, "indicator": "volumeDelta", "source": "trades"}
+    if interval_final not in trade_aggregator.intervals:
+        return {**base, "data": [], "success": False,
+                "error": f"Intervalo {interval_final} no agregado desde trades (TRADE_INTERVALS={','.join(trade_aggregator.intervals)})"}
+    if not trade_aggregator.track(symbol):
+        return {**base, "data": [], "success": False,
+                "error": f"Límite de {trade_aggregator.max_symbols} símbolos agregados alcanzado (TRADE_MAX_SYMBOLS)"}
+
+    interval_minutes = get_interval_minutes(interval_final)
+    start_ms = (candle_open_time(interval_minutes, int(time.time() * 1000))
+                - (expected_candles - 1) * interval_minutes * 60 * 1000)
+    processed_data = trade_delta_points(trade_aggregator.get_buckets(symbol, interval_final, start_ms))
+
+    if since is not None:
+        processed_data = points_since(processed_data, since)
+
+    return {
+        **base,
+        "data": processed_data,
+        "success": True,
+        "total_points": len(processed_data),
+        "complete_since": trade_aggregator.listening_since.get(symbol),
+        "since": since,
+        "cursor": processed_data[-1]["timestamp"] if processed_data else since
+    }
+
+
 @app.get("/api/volume-delta/{symbol}")
-async def get_volume_delta(symbol: str, interval: str = "15", days: int = 30):
-    """Endpoint para obtener Volume Delta con límites por timeframe"""
+async def get_volume_delta(symbol: str, interval: str = "15", days: int = 30, refresh: bool = False, since: Optional[int] = None,
+                           format: str = "json", source: str = "candles"):
+    """
+    Endpoint para obtener Volume Delta con límites por timeframe (refresh=True recalcula toda la ventana)
+
+    source="candles" asigna todo el volumen de la vela según su color;
+    source="trades" usa el volumen taker comprador/vendedor agregado de los trades.
+    """
     try:
-        interval_clean = (
-            interval.replace("m", "")
-            .replace("h", "")
-            .replace("d", "D")
-            .replace("w", "W")
-        )
-        
-        if "h" in interval.lower() and interval_clean.isdigit():
-            interval_clean = str(int(interval_clean) * 60)
-        
-        interval_final = INTERVAL_MAP.get(interval_clean, "15")
+        interval_final = normalize_interval(interval)
         
         # CRÍTICO: Aplicar límite máximo por timeframe (IGUAL QUE EN HISTORICAL)
         max_days_allowed = MAX_DAYS_BY_INTERVAL.get(interval_final, 30)
@@ -304,52 +363,17 @@ async def get_volume_delta(symbol: str, interval: str = "15", days: int = 30):
         interval_minutes = get_interval_minutes(interval_final)
         minutes_in_period = days_to_fetch * 24 * 60
         expected_candles = int(minutes_in_period / interval_minutes)
+
+        if source == "trades":
+            result = trade_volume_delta(symbol, interval_final, expected_candles, since)
+            if result["success"]:
+                result.update({"days_requested": days, "days_fetched": days_to_fetch, "max_days_allowed": max_days_allowed})
+                return format_response(result, format)
+            return result
         
-        # Intentar cargar del cache
-        cached_data = load_cache(symbol, interval_final, "volumedelta")
-        
-        if cached_data and cached_data.get("symbol") == symbol and cached_data.get("timeframe") == interval_final:
-            klines = cached_data.get("klines", [])
-            cache_age = time.time() - cached_data.get('timestamp', 0)
-            
-            if len(klines) > 0:
-                print(f"[CACHE CHECK] {symbol} {interval_final} - Cache: {len(klines)} velas, Necesita: {expected_candles} velas, Age: {cache_age:.0f}s")
-                
-                # Si el cache tiene suficientes velas para days_to_fetch, usarlo
-                if len(klines) >= expected_candles:
-                    klines_to_return = klines[-expected_candles:]
-                    
-                    processed_data = []
-                    for candle in klines_to_return:
-                        processed_data.append({
-                            "timestamp": candle["timestamp"],
-                            "volumeDelta": candle.get("volumeDelta", 0),
-                            "cvd": candle.get("cvd", 0),
-                            "volume": candle["volume"]
-                        })
-                    
-                    print(f"[CACHE HIT] ✅ {symbol} {interval_final} devolviendo {len(processed_data)} velas desde cache")
-                    
-                    return {
-                        "symbol": symbol,
-                        "interval": interval_final,
-                        "indicator": "volumeDelta",
-                        "data": processed_data,
-                        "success": True,
-                        "from_cache": True,
-                        "cache_age_seconds": int(cache_age),
-                        "total_points": len(processed_data),
-                        "days_requested": days,
-                        "days_fetched": days_to_fetch,
-                        "max_days_allowed": max_days_allowed
-                    }
-                else:
-                    print(f"[CACHE MISS] ❌ {symbol} {interval_final} - Cache insuficiente, recalculando...")
-        
-        # Recalcular - USAR days_to_fetch (limitado)
-        print(f"[CALCULATING] {symbol} {interval_final} Volume Delta con {days_to_fetch} días")
-        
-        historical = await get_historical(symbol, interval_final, days_to_fetch)
+        # Las velas salen del candle store compartido (solo se descarga la cola que falta);
+        # el Volume Delta es función pura de ellas y no se guarda aparte
+        historical = await get_historical(symbol, interval_final, days_to_fetch, local_time=False)
         
         if not historical.get('success') or not historical.get('data'):
             print(f"[ERROR] No se pudieron obtener datos históricos para {symbol}")
@@ -359,47 +383,35 @@ async def get_volume_delta(symbol: str, interval: str = "15", days: int = 30):
                 "indicator": "volumeDelta",
                 "data": [],
                 "success": False,
-                "message": "No se pudieron obtener datos históricos"
+                "message": "No se pudieron obtener datos históricos",
+                "error": historical.get("error")
             }
         
-        candles_data = historical['data']
-        print(f"[CALCULATING] Obtenidos {len(candles_data)} velas, calculando Volume Delta...")
-        
-        klines = calculate_volume_delta(candles_data)
-        
-        # Guardar en cache
-        cache_data = {
-            "symbol": symbol,
-            "timeframe": interval_final,
-            "klines": klines
-        }
-        save_cache(symbol, interval_final, "volumedelta", cache_data)
-        print(f"[CACHE SAVED] {symbol} {interval_final} Volume Delta guardado ({len(klines)} velas)")
-        
-        processed_data = []
-        for candle in klines:
-            processed_data.append({
-                "timestamp": candle["timestamp"],
-                "volumeDelta": candle["volumeDelta"],
-                "cvd": candle["cvd"],
-                "volume": candle["volume"]
-            })
+        processed_data, memo_hit = candle_indicators.get(
+            symbol, interval_final, "volumedelta", historical['data'], refresh=refresh
+        )
+        print(f"[{'MEMO HIT' if memo_hit else 'CALCULATED'}] {symbol} {interval_final} Volume Delta sobre {len(processed_data)} velas")
+
+        if since is not None:
+            processed_data = points_since(processed_data, since)
         
         print(f"[SUCCESS] {symbol} {interval_final} Volume Delta: {len(processed_data)} puntos")
         
-        return {
+        return format_response({
             "symbol": symbol,
             "interval": interval_final,
             "indicator": "volumeDelta",
             "data": processed_data,
             "success": True,
-            "from_cache": False,
-            "calculated": True,
+            "from_cache": memo_hit,
+            "calculated": not memo_hit,
             "total_points": len(processed_data),
             "days_requested": days,
             "days_fetched": days_to_fetch,
-            "max_days_allowed": max_days_allowed
-        }
+            "max_days_allowed": max_days_allowed,
+            "since": since,
+            "cursor": processed_data[-1]["timestamp"] if processed_data else since
+        }, format)
         
     except Exception as e:
         print(f"[ERROR] Volume Delta {symbol}: {str(e)}")
@@ -412,20 +424,24 @@ async def get_volume_delta(symbol: str, interval: str = "15", days: int = 30):
         }
 
 @app.post("/api/clear-cache")
-async def clear_cache():
-    """Endpoint para limpiar el cache manualmente"""
+async def clear_cache(symbol: Optional[str] = None, indicator: Optional[str] = None):
+    """
+    Invalida el cache completo, un símbolo, un indicador o un indicador de un símbolo
+
+    Solo sube el contador de generación del namespace (una escritura, sin importar
+    el tamaño del cache). indicator acepta el nombre exacto o la familia ("sr" =
+    todos los S/R). Las entradas viejas las borra el janitor en segundo plano.
+    """
     try:
-        cache_files = list(CACHE_DIR.glob("*.json"))
-        deleted_count = 0
-        
-        for cache_file in cache_files:
-            cache_file.unlink()
-            deleted_count += 1
-        
+        symbol = symbol.upper() if symbol else None
+        generation = await asyncio.to_thread(cache_namespaces.bump, symbol, indicator)
+        cache_janitor.request_sweep()
+
         return {
             "success": True,
-            "message": f"Cache limpiado: {deleted_count} archivos eliminados",
-            "deleted_files": deleted_count
+            "message": "Cache invalidado; los archivos viejos se borran en segundo plano",
+            "scope": {"symbol": symbol, "indicator": indicator},
+            "generation": generation
         }
     except Exception as e:
         return {
@@ -433,19 +449,61 @@ async def clear_cache():
             "error": str(e)
         }
 
+@app.post("/api/cache/invalidate")
+async def invalidate_cache(symbol: Optional[str] = None, interval: Optional[str] = None, indicator: Optional[str] = None):
+    """
+    Invalida solo las entradas de cache que cumplan todos los filtros dados
+
+    indicator: nombre exacto ("volumedelta", "openinterest", "candles") o familia ("sr" = todos los S/R);
+    "volumedelta" solo está en memoria (se recalcula de las velas)
+    """
+    try:
+        if symbol is None and interval is None and indicator is None:
+            return {"success": False, "message": "Indica symbol, interval y/o indicator (o usa /api/clear-cache)"}
+
+        symbol = symbol.upper() if symbol else None
+        interval = normalize_interval(interval) if interval else None
+
+        memory_removed = memory_cache.invalidate_where(lambda key: key_matches(key, symbol, interval, indicator))
+        memory_removed += candle_indicators.memo.invalidate_where(lambda key: key_matches(key, symbol, interval, indicator))
+        # Borrado de archivos y filas en un hilo: no bloquea el event loop
+        result = await asyncio.to_thread(cache_janitor.invalidate, symbol, interval, indicator)
+
+        return {
+            "success": True,
+            "filters": {"symbol": symbol, "interval": interval, "indicator": indicator},
+            "removed": result["removed"],
+            "bytes_freed": result["bytes_freed"],
+            "memory_entries_removed": memory_removed
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 @app.post("/api/upload-cache/{symbol}")
 async def upload_cache(symbol: str, interval: str, data: dict):
-    """Endpoint para subir datos al cache manualmente"""
+    """
+    Endpoint para subir velas al cache manualmente
+
+    Acepta el formato de los antiguos *_volumedelta.json ({"symbol", "timeframe",
+    "klines": [{timestamp, open, high, low, close, volume, ...}]}); las klines
+    reemplazan la serie de velas del candle store y el Volume Delta se calcula de ellas.
+    """
     try:
         if "klines" not in data or "symbol" not in data or "timeframe" not in data:
             return {"success": False, "message": "Estructura inválida"}
+        if not data["klines"]:
+            return {"success": False, "message": "Sin klines"}
 
-        save_cache(symbol, interval, "volumedelta", data)
+        symbol = symbol.upper()
+        interval = normalize_interval(interval)
+        rows = kline_rows(data["klines"])
+        await asyncio.to_thread(sqlite_store.delete_series, CANDLES, symbol, interval)
+        await asyncio.to_thread(sqlite_store.write_candles, symbol, interval, rows, int(rows[0][0]), int(time.time() * 1000))
 
         return {
             "success": True,
             "message": f"Datos cargados para {symbol} {interval}",
-            "candles": len(data["klines"])
+            "candles": len(rows)
         }
 
     except Exception as e:
@@ -520,6 +578,10 @@ async def detect_rejection_patterns(request: Request):
         if config.get('alertsEnabled', False):
             for pattern_data in serialized_patterns:
                 if pattern_data['confidence'] >= config.get('filters', {}).get('minConfidence', 60):
+                    # Un solo aviso por patrón aunque varios workers/clientes lo detecten
+                    alert_key = ("alert", symbol, interval, pattern_data['timestamp'], pattern_data['patternType'])
+                    if not await refresh_coordinator.claim(alert_key, 3600):
+                        continue
                     await send_pattern_alert(
                         symbol,
                         interval,
@@ -903,7 +965,8 @@ async def get_support_resistance(
     right_bars: int = 15,
     min_touches: int = 1,
     cluster_distance: float = 0.5,
-    max_levels: int = 20
+    max_levels: int = 20,
+    refresh: bool = False
 ):
     """
     Endpoint para detectar niveles de Soporte y Resistencia con volumen significativo
@@ -920,29 +983,29 @@ async def get_support_resistance(
         - min_touches: Mínimo de toques para considerar nivel válido (1 por defecto)
         - cluster_distance: Distancia en % para agrupar niveles (0.5 por defecto)
         - max_levels: Máximo de niveles a retornar (20 por defecto)
+        - refresh: Ignorar el cache y recalcular
     """
     try:
-        interval_clean = (
-            interval.replace("m", "")
-            .replace("h", "")
-            .replace("d", "D")
-            .replace("w", "W")
-        )
-
-        if "h" in interval.lower() and interval_clean.isdigit():
-            interval_clean = str(int(interval_clean) * 60)
-
-        interval_final = INTERVAL_MAP.get(interval_clean, "15")
+        interval_final = normalize_interval(interval)
 
         print(f"[{symbol}] 📊 SUPPORT/RESISTANCE: interval={interval_final}, days={days}, z_threshold={z_score_threshold}")
 
         # Intentar cargar del cache
         cache_key = f"sr_{volume_method}_{z_score_threshold}_{z_score_period}_{left_bars}_{right_bars}_{min_touches}_{cluster_distance}"
-        cached_data = load_cache(symbol, interval_final, cache_key)
+        cached_data = None if refresh else await load_cache(symbol, interval_final, cache_key)
 
         if cached_data and cached_data.get("symbol") == symbol:
             cache_age = time.time() - cached_data.get('timestamp', 0)
-            print(f"[CACHE HIT] ✅ {symbol} {interval_final} S/R desde cache (age: {cache_age:.0f}s)")
+            state = cache_state(get_interval_minutes(interval_final), cached_data.get('timestamp', 0))
+            if state == STALE:
+                revalidator.schedule(
+                    (cache_key, symbol, interval_final),
+                    lambda: get_support_resistance(
+                        symbol, interval_final, days, volume_method, z_score_threshold, z_score_period,
+                        left_bars, right_bars, min_touches, cluster_distance, max_levels, refresh=True
+                    )
+                )
+            print(f"[CACHE HIT] ✅ {symbol} {interval_final} S/R desde cache (age: {cache_age:.0f}s, {state})")
 
             return {
                 "symbol": symbol,
@@ -952,6 +1015,7 @@ async def get_support_resistance(
                 "config": cached_data.get("config", {}),
                 "success": True,
                 "from_cache": True,
+                "cache_state": state,
                 "cache_age_seconds": int(cache_age)
             }
 
@@ -1081,7 +1145,7 @@ async def get_support_resistance(
             "data": response_data,
             "config": config_used
         }
-        save_cache(symbol, interval_final, cache_key, cache_data)
+        await save_cache(symbol, interval_final, cache_key, cache_data)
         print(f"[CACHE SAVED] {symbol} {interval_final} S/R guardado")
 
         print(f"[SUCCESS] {symbol} {interval_final} S/R: {len(supports)} soportes, {len(resistances)} resistencias, {len(consolidation_zones)} zonas")
@@ -1442,24 +1506,115 @@ async def calculate_proximity_alerts_batch(request: Request):
         }
 
 
+async def fetch_open_interest_window(symbol: str, oi_interval: str, start_ms: int, end_ms: int,
+                                     total_points_needed: int):
+    """
+    Descarga de Bybit el Open Interest de una ventana, paginando hacia atrás
+
+    Returns:
+        (puntos crudos de Bybit, número de requests, mensaje de error o None)
+    """
+    # Bybit devuelve máximo 200 puntos por request
+    limit_per_request = 200
+
+    all_oi_data = []
+    current_end = end_ms
+
+    request_count = 0
+    max_requests = 10
+
+    # Hacer múltiples requests hasta obtener todos los datos necesarios
+    while len(all_oi_data) < total_points_needed and request_count < max_requests:
+        request_count += 1
+
+        # Convertir timestamp a fecha para debug
+        end_date = datetime.fromtimestamp(current_end / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+        print(f"[BYBIT API] Request {request_count}/{max_requests}: endTime={current_end} ({end_date}) | {len(all_oi_data)}/{total_points_needed} puntos")
+        data = await bybit_client.get_json("/v5/market/open-interest", params={
+            "category": "linear",
+            "symbol": symbol,
+            "intervalTime": oi_interval,
+            "limit": limit_per_request,
+            "endTime": current_end
+        })
+
+        if data.get("retCode") != 0:
+            print(f"[ERROR {symbol}] Bybit OI error: {data.get('retMsg')}")
+            if request_count == 1:  # Solo error si es el primer request
+                return [], request_count, data.get('retMsg', 'Unknown error')
+            break
+
+        oi_batch = data["result"]["list"]
+
+        if not oi_batch:
+            print(f"[INFO {symbol}] No más datos de OI disponibles en este request")
+            break
+
+        # Log del batch recibido
+        batch_oldest = datetime.fromtimestamp(int(oi_batch[-1]["timestamp"]) / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+        batch_newest = datetime.fromtimestamp(int(oi_batch[0]["timestamp"]) / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+        print(f"[BATCH] Recibidos {len(oi_batch)} puntos: {batch_oldest} → {batch_newest}")
+
+        # oi_batch viene en orden descendente (más reciente primero)
+        # Agregar al inicio de all_oi_data para mantener orden cronológico
+        all_oi_data = oi_batch + all_oi_data
+
+        # Actualizar current_end para el siguiente batch
+        # El más antiguo de este batch es el último elemento
+        oldest_item = oi_batch[-1]
+        oldest_ts = int(oldest_item["timestamp"])
+
+        # Si ya llegamos al inicio del periodo, salir
+        if oldest_ts <= start_ms:
+            print(f"[INFO {symbol}] Alcanzamos el inicio del periodo solicitado")
+            break
+
+        # Siguiente request debe terminar justo antes del más antiguo de este batch
+        current_end = oldest_ts - 1
+
+        # Si ya tenemos suficientes puntos, salir
+        if len(all_oi_data) >= total_points_needed:
+            print(f"[INFO {symbol}] Tenemos suficientes puntos ({len(all_oi_data)}/{total_points_needed})")
+            break
+
+    if not all_oi_data:
+        return [], request_count, None
+
+    print(f"[INFO {symbol}] Total obtenido: {len(all_oi_data)} puntos en {request_count} requests")
+
+    # IMPORTANTE: all_oi_data está en orden DESCENDENTE (más reciente primero)
+    # porque Bybit devuelve descendente y agregamos al inicio
+    # Necesitamos invertirlo a ASCENDENTE (más antiguo primero)
+    all_oi_data.reverse()
+
+    # Verificar orden
+    if len(all_oi_data) >= 2:
+        first_ts = int(all_oi_data[0]["timestamp"])
+        last_ts = int(all_oi_data[-1]["timestamp"])
+        print(f"[INFO {symbol}] Orden de datos: primer_ts={first_ts}, último_ts={last_ts}, orden_correcto={first_ts < last_ts}")
+
+    return all_oi_data, request_count, None
+
+
+def stored_open_interest(symbol: str, interval: str, start_ms: int) -> list:
+    """Puntos de OI del store SQLite desde start_ms, con la hora de Colombia"""
+    stored = sqlite_store.read_open_interest(symbol, interval, start_ms)
+    timestamps = [ts for ts, _ in stored]
+    return [
+        {"timestamp": ts, "openInterest": value, "datetime_colombia": dt}
+        for (ts, value), dt in zip(stored, format_colombia_times(timestamps))
+    ]
+
+
 @app.get("/api/open-interest/{symbol}")
-async def get_open_interest(symbol: str, interval: str = "15", days: int = 30):
+async def get_open_interest(symbol: str, interval: str = "15", days: int = 30, refresh: bool = False, since: Optional[int] = None, format: str = "json"):
     """
     Endpoint para obtener Open Interest de Bybit Futures
     Calcula OI Flow Sentiment siguiendo el patrón LuxAlgo
+    refresh=True ignora el cache y descarga de nuevo
     """
     try:
-        interval_clean = (
-            interval.replace("m", "")
-            .replace("h", "")
-            .replace("d", "D")
-            .replace("w", "W")
-        )
-
-        if "h" in interval.lower() and interval_clean.isdigit():
-            interval_clean = str(int(interval_clean) * 60)
-
-        interval_final = INTERVAL_MAP.get(interval_clean, "15")
+        interval_final = normalize_interval(interval)
 
         # Aplicar límite máximo por timeframe
         max_days_allowed = MAX_DAYS_BY_INTERVAL.get(interval_final, 30)
@@ -1467,25 +1622,44 @@ async def get_open_interest(symbol: str, interval: str = "15", days: int = 30):
 
         print(f"[{symbol}] 📊 OPEN INTEREST: Recibido days={days}, aplicando límite -> days_to_fetch={days_to_fetch} (máx: {max_days_allowed}) @ {interval_final}")
 
-        # Intentar cargar del cache
-        cached_data = load_cache(symbol, interval_final, "openinterest")
+        # Calcular timestamps
+        now_ms = int(time.time() * 1000)
+        end_ms = now_ms + (10 * 60 * 1000)  # Buffer de 10 minutos al futuro
+        start_ms = now_ms - (days_to_fetch * 24 * 60 * 60 * 1000)
 
-        if cached_data and cached_data.get("symbol") == symbol and cached_data.get("interval") == interval_final:
-            cache_age = time.time() - cached_data.get('timestamp', 0)
-            print(f"[CACHE HIT] ✅ {symbol} {interval_final} Open Interest desde cache (age: {cache_age:.0f}s)")
+        # Intentar leer del store SQLite: solo el rango pedido
+        cache_janitor.touch(f"{symbol}_{interval_final}_{OPEN_INTEREST}")
+        series = await asyncio.to_thread(sqlite_store.get_series, OPEN_INTEREST, symbol, interval_final)
 
-            return {
+        state = cache_state(get_interval_minutes(interval_final), series["fetched_at"] / 1000) if series else EXPIRED
+
+        if not refresh and state != EXPIRED and series["covered_from"] <= start_ms:
+            cache_age = (now_ms - series["fetched_at"]) / 1000
+            if state == STALE:
+                revalidator.schedule(
+                    ("openinterest", symbol, interval_final),
+                    lambda: get_open_interest(symbol, interval_final, days_to_fetch, refresh=True)
+                )
+            oi_points = await asyncio.to_thread(
+                stored_open_interest, symbol, interval_final, max(start_ms, since) if since is not None else start_ms
+            )
+            print(f"[CACHE HIT] ✅ {symbol} {interval_final} Open Interest desde cache (age: {cache_age:.0f}s, {state})")
+
+            return format_response({
                 "symbol": symbol,
                 "interval": interval_final,
                 "indicator": "openInterest",
-                "data": cached_data.get("data", []),
+                "data": oi_points,
                 "success": True,
                 "from_cache": True,
+                "cache_state": state,
                 "cache_age_seconds": int(cache_age),
                 "days_requested": days,
                 "days_fetched": days_to_fetch,
-                "max_days_allowed": max_days_allowed
-            }
+                "max_days_allowed": max_days_allowed,
+                "since": since,
+                "cursor": oi_points[-1]["timestamp"] if oi_points else since
+            }, format)
 
         # Bybit Open Interest usa intervalos específicos
         # Disponibles: 5min, 15min, 30min, 1h, 4h, 1d
@@ -1521,109 +1695,12 @@ async def get_open_interest(symbol: str, interval: str = "15", days: int = 30):
         print(f"[OI CALCULATION] interval_final={interval_final} → oi_interval={oi_interval} ({oi_interval_minutes} min)")
         print(f"[OI CALCULATION] {days_to_fetch} días × 24h × 60min / {oi_interval_minutes} min = {total_points_needed} puntos necesarios")
 
-        # Bybit devuelve máximo 200 puntos por request
-        limit_per_request = 200
-
-        # Calcular timestamps
-        now_ms = int(time.time() * 1000)
-        end_ms = now_ms + (10 * 60 * 1000)  # Buffer de 10 minutos al futuro
-        start_ms = now_ms - (days_to_fetch * 24 * 60 * 60 * 1000)
-
-        all_oi_data = []
-        current_end = end_ms
-
-        async with httpx.AsyncClient(timeout=30) as client:
-            request_count = 0
-            max_requests = 10
-
-            # Hacer múltiples requests hasta obtener todos los datos necesarios
-            while len(all_oi_data) < total_points_needed and request_count < max_requests:
-                request_count += 1
-
-                url = (
-                    "https://api.bybit.com/v5/market/open-interest?"
-                    f"category=linear&symbol={symbol}&intervalTime={oi_interval}"
-                    f"&limit={limit_per_request}&endTime={current_end}"
-                )
-
-                # Convertir timestamp a fecha para debug
-                end_date = datetime.fromtimestamp(current_end / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
-                print(f"[BYBIT API] Request {request_count}/{max_requests}: endTime={current_end} ({end_date}) | {len(all_oi_data)}/{total_points_needed} puntos")
-                r = await client.get(url)
-                data = r.json()
-
-                if data.get("retCode") != 0:
-                    print(f"[ERROR {symbol}] Bybit OI error: {data.get('retMsg')}")
-                    if request_count == 1:  # Solo error si es el primer request
-                        return {
-                            "symbol": symbol,
-                            "interval": interval_final,
-                            "indicator": "openInterest",
-                            "data": [],
-                            "success": False,
-                            "error": data.get('retMsg', 'Unknown error')
-                        }
-                    break
-
-                oi_batch = data["result"]["list"]
-
-                if not oi_batch:
-                    print(f"[INFO {symbol}] No más datos de OI disponibles en este request")
-                    break
-
-                # Log del batch recibido
-                batch_oldest = datetime.fromtimestamp(int(oi_batch[-1]["timestamp"]) / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
-                batch_newest = datetime.fromtimestamp(int(oi_batch[0]["timestamp"]) / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
-                print(f"[BATCH] Recibidos {len(oi_batch)} puntos: {batch_oldest} → {batch_newest}")
-
-                # oi_batch viene en orden descendente (más reciente primero)
-                # Agregar al inicio de all_oi_data para mantener orden cronológico
-                all_oi_data = oi_batch + all_oi_data
-
-                # Actualizar current_end para el siguiente batch
-                # El más antiguo de este batch es el último elemento
-                oldest_item = oi_batch[-1]
-                oldest_ts = int(oldest_item["timestamp"])
-
-                # Si ya llegamos al inicio del periodo, salir
-                if oldest_ts <= start_ms:
-                    print(f"[INFO {symbol}] Alcanzamos el inicio del periodo solicitado")
-                    break
-
-                # Siguiente request debe terminar justo antes del más antiguo de este batch
-                current_end = oldest_ts - 1
-
-                # Si ya tenemos suficientes puntos, salir
-                if len(all_oi_data) >= total_points_needed:
-                    print(f"[INFO {symbol}] Tenemos suficientes puntos ({len(all_oi_data)}/{total_points_needed})")
-                    break
-
-                # Pequeña pausa entre requests
-                await asyncio.sleep(0.1)
-
-            if not all_oi_data:
-                print(f"[ERROR {symbol}] No hay datos de Open Interest disponibles")
-                return {
-                    "symbol": symbol,
-                    "interval": interval_final,
-                    "indicator": "openInterest",
-                    "data": [],
-                    "success": False,
-                    "error": "No Open Interest data available"
-                }
-
-            print(f"[INFO {symbol}] Total obtenido: {len(all_oi_data)} puntos en {request_count} requests")
-
-            # IMPORTANTE: all_oi_data está en orden DESCENDENTE (más reciente primero)
-            # porque Bybit devuelve descendente y agregamos al inicio
-            # Necesitamos invertirlo a ASCENDENTE (más antiguo primero)
-            all_oi_data.reverse()
-
-            # Verificar orden
-            if len(all_oi_data) >= 2:
-                first_ts = int(all_oi_data[0]["timestamp"])
-                last_ts = int(all_oi_data[-1]["timestamp"])
-                print(f"[INFO {symbol}] Orden de datos: primer_ts={first_ts}, último_ts={last_ts}, orden_correcto={first_ts < last_ts}")
+        async def fetch_and_store():
+            all_oi_data, request_count, oi_error = await fetch_open_interest_window(
+                symbol, oi_interval, start_ms, end_ms, total_points_needed
+            )
+            if oi_error or not all_oi_data:
+                return all_oi_data, request_count, oi_error
 
             # Procesar datos
             # all_oi_data ahora sí está en orden cronológico ascendente
@@ -1644,33 +1721,76 @@ async def get_open_interest(symbol: str, interval: str = "15", days: int = 30):
                     "datetime_colombia": dt_colombia.strftime("%Y-%m-%d %H:%M:%S")
                 })
 
-            # Guardar en cache
-            cache_data = {
+            # Upsert en el store; la cobertura anterior sigue valiendo si llega hasta esta ventana
+            covered_from = start_ms
+            if series and series["fetched_at"] >= start_ms:
+                covered_from = min(start_ms, series["covered_from"])
+            await asyncio.to_thread(
+                sqlite_store.write_open_interest, symbol, interval_final,
+                [(p["timestamp"], p["openInterest"]) for p in processed_data],
+                covered_from, now_ms
+            )
+            print(f"[CACHE SAVED] {symbol} {interval_final} Open Interest guardado ({len(processed_data)} puntos)")
+            return processed_data, request_count, None
+
+        async def read_refreshed():
+            # Otro worker tenía el lease: usar lo que guardó si es más nuevo que lo que vimos
+            latest = await asyncio.to_thread(sqlite_store.get_series, OPEN_INTEREST, symbol, interval_final)
+            seen_at = series["fetched_at"] if series else -1
+            if latest and latest["fetched_at"] > seen_at and latest["covered_from"] <= start_ms:
+                return await asyncio.to_thread(stored_open_interest, symbol, interval_final, start_ms), 0, None
+            return None
+
+        # Peticiones idénticas concurrentes comparten una sola descarga
+        # (en este worker: singleflight; entre workers: lease sobre el store compartido)
+        processed_data, request_count, oi_error = await upstream_flight.do(
+            ("open-interest", symbol, interval_final, days_to_fetch),
+            lambda: refresh_coordinator.run(("open-interest", symbol, interval_final), fetch_and_store, read_refreshed)
+        )
+
+        if oi_error:
+            return {
                 "symbol": symbol,
                 "interval": interval_final,
                 "indicator": "openInterest",
-                "data": processed_data
+                "data": [],
+                "success": False,
+                "error": oi_error
             }
-            save_cache(symbol, interval_final, "openinterest", cache_data)
-            print(f"[CACHE SAVED] {symbol} {interval_final} Open Interest guardado ({len(processed_data)} puntos)")
-
-            print(f"[SUCCESS] {symbol} {interval_final} Open Interest: {len(processed_data)} puntos")
 
+        if not processed_data:
+            print(f"[ERROR {symbol}] No hay datos de Open Interest disponibles")
             return {
                 "symbol": symbol,
                 "interval": interval_final,
                 "indicator": "openInterest",
-                "data": processed_data,
-                "success": True,
-                "from_cache": False,
-                "calculated": True,
-                "total_points": len(processed_data),
-                "days_requested": days,
-                "days_fetched": days_to_fetch,
-                "max_days_allowed": max_days_allowed,
-                "api_requests_made": request_count
+                "data": [],
+                "success": False,
+                "error": "No Open Interest data available"
             }
 
+        print(f"[SUCCESS] {symbol} {interval_final} Open Interest: {len(processed_data)} puntos")
+
+        if since is not None:
+            processed_data = points_since(processed_data, since)
+
+        return format_response({
+            "symbol": symbol,
+            "interval": interval_final,
+            "indicator": "openInterest",
+            "data": processed_data,
+            "success": True,
+            "from_cache": False,
+            "calculated": True,
+            "total_points": len(processed_data),
+            "days_requested": days,
+            "days_fetched": days_to_fetch,
+            "max_days_allowed": max_days_allowed,
+            "api_requests_made": request_count,
+            "since": since,
+            "cursor": processed_data[-1]["timestamp"] if processed_data else since
+        }, format)
+
     except Exception as e:
         print(f"[ERROR] Open Interest {symbol}: {str(e)}")
         import traceback
@@ -1684,14 +1804,352 @@ async def get_open_interest(symbol: str, interval: str = "15", days: int = 30):
             "error": str(e)
         }
 
-@app.post("/api/clear-cache")
+# ==================== BATCH HISTORICAL ====================
+
+from fastapi.responses import StreamingResponse
+
+# Límite de items por batch y de símbolos resueltos a la vez
+# (el límite real hacia Bybit lo pone el rate limiter compartido)
+MAX_BATCH_ITEMS = 200
+BATCH_CONCURRENCY = 16
+
+
+@app.post("/api/historical/batch")
+async def get_historical_batch(request: Request):
+    """
+    Histórico de varios símbolos en una sola petición, devuelto en streaming
+
+    Body:
+    {
+      "requests": [
+        {"id": "BTCUSDT-15", "symbol": "BTCUSDT", "interval": "15", "days": 15, "since": null},
+        ...
+      ]
+    }
+
+    Returns (application/x-ndjson, una línea por símbolo según va terminando):
+        {"index": 0, "id": "BTCUSDT-15", ...respuesta de /api/historical...}
+        ...
+        {"done": true, "total": n, "succeeded": m, "elapsed_ms": t}
+    """
+    try:
+        body = await request.json()
+        items = body.get("requests", [])
+    except Exception as e:
+        return {"success": False, "error": f"Body inválido: {str(e)}"}
+
+    if not items:
+        return {"success": False, "error": "No requests provided"}
+    if len(items) > MAX_BATCH_ITEMS:
+        return {"success": False, "error": f"Máximo {MAX_BATCH_ITEMS} items por batch"}
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def resolve(index: int, item: dict):
+        async with semaphore:
+            try:
+                result = await get_historical(
+                    item["symbol"],
+                    str(item.get("interval", "15")),
+                    int(item.get("days", 30)),
+                    local_time=bool(item.get("local_time", True)),
+                    since=item.get("since")
+                )
+            except Exception as e:
+                result = {"symbol": item.get("symbol"), "error": str(e), "success": False}
+        return {"index": index, "id": item.get("id", item.get("symbol")), **result}
+
+    async def stream():
+        t0 = time.perf_counter()
+        tasks = [asyncio.create_task(resolve(i, item)) for i, item in enumerate(items)]
+        succeeded = 0
+        try:
+            # Cada símbolo sale en cuanto está listo: la carga la marca el más lento
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                succeeded += bool(result.get("success"))
+                yield json.dumps(result, separators=(',', ':')) + "\n"
+
+            yield json.dumps({
+                "done": True,
+                "total": len(items),
+                "succeeded": succeeded,
+                "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1)
+            }) + "\n"
+        finally:
+            # Cliente desconectado: no seguir descargando
+            for task in tasks:
+                task.cancel()
+
+    print(f"[BATCH HISTORICAL] {len(items)} símbolos")
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# ==================== HISTORY CHUNKS ====================
+
+import hashlib
+from fastapi.responses import Response
+from response_format import render_response, etag_matches
+
+# Bloques fijos alineados en el tiempo: una vez cerrados no cambian nunca
+HISTORY_CHUNK_CANDLES = 1000
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+HEAD_CACHE_CONTROL = "no-cache"
+
+
+def _chunk_span_ms(interval_minutes: int) -> int:
+    return HISTORY_CHUNK_CANDLES * interval_minutes * 60 * 1000
+
+
+def _not_modified(etag: str, cache_control: str):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+@app.get("/api/historical/{symbol}/chunks")
+async def get_historical_chunks(symbol: str, interval: str = "15", days: int = 30):
+    """Índice de bloques inmutables + head mutable que cubren la ventana pedida"""
+    try:
+        interval_final = normalize_interval(interval)
+        interval_minutes = get_interval_minutes(interval_final)
+        days_to_fetch = min(days, MAX_DAYS_BY_INTERVAL.get(interval_final, 30))
+
+        now_ms = int(time.time() * 1000)
+        start_ms = now_ms - days_to_fetch * 24 * 60 * 60 * 1000
+        span_ms = _chunk_span_ms(interval_minutes)
+        head_start = chunk_open_time(interval_minutes, now_ms, HISTORY_CHUNK_CANDLES)
+
+        chunks = []
+        chunk_start = chunk_open_time(interval_minutes, start_ms, HISTORY_CHUNK_CANDLES)
+        while chunk_start < head_start:
+            chunks.append({
+                "start": chunk_start,
+                "end": chunk_start + span_ms,
+                "url": f"/api/historical/{symbol}/chunk/{chunk_start}?interval={interval_final}"
+            })
+            chunk_start += span_ms
+
+        return {
+            "symbol": symbol,
+            "interval": interval_final,
+            "candles_per_chunk": HISTORY_CHUNK_CANDLES,
+            "window_start": start_ms,
+            "chunks": chunks,
+            "head": {
+                "start": head_start,
+                "url": f"/api/historical/{symbol}/head?interval={interval_final}"
+            },
+            "success": True
+        }
+    except Exception as e:
+        print(f"[ERROR {symbol}] Chunks: {str(e)}")
+        return {"symbol": symbol, "error": str(e), "success": False}
+
+
+@app.get("/api/historical/{symbol}/chunk/{chunk_start}")
+async def get_historical_chunk(request: Request, symbol: str, chunk_start: int, interval: str = "15",
+                               local_time: bool = True, format: str = "json"):
+    """Bloque cerrado de HISTORY_CHUNK_CANDLES velas: ETag fijo y cache inmutable"""
+    try:
+        interval_final = normalize_interval(interval)
+        interval_minutes = get_interval_minutes(interval_final)
+        span_ms = _chunk_span_ms(interval_minutes)
+        chunk_end = chunk_start + span_ms
+        now_ms = int(time.time() * 1000)
+
+        if chunk_open_time(interval_minutes, chunk_start, HISTORY_CHUNK_CANDLES) != chunk_start:
+            return {"symbol": symbol, "success": False, "error": "chunk_start no está alineado a un bloque"}
+        if chunk_end > candle_open_time(interval_minutes, now_ms):
+            return {"symbol": symbol, "success": False, "error": "El bloque aún no está cerrado; usar /head"}
+
+        # El contenido depende solo de la URL: el ETag se resuelve sin tocar datos
+        etag = f'"{symbol}-{interval_final}-{chunk_start}-{HISTORY_CHUNK_CANDLES}-{format}-{int(local_time)}"'
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return _not_modified(etag, IMMUTABLE_CACHE_CONTROL)
+
+        rows = await upstream_flight.do(
+            ("kline-chunk", symbol, interval_final, chunk_start),
+            lambda: candle_store.get_closed_range(symbol, interval_final, chunk_start, chunk_end, interval_minutes)
+        )
+        candles = candles_to_records(decode_klines(rows), interval_minutes, now_ms, local_time=local_time)
+
+        response = render_response({
+            "symbol": symbol,
+            "interval": interval_final,
+            "data": candles,
+            "chunk_start": chunk_start,
+            "chunk_end": chunk_end,
+            "total_candles": len(candles),
+            "success": True
+        }, format)
+        # Un bloque incompleto (p. ej. antes del listado del par) no se fija como inmutable
+        if len(candles) == HISTORY_CHUNK_CANDLES:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            response.headers["ETag"] = etag
+        return response
+
+    except Exception as e:
+        print(f"[ERROR {symbol}] Chunk {chunk_start}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"symbol": symbol, "error": str(e), "success": False}
+
+
+@app.get("/api/historical/{symbol}/head")
+async def get_historical_head(request: Request, symbol: str, interval: str = "15",
+                              local_time: bool = True, format: str = "json"):
+    """Velas del bloque en curso (mutable): ETag por contenido, revalidación en cada uso"""
+    try:
+        interval_final = normalize_interval(interval)
+        interval_minutes = get_interval_minutes(interval_final)
+        now_ms = int(time.time() * 1000)
+        head_start = chunk_open_time(interval_minutes, now_ms, HISTORY_CHUNK_CANDLES)
+
+        rows, _ = await upstream_flight.do(
+            ("kline-head", symbol, interval_final, head_start),
+            lambda: candle_store.get_window(
+                symbol, interval_final, head_start, now_ms + 10 * 60 * 1000, interval_minutes
+            )
+        )
+        candles = candles_to_records(decode_klines(rows), interval_minutes, now_ms, local_time=local_time)
+
+        response = render_response({
+            "symbol": symbol,
+            "interval": interval_final,
+            "data": candles,
+            "chunk_start": head_start,
+            "total_candles": len(candles),
+            "success": True
+        }, format)
+        etag = f'"{hashlib.sha1(response.body).hexdigest()[:20]}"'
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return _not_modified(etag, HEAD_CACHE_CONTROL)
+
+        response.headers["Cache-Control"] = HEAD_CACHE_CONTROL
+        response.headers["ETag"] = etag
+        return response
+
+    except Exception as e:
+        print(f"[ERROR {symbol}] Head: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"symbol": symbol, "error": str(e), "success": False}
+
+# ==================== WEBSOCKET FAN-OUT ====================
+
+from fastapi import WebSocket
+from ws_fanout import FanoutHub
+
+# Un solo feed de Bybit repartido a todos los navegadores conectados a /ws
+fanout_hub = FanoutHub(on_subscribe=bybit_stream.subscribe, normalize_interval=normalize_interval)
+bybit_stream.add_listener(fanout_hub.on_stream_update)
+
+
+@app.websocket("/ws")
+async def websocket_fanout(websocket: WebSocket):
+    """Suscripción por topic/symbol/interval a velas, volume delta y ticker en vivo"""
+    await fanout_hub.serve(websocket)
+
+
+# ==================== PREFETCH SCHEDULER ====================
+
+from prefetch_scheduler import PrefetchScheduler
+
+
+async def prefetch_refresh(symbol: str, interval: str):
+    """Refresca velas, Volume Delta (CVD) y Open Interest de un par de la watchlist"""
+    days = MAX_DAYS_BY_INTERVAL.get(interval, 30)
+    # Con varios workers cada uno tiene su scheduler: solo uno refresca cada vela
+    interval_minutes = get_interval_minutes(interval)
+    candle = candle_open_time(interval_minutes, int(time.time() * 1000))
+    if not await refresh_coordinator.claim(("prefetch", symbol, interval, candle), interval_minutes * 60 / 2):
+        return {"success": True, "skipped": True}
+    # get_volume_delta pide las velas a get_historical, que actualiza el candle store,
+    # y deja memoizado el Volume Delta de la ventana nueva
+    volume_delta = await get_volume_delta(symbol, interval, days)
+    open_interest = await get_open_interest(symbol, interval, days, refresh=True)
+    # Los endpoints informan los fallos en el dict, no con excepciones
+    for name, result in (("Volume Delta", volume_delta), ("Open Interest", open_interest)):
+        if not result.get("success"):
+            return {"success": False, "error": f"{name}: {result.get('error') or result.get('message')}"}
+    return {"success": True}
+
+
+prefetch_scheduler = PrefetchScheduler(
+    prefetch_refresh,
+    get_interval_minutes,
+    bybit_client.limiter.rate,
+    watchlist_file=Path("prefetch_watchlist.json")
+)
+
+
+def _parse_prefetch_entries(body: dict) -> list:
+    return [
+        (entry["symbol"], normalize_interval(str(entry.get("interval", "15"))))
+        for entry in body.get("entries", [])
+        if entry.get("symbol")
+    ]
+
+
+@app.get("/api/prefetch/watchlist")
+async def get_prefetch_watchlist():
+    """Watchlist del servidor que se refresca tras cada cierre de vela"""
+    return {
+        "success": True,
+        "watchlist": prefetch_scheduler.get_watchlist(),
+        "stats": prefetch_scheduler.get_stats()
+    }
+
+
+@app.post("/api/prefetch/watchlist")
+async def add_prefetch_watchlist(request: Request):
+    """
+    Agrega pares a la watchlist del servidor
+
+    Body:
+    {
+      "entries": [{"symbol": "BTCUSDT", "interval": "15"}, ...]
+    }
+    """
+    try:
+        entries = _parse_prefetch_entries(await request.json())
+        prefetch_scheduler.add(entries)
+        return {"success": True, "added": len(entries), "watchlist": prefetch_scheduler.get_watchlist()}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@app.delete("/api/prefetch/watchlist")
+async def remove_prefetch_watchlist(request: Request):
+    """Quita pares de la watchlist del servidor (mismo body que el POST)"""
+    try:
+        entries = _parse_prefetch_entries(await request.json())
+        prefetch_scheduler.remove(entries)
+        return {"success": True, "removed": len(entries), "watchlist": prefetch_scheduler.get_watchlist()}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
     from alert_sender import initialize_alert_sender
+    await initialize_bybit_client()
+    await cache_namespaces.start()
+    # Importación única de los archivos de cache/ al store SQLite (un solo worker la hace)
+    imported = await asyncio.to_thread(sqlite_store.import_legacy_cache_once, CACHE_DIR)
+    if imported is not None:
+        print(f"[STARTUP] Cache importado a SQLite: {imported}")
+    # Migraciones del esquema, una sola vez y después de importar las velas que reemplazan
+    migrated = await asyncio.to_thread(sqlite_store.migrate_once, CACHE_DIR)
+    if migrated is not None:
+        print(f"[STARTUP] SQLite migrado a la versión {SCHEMA_VERSION}: {migrated}")
+    await bybit_stream.start()
     await initialize_alert_sender()
+    await prefetch_scheduler.start()
+    await trade_aggregator.start()
+    await cache_janitor.start()
     print("[STARTUP] Backend started successfully")
+    print("[STARTUP] Bybit client pool ready")
     print("[STARTUP] Alert sender initialized")
     print("[STARTUP] Proximity alerts system ready")
 
@@ -1700,5 +2158,13 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     from alert_sender import shutdown_alert_sender
+    await prefetch_scheduler.stop()
+    await revalidator.stop()
+    await cache_janitor.stop()
+    await cache_namespaces.stop()
+    await bybit_stream.stop()
+    await trade_aggregator.stop()
     await shutdown_alert_sender()
+    await shutdown_bybit_client()
+    sqlite_store.close()
     print("[SHUTDOWN] Backend shutdown complete")
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+Memory Cache Module
+
+Bounded in-memory LRU tier in front of the cache backend. Entries are
+keyed like the cache entries ("{symbol}_{interval}_{indicator}"), sized by
+their serialized JSON length (json_size; not the compressed size the
+backend stores, which is several times smaller than what the decoded payload
+holds) and evicted least-recently-used first once the byte budget is
+exceeded. Entries older than their TTL (measured from the
+cached payload's own "timestamp"; the default TTL or one given per entry)
+are dropped on access.
+
+Configuration (environment variables):
+    CACHE_MEMORY_MAX_MB   Byte budget of the memory tier (default 64)
+"""
+
+import os
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+CACHE_MEMORY_MAX_MB = float(os.getenv("CACHE_MEMORY_MAX_MB", "64"))
+
+
+def json_size(value: Any) -> int:
+    """Serialized JSON length of a payload, the size it is charged in the memory tier"""
+    return len(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode("utf-8"))
+
+
+class MemoryCache:
+    """LRU by bytes with TTL"""
+
+    def __init__(self, max_bytes: int = int(CACHE_MEMORY_MAX_MB * 1024 * 1024), ttl: float = 1800):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Any, int, float, float]]" = OrderedDict()
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value (treat as read-only) or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        value, size, stored_at, ttl = entry
+        if time.time() - stored_at >= ttl:
+            self._remove(key)
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def put(self, key: str, value: Any, size: int, stored_at: Optional[float] = None, ttl: Optional[float] = None):
+        """Stores value; size is what it counts against the budget (json_size for cache payloads), ttl overrides the default"""
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return  # Más grande que todo el presupuesto: solo en disco
+
+        self._entries[key] = (
+            value, size,
+            stored_at if stored_at is not None else time.time(),
+            ttl if ttl is not None else self.ttl
+        )
+        self.bytes += size
+        self.stats["writes"] += 1
+
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+
+    def invalidate_where(self, predicate: Callable[[str], bool]) -> int:
+        """Drops every entry whose key matches; returns how many"""
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def _remove(self, key: str):
+        _, size, _, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "usage_pct": round(self.bytes / self.max_bytes * 100, 1) if self.max_bytes else None,
+            "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else None,
+            **self.stats
+        }
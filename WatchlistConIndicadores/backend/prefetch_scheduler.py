@@ -0,0 +1,202 @@
+"""
+Prefetch Scheduler Module
+
+Keeps a server-side watchlist of (symbol, interval) pairs and refreshes them
+in the background a few seconds after every candle close of their interval,
+so user requests are almost always served from warm caches.
+
+Refreshes run in the limiter's background lane and are spread over a window
+sized so the prefetch work stays within a share of the Bybit rate budget.
+
+Configuration (environment variables):
+    PREFETCH_WATCHLIST        Seed list, e.g. "BTCUSDT:15,ETHUSDT:60"
+    PREFETCH_GRACE_SECONDS    Delay after the candle close (default 3)
+    PREFETCH_RATE_SHARE       Max share of the rate budget used (default 0.5)
+    PREFETCH_REQUESTS_PER_JOB Estimated upstream requests per refresh (default 3)
+"""
+
+import os
+import json
+import time
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from candle_time import next_candle_close
+from rate_limiter import upstream_priority, PRIORITY_BACKGROUND
+
+PREFETCH_GRACE_SECONDS = float(os.getenv("PREFETCH_GRACE_SECONDS", "3"))
+PREFETCH_RATE_SHARE = float(os.getenv("PREFETCH_RATE_SHARE", "0.5"))
+PREFETCH_REQUESTS_PER_JOB = float(os.getenv("PREFETCH_REQUESTS_PER_JOB", "3"))
+
+# Máximo tiempo dormido entre revisiones (para notar cambios en la watchlist)
+MAX_IDLE_SECONDS = 30
+
+# Devuelve un dict {"success", "error"} como los endpoints
+RefreshFn = Callable[[str, str], Awaitable[Dict]]
+
+
+class PrefetchScheduler:
+    """Refreshes watchlist symbols shortly after each candle close"""
+
+    def __init__(
+        self,
+        refresh_fn: RefreshFn,
+        interval_minutes_fn: Callable[[str], int],
+        rate_per_sec: float,
+        watchlist_file: Optional[Path] = None
+    ):
+        self.refresh_fn = refresh_fn
+        self.interval_minutes_fn = interval_minutes_fn
+        self.rate_per_sec = rate_per_sec
+        self.watchlist_file = watchlist_file
+        self.watchlist: Set[Tuple[str, str]] = set()
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._next_due: Dict[str, int] = {}
+        self._jobs: Set[asyncio.Task] = set()
+        self.stats = {"runs": 0, "jobs_ok": 0, "jobs_failed": 0, "last_runs": {}}
+
+        self._load_watchlist()
+
+    # ---------- Watchlist ----------
+
+    def _load_watchlist(self):
+        seed = os.getenv("PREFETCH_WATCHLIST", "")
+        for item in seed.split(","):
+            if ":" in item:
+                symbol, interval = item.strip().split(":", 1)
+                self.watchlist.add((symbol.upper(), interval))
+
+        if self.watchlist_file and self.watchlist_file.exists():
+            try:
+                with open(self.watchlist_file, 'r', encoding='utf-8') as f:
+                    for entry in json.load(f):
+                        self.watchlist.add((entry["symbol"], entry["interval"]))
+            except Exception as e:
+                print(f"[PREFETCH ERROR] No se pudo leer la watchlist: {str(e)}")
+
+    def _save_watchlist(self):
+        if not self.watchlist_file:
+            return
+        with open(self.watchlist_file, 'w', encoding='utf-8') as f:
+            json.dump(self.get_watchlist(), f, ensure_ascii=False, indent=2)
+
+    def get_watchlist(self) -> List[Dict]:
+        return [{"symbol": s, "interval": i} for s, i in sorted(self.watchlist)]
+
+    def add(self, entries: List[Tuple[str, str]]):
+        self.watchlist.update((s.upper(), i) for s, i in entries)
+        self._save_watchlist()
+        self._wakeup.set()
+
+    def remove(self, entries: List[Tuple[str, str]]):
+        for symbol, interval in entries:
+            self.watchlist.discard((symbol.upper(), interval))
+        self._save_watchlist()
+        self._wakeup.set()
+
+    # ---------- Scheduling ----------
+
+    def _due_time(self, interval: str, now_ms: int) -> int:
+        close_ms = next_candle_close(self.interval_minutes_fn(interval), now_ms)
+        return close_ms + int(PREFETCH_GRACE_SECONDS * 1000)
+
+    def _spread_seconds(self, jobs: int, interval: str) -> float:
+        """Window over which a batch of refreshes is spread"""
+        budget = max(1e-6, self.rate_per_sec * PREFETCH_RATE_SHARE)
+        needed = jobs * PREFETCH_REQUESTS_PER_JOB / budget
+        # Nunca más de media vela, para terminar antes del siguiente cierre
+        return min(needed, self.interval_minutes_fn(interval) * 60 / 2)
+
+    async def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        print(f"[PREFETCH] Scheduler iniciado ({len(self.watchlist)} pares en la watchlist)")
+
+    async def stop(self):
+        self.is_running = False
+        self._wakeup.set()
+        for job in list(self._jobs):
+            job.cancel()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while self.is_running:
+            now_ms = int(time.time() * 1000)
+            intervals = {i for _, i in self.watchlist}
+
+            for interval in list(self._next_due):
+                if interval not in intervals:
+                    del self._next_due[interval]
+            for interval in intervals:
+                self._next_due.setdefault(interval, self._due_time(interval, now_ms))
+
+            due = [i for i, t in self._next_due.items() if t <= now_ms]
+            for interval in due:
+                symbols = sorted(s for s, i in self.watchlist if i == interval)
+                job = asyncio.create_task(self._refresh_interval(interval, symbols))
+                self._jobs.add(job)
+                job.add_done_callback(self._jobs.discard)
+                self._next_due[interval] = self._due_time(interval, now_ms)
+
+            next_ms = min(self._next_due.values(), default=now_ms + MAX_IDLE_SECONDS * 1000)
+            sleep_s = min(MAX_IDLE_SECONDS, max(0.0, (next_ms - int(time.time() * 1000)) / 1000))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_s)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refresh_interval(self, interval: str, symbols: List[str]):
+        """Refreshes every symbol of one interval, evenly spread in time"""
+        upstream_priority.set(PRIORITY_BACKGROUND)
+
+        started = time.time()
+        spread = self._spread_seconds(len(symbols), interval)
+        delay = spread / len(symbols) if symbols else 0
+        ok = failed = 0
+
+        for idx, symbol in enumerate(symbols):
+            if idx and delay:
+                await asyncio.sleep(delay)
+            try:
+                result = await self.refresh_fn(symbol, interval)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            if result.get("success"):
+                ok += 1
+            else:
+                failed += 1
+                print(f"[PREFETCH ERROR] {symbol} {interval}: {result.get('error')}")
+
+        self.stats["runs"] += 1
+        self.stats["jobs_ok"] += ok
+        self.stats["jobs_failed"] += failed
+        self.stats["last_runs"][interval] = {
+            "at": int(started * 1000),
+            "symbols": len(symbols),
+            "ok": ok,
+            "failed": failed,
+            "duration_seconds": round(time.time() - started, 2),
+            "spread_seconds": round(spread, 2)
+        }
+        print(f"[PREFETCH] ✅ {interval}: {ok}/{len(symbols)} pares refrescados en {time.time() - started:.1f}s")
+
+    def get_stats(self) -> Dict:
+        return {
+            "running": self.is_running,
+            "watchlist_size": len(self.watchlist),
+            "next_due": dict(self._next_due),
+            **self.stats
+        }
@@ -0,0 +1,193 @@
+"""
+Rate Limiter Module
+
+Async token-bucket limiter shared by all Bybit REST traffic, with priority
+lanes so interactive chart loads are served before background work.
+
+Work shared by several callers (see singleflight.py) runs with a SharedLane:
+the highest-priority lane among its callers, raised as callers join, so an
+interactive caller never waits behind a background lane it did not ask for.
+
+Bybit allows 600 requests per 5 seconds per IP. A bucket of capacity C
+refilled at r tokens/s admits at most C + 5r requests in any 5s window,
+so the defaults (r=100, C=100) stay exactly at that budget.
+
+The bucket lives in each process, while the budget is per IP: with several
+uvicorn workers the configured rate and burst are split evenly between
+them, so all workers together still stay within it.
+
+Configuration (environment variables):
+    BYBIT_RATE_PER_SEC   Refill rate in requests/second for the whole host (default 100)
+    BYBIT_RATE_BURST     Bucket capacity for the whole host (default 100)
+    WEB_CONCURRENCY      Number of uvicorn workers sharing that budget (default 1);
+                         the same variable uvicorn reads for --workers
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import contextvars
+from collections import deque
+from typing import Dict, List, Optional, Union
+
+BYBIT_RATE_PER_SEC = float(os.getenv("BYBIT_RATE_PER_SEC", "100"))
+BYBIT_RATE_BURST = float(os.getenv("BYBIT_RATE_BURST", "100"))
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+# Parte del presupuesto por IP que le toca a este worker
+WORKER_RATE_PER_SEC = BYBIT_RATE_PER_SEC / WEB_CONCURRENCY
+WORKER_RATE_BURST = max(1.0, BYBIT_RATE_BURST / WEB_CONCURRENCY)
+
+# Carriles de prioridad: menor número = se atiende antes
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+PRIORITY_LANES = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 1}
+
+# Carril de la tarea actual; el trabajo en segundo plano lo cambia a "background"
+# y el trabajo compartido (singleflight) lleva un SharedLane
+upstream_priority: contextvars.ContextVar = contextvars.ContextVar(
+    "upstream_priority", default=PRIORITY_INTERACTIVE
+)
+
+
+class SharedLane:
+    """Lane of work shared by several callers: the highest-priority one among them"""
+
+    def __init__(self, lane: str):
+        self.lane = lane if lane in PRIORITY_LANES else PRIORITY_INTERACTIVE
+        # Tokens en cola de este trabajo (future -> limiter) y trabajos compartidos que espera
+        self._queued: Dict[asyncio.Future, "TokenBucketLimiter"] = {}
+        self._followers: List["SharedLane"] = []
+
+    def raise_to(self, lane: Union[str, "SharedLane"]):
+        """Moves the work (and its queued tokens) up to lane if that lane goes first"""
+        if isinstance(lane, SharedLane):
+            lane = lane.lane
+        if lane not in PRIORITY_LANES or PRIORITY_LANES[lane] >= PRIORITY_LANES[self.lane]:
+            return
+        self.lane = lane
+        for future, limiter in list(self._queued.items()):
+            limiter._requeue(future, lane)
+        for follower in self._followers:
+            follower.raise_to(lane)
+
+    def follow(self, shared: "SharedLane"):
+        """This work waits on shared: it inherits this lane and every later raise"""
+        shared.raise_to(self.lane)
+        self._followers.append(shared)
+
+
+def current_lane() -> str:
+    """Lane of the current task"""
+    lane = upstream_priority.get()
+    if isinstance(lane, SharedLane):
+        return lane.lane
+    return lane if lane in PRIORITY_LANES else PRIORITY_INTERACTIVE
+
+
+class TokenBucketLimiter:
+    """Token bucket with a priority queue of waiters"""
+
+    def __init__(self, rate: float = WORKER_RATE_PER_SEC, capacity: float = WORKER_RATE_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._waiters: List = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.waits: Dict[str, deque] = {lane: deque(maxlen=500) for lane in PRIORITY_LANES}
+        self.granted: Dict[str, int] = {lane: 0 for lane in PRIORITY_LANES}
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority: Optional[str] = None) -> float:
+        """
+        Waits for one token
+
+        Args:
+            priority: Lane name; defaults to the current task's lane (a
+                SharedLane is followed while the token is queued)
+
+        Returns:
+            Seconds spent waiting in the queue
+        """
+        shared = None if priority else upstream_priority.get()
+        if not isinstance(shared, SharedLane):
+            shared = None
+        lane = priority or current_lane()
+        if lane not in PRIORITY_LANES:
+            lane = PRIORITY_INTERACTIVE
+
+        t0 = time.monotonic()
+        self._refill()
+
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (PRIORITY_LANES[lane], next(self._seq), future))
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = asyncio.create_task(self._dispatch())
+            if shared is not None:
+                shared._queued[future] = self
+            try:
+                await future
+            finally:
+                if shared is not None:
+                    shared._queued.pop(future, None)
+                    lane = shared.lane
+
+        waited = time.monotonic() - t0
+        self.waits[lane].append(waited)
+        self.granted[lane] += 1
+        return waited
+
+    def _requeue(self, future: asyncio.Future, lane: str):
+        """Queues a waiter again in a higher lane; the old entry is skipped once it is served"""
+        if not future.done():
+            heapq.heappush(self._waiters, (PRIORITY_LANES[lane], next(self._seq), future))
+
+    async def _dispatch(self):
+        """Hands tokens to queued waiters in priority order as they refill"""
+        while self._waiters:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # Llamador cancelado
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+
+    def get_stats(self) -> Dict:
+        """Queue depth and per-lane wait times"""
+        def summary(values):
+            if not values:
+                return {"samples": 0, "avg_ms": None, "p95_ms": None, "max_ms": None}
+            values = sorted(values)
+            idx = min(len(values) - 1, int(round(0.95 * (len(values) - 1))))
+            return {
+                "samples": len(values),
+                "avg_ms": round(sum(values) / len(values) * 1000, 2),
+                "p95_ms": round(values[idx] * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2)
+            }
+
+        self._refill()
+        return {
+            "rate_per_sec": self.rate,
+            "burst": self.capacity,
+            "workers": WEB_CONCURRENCY,
+            "tokens_available": round(self.tokens, 2),
+            "queued": len(self._waiters),
+            "granted": dict(self.granted),
+            "queue_wait": {lane: summary(list(w)) for lane, w in self.waits.items()}
+        }
@@ -0,0 +1,110 @@
+"""
+Refresh Lease Module
+
+Cross-worker coordination of upstream refreshes on top of the cache backend
+leases. Within one process, singleflight already merges identical concurrent
+requests; with several uvicorn workers each process would still download the
+same data. Here the first worker to take the lease for a key performs the
+refresh and persists it to the shared store, while the others wait for the
+lease to be released and then read the stored result.
+
+claim() is the fire-and-forget variant for periodic jobs (prefetch, stale
+revalidation, alerts): the lease is not released, it simply expires, so only
+one worker runs the job per lease period.
+
+Configuration (environment variables):
+    REFRESH_LEASES            "0" to disable cross-worker coordination (default "1")
+    REFRESH_LEASE_TTL         Seconds a refresh lease lasts if never released (default 30)
+    REFRESH_LEASE_POLL_MS     How often followers check the lease (default 50)
+"""
+
+import os
+import time
+import uuid
+import socket
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from cache_backend import CacheBackend
+
+REFRESH_LEASES = os.getenv("REFRESH_LEASES", "1") != "0"
+REFRESH_LEASE_TTL = float(os.getenv("REFRESH_LEASE_TTL", "30"))
+REFRESH_LEASE_POLL_MS = float(os.getenv("REFRESH_LEASE_POLL_MS", "50"))
+
+
+def lease_name(key: Hashable) -> str:
+    """("kline", "BTCUSDT", "15") -> "kline:BTCUSDT:15" (nested tuples are flattened)"""
+    parts = key if isinstance(key, tuple) else (key,)
+    return ":".join(lease_name(p) if isinstance(p, tuple) else str(p) for p in parts)
+
+
+class RefreshCoordinator:
+    """Leader/follower execution of refreshes across worker processes"""
+
+    def __init__(self, backend: CacheBackend, ttl: float = REFRESH_LEASE_TTL, enabled: bool = REFRESH_LEASES):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats = {"led": 0, "followed": 0, "follow_fallbacks": 0, "claimed": 0, "claim_denied": 0, "errors": 0}
+
+    async def _acquire(self, name: str, ttl: float, owner: Optional[str] = None) -> bool:
+        try:
+            return await asyncio.to_thread(self.backend.acquire_lease, name, owner or self.owner, ttl)
+        except Exception as e:
+            # Backend caído: mejor refrescar de más que dejar de servir
+            self.stats["errors"] += 1
+            print(f"[LEASE ERROR] {name}: {str(e)}")
+            return True
+
+    async def run(
+        self,
+        key: Hashable,
+        lead: Callable[[], Awaitable[Any]],
+        follow: Callable[[], Awaitable[Optional[Any]]]
+    ) -> Any:
+        """
+        lead() if this worker takes the lease for key; otherwise waits until
+        the holder releases it (or it expires) and returns follow(), which
+        reads what the leader stored. If follow() returns None (the leader
+        failed or stored something else), falls back to lead().
+        """
+        if not self.enabled:
+            return await lead()
+
+        name = "refresh:" + lease_name(key)
+        if await self._acquire(name, self.ttl):
+            self.stats["led"] += 1
+            try:
+                return await lead()
+            finally:
+                try:
+                    await asyncio.to_thread(self.backend.release_lease, name, self.owner)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"[LEASE ERROR] release {name}: {str(e)}")
+
+        self.stats["followed"] += 1
+        deadline = time.monotonic() + self.ttl
+        while time.monotonic() < deadline:
+            await asyncio.sleep(REFRESH_LEASE_POLL_MS / 1000)
+            if not await asyncio.to_thread(self.backend.lease_held, name):
+                break
+
+        result = await follow()
+        if result is None:
+            self.stats["follow_fallbacks"] += 1
+            return await lead()
+        return result
+
+    async def claim(self, key: Hashable, ttl: float) -> bool:
+        """True for exactly one worker per key until ttl expires (the lease is never released)"""
+        if not self.enabled:
+            return True
+        # Dueño único por llamada: ni este mismo worker puede renovarlo
+        claimed = await self._acquire("claim:" + lease_name(key), ttl, owner=f"{self.owner}:{uuid.uuid4().hex[:8]}")
+        self.stats["claimed" if claimed else "claim_denied"] += 1
+        return claimed
+
+    def get_stats(self) -> Dict:
+        return {"enabled": self.enabled, "owner": self.owner, "ttl": self.ttl, **self.stats}
@@ -0,0 +1,162 @@
+"""
+Resampler Module
+
+Builds higher-timeframe klines from a finer stored series (e.g. 240m from
+60m, 15m from 5m) so a timeframe switch does not need a fresh upstream
+download. Minute candles on Bybit are aligned to the Unix epoch (UTC), so a
+target bucket is simply floor(ts / target_step).
+
+Rows keep Bybit's REST layout [start, open, high, low, close, volume,
+turnover] as strings. Only the columns that are reduced are parsed, once;
+each bucket is then a slice of them: open/close are the strings of its
+first/last row, high/low the strings of its max/min row, and volume/turnover
+are summed exactly, as integers scaled by the bucket's most precise value
+(the same value and decimals a Decimal sum gives).
+
+With NumPy the bucket boundaries, the high/low rows and the sums are vector
+operations (np.flatnonzero, np.maximum/minimum.reduceat, np.add.reduceat over
+int64); a column too large for float64 to scale exactly is summed with Python
+ints, once per bucket. Without NumPy every bucket is reduced by the builtins
+over its slice. See benchmarks/resampler.py.
+"""
+
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Intervalos en minutos que pueden servir de base o de destino
+MINUTE_INTERVALS = ["1", "3", "5", "15", "30", "60", "120", "240", "360", "720"]
+
+# float64 escala exacto a entero (rint(valor * 10**decimales)) por debajo de esto
+EXACT_SCALED_LIMIT = 2 ** 50
+
+
+def base_candidates(target_interval: str) -> List[str]:
+    """Finer intervals that divide target_interval, coarsest first"""
+    if not target_interval.isdigit():
+        return []
+    target = int(target_interval)
+    return [i for i in reversed(MINUTE_INTERVALS) if int(i) < target and target % int(i) == 0]
+
+
+def decimal_places(values: List[str]) -> List[int]:
+    """Digits after the point of each decimal string"""
+    return [len(v.partition(".")[2]) for v in values]
+
+
+def format_scaled(value: int, decimals: int) -> str:
+    """123456, 2 -> "1234.56" """
+    if not decimals:
+        return str(value)
+    sign = "-" if value < 0 else ""
+    digits = str(abs(value)).rjust(decimals + 1, "0")
+    return f"{sign}{digits[:-decimals]}.{digits[-decimals:]}"
+
+
+def decimal_sums(values: List[str], decimals: List[int], starts: List[int], ends: List[int]) -> List[str]:
+    """Exact sum of each values[start:end], with the decimals of its most precise value"""
+    sums = []
+    for start, end in zip(starts, ends):
+        places = max(decimals[start:end])
+        total = sum(
+            int(v.replace(".", "")) * 10 ** (places - d)
+            for v, d in zip(values[start:end], decimals[start:end])
+        )
+        sums.append(format_scaled(total, places))
+    return sums
+
+
+def _decimal_sums_numpy(values: List[str], starts) -> List[str]:
+    """decimal_sums with the scaling and the per-bucket sums as vector operations"""
+    decimals = np.array(decimal_places(values), dtype=np.int64)
+    bucket_decimals = np.maximum.reduceat(decimals, starts)
+    places = int(bucket_decimals.max())
+    scaled = _floats(values) * 10.0 ** places
+    if not np.abs(scaled).max() < EXACT_SCALED_LIMIT:
+        starts = starts.tolist()
+        return decimal_sums(values, decimals.tolist(), starts, starts[1:] + [len(values)])
+
+    totals = np.add.reduceat(np.rint(scaled).astype(np.int64), starts)
+    # Cada bucket con los decimales de su valor más preciso, como una suma de Decimal
+    totals //= 10 ** (places - bucket_decimals)
+    return [format_scaled(t, d) for t, d in zip(totals.tolist(), bucket_decimals.tolist())]
+
+
+def _floats(values: List[str]):
+    # float() de Python parsea más rápido que el cast de cadenas de NumPy
+    return np.fromiter(map(float, values), np.float64, len(values))
+
+
+def _extreme_rows(values, starts, counts, reduce) -> List[int]:
+    """First row of each bucket holding its max (np.maximum) or min (np.minimum)"""
+    extremes = np.repeat(reduce.reduceat(values, starts), counts)
+    hits = np.flatnonzero(values == extremes)
+    return hits[np.searchsorted(hits, starts)].tolist()
+
+
+def _reduce_numpy(rows: List[List[str]], step_ms: int) -> Tuple[List[int], List[int], List[int], List[int], List[int], List[str], List[str]]:
+    buckets = np.array([r[0] for r in rows], dtype=np.int64) // step_ms * step_ms
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    counts = np.diff(np.append(starts, len(rows)))
+    high_at = _extreme_rows(_floats([r[2] for r in rows]), starts, counts, np.maximum)
+    low_at = _extreme_rows(_floats([r[3] for r in rows]), starts, counts, np.minimum)
+    volumes = _decimal_sums_numpy([r[5] for r in rows], starts)
+    turnovers = _decimal_sums_numpy([r[6] if len(r) > 6 else "0" for r in rows], starts)
+    return buckets[starts].tolist(), starts.tolist(), counts.tolist(), high_at, low_at, volumes, turnovers
+
+
+def _reduce_builtin(rows: List[List[str]], step_ms: int) -> Tuple[List[int], List[int], List[int], List[int], List[int], List[str], List[str]]:
+    buckets = [int(r[0]) // step_ms * step_ms for r in rows]
+    starts = [0] + [i for i in range(1, len(rows)) if buckets[i] != buckets[i - 1]]
+    ends = starts[1:] + [len(rows)]
+    highs = [float(r[2]) for r in rows]
+    lows = [float(r[3]) for r in rows]
+    high_at = [max(range(s, e), key=highs.__getitem__) for s, e in zip(starts, ends)]
+    low_at = [min(range(s, e), key=lows.__getitem__) for s, e in zip(starts, ends)]
+    volumes = [r[5] for r in rows]
+    turnovers = [r[6] if len(r) > 6 else "0" for r in rows]
+    return (
+        [buckets[s] for s in starts], starts, [e - s for s, e in zip(starts, ends)], high_at, low_at,
+        decimal_sums(volumes, decimal_places(volumes), starts, ends),
+        decimal_sums(turnovers, decimal_places(turnovers), starts, ends)
+    )
+
+
+def resample_klines(
+    rows: List[List[str]],
+    base_minutes: int,
+    target_minutes: int,
+    open_bucket_start: Optional[int] = None
+) -> List[List[str]]:
+    """
+    Aggregates ascending base rows into target_minutes candles
+
+    Args:
+        rows: Base klines ascending by open time
+        base_minutes: Base candle size
+        target_minutes: Target candle size (multiple of base_minutes)
+        open_bucket_start: Open time of the target candle still in progress;
+            it is emitted even if incomplete. Any other bucket with missing
+            base candles (e.g. cut at the start of the series) is dropped.
+
+    Returns:
+        Target klines ascending by open time, same row layout as Bybit
+    """
+    if not rows:
+        return []
+
+    step_ms = target_minutes * 60 * 1000
+    per_bucket = target_minutes // base_minutes
+    reduce = _reduce_numpy if np is not None else _reduce_builtin
+    bucket_starts, starts, counts, high_at, low_at, volumes, turnovers = reduce(rows, step_ms)
+
+    return [
+        [str(bucket_start), rows[s][1], rows[h][2], rows[l][3], rows[s + count - 1][4], volume, turnover]
+        for bucket_start, s, count, h, l, volume, turnover in zip(
+            bucket_starts, starts, counts, high_at, low_at, volumes, turnovers
+        )
+        if count == per_bucket or bucket_start == open_bucket_start
+    ]
@@ -0,0 +1,145 @@
+"""
+Response Format Module
+
+Alternative encodings for the time-series endpoints, selected with
+`?format=`:
+
+    json      List of dicts per point (default, unchanged)
+    columnar  Same JSON envelope, but "data" is one array per field
+    binary    Packed little-endian columns (application/octet-stream)
+
+Binary layout (every section starts on an 8-byte boundary so the browser can
+wrap columns with `new Float64Array(buffer, offset, count)` without copying):
+
+    magic      4 bytes  b"WLB1"
+    length     uint32   byte length of the JSON header
+    header     JSON     envelope fields + {"count": n, "columns": [{"name", "type", "offset"}]}
+    padding    to 8 bytes
+    columns    "i8" int64 / "f8" float64 / "u1" uint8 (padded to 8 bytes)
+
+String fields (e.g. datetime_colombia) are not packed; they are derived from
+the timestamp column on the client.
+"""
+
+import json
+import struct
+from array import array
+from typing import Dict, List, Optional
+
+from fastapi.responses import JSONResponse, Response
+
+FORMATS = ("json", "columnar", "binary")
+
+BINARY_MAGIC = b"WLB1"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+# Tipo de cada campo conocido en el formato binario
+FIELD_TYPES = {
+    "timestamp": "i8",
+    "in_progress": "u1"
+}
+ARRAY_CODES = {"i8": "q", "f8": "d", "u1": "B"}
+
+
+def to_columns(points: List[Dict]) -> Dict[str, List]:
+    """List of dicts -> dict of lists (field order of the first point)"""
+    if not points:
+        return {}
+    return {field: [p.get(field) for p in points] for field in points[0]}
+
+
+def _pad8(n: int) -> int:
+    return (8 - n % 8) % 8
+
+
+def encode_binary(envelope: Dict, points: List[Dict]) -> bytes:
+    """Packs numeric fields of `points` as typed columns behind a JSON header"""
+    columns = []
+    for name, values in to_columns(points).items():
+        if values and isinstance(values[0], str):
+            continue
+        kind = FIELD_TYPES.get(name, "f8")
+        if kind == "f8":
+            values = [float(v) if v is not None else float("nan") for v in values]
+        columns.append((name, kind, array(ARRAY_CODES[kind], values).tobytes()))
+
+    def build_header(offsets):
+        header = dict(envelope)
+        header["count"] = len(points)
+        header["columns"] = [
+            {"name": name, "type": kind, "offset": offset}
+            for (name, kind, _), offset in zip(columns, offsets)
+        ]
+        return json.dumps(header, separators=(',', ':')).encode("utf-8")
+
+    # Los offsets dependen del tamaño del header y viceversa: se itera hasta fijarlos
+    offsets = [0] * len(columns)
+    while True:
+        header = build_header(offsets)
+        position = 8 + len(header) + _pad8(8 + len(header))
+        new_offsets = []
+        for _, _, data in columns:
+            new_offsets.append(position)
+            position += len(data) + _pad8(len(data))
+        if new_offsets == offsets:
+            break
+        offsets = new_offsets
+
+    parts = [BINARY_MAGIC, struct.pack("<I", len(header)), header, b"\0" * _pad8(8 + len(header))]
+    for _, _, data in columns:
+        parts.append(data)
+        parts.append(b"\0" * _pad8(len(data)))
+    return b"".join(parts)
+
+
+def decode_binary(payload: bytes) -> Dict:
+    """Inverse of encode_binary (used by benchmarks and tooling)"""
+    if payload[:4] != BINARY_MAGIC:
+        raise ValueError("Not a WLB1 payload")
+    (length,) = struct.unpack_from("<I", payload, 4)
+    header = json.loads(payload[8:8 + length])
+    count = header["count"]
+    data = {}
+    for column in header["columns"]:
+        values = array(ARRAY_CODES[column["type"]])
+        values.frombytes(payload[column["offset"]:column["offset"] + count * values.itemsize])
+        data[column["name"]] = values.tolist()
+    header["data"] = data
+    return header
+
+
+def format_response(result: Dict, fmt: str = "json"):
+    """
+    Re-encodes an endpoint result ({"data": [...], ...}) in the requested format
+
+    Unknown formats and unsuccessful results are returned unchanged as JSON.
+    """
+    if fmt == "json" or fmt not in FORMATS or not result.get("success"):
+        return result
+
+    points = result.get("data") or []
+    envelope = {k: v for k, v in result.items() if k != "data"}
+    envelope["format"] = fmt
+
+    if fmt == "columnar":
+        envelope["data"] = to_columns(points)
+        envelope["count"] = len(points)
+        return envelope
+
+    return Response(content=encode_binary(envelope, points), media_type=BINARY_MEDIA_TYPE)
+
+
+def render_response(result: Dict, fmt: str = "json") -> Response:
+    """Like format_response, but always a Response (so headers can be set)"""
+    encoded = format_response(result, fmt)
+    if isinstance(encoded, Response):
+        return encoded
+    return JSONResponse(content=encoded)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, "*" and lists supported)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
@@ -0,0 +1,88 @@
+"""
+Single-Flight Module
+
+In-flight request registry: concurrent callers asking for the same upstream
+resource (same endpoint, symbol, interval and window) await one shared fetch
+instead of each hitting Bybit.
+
+The shared fetch runs in the highest-priority lane among its callers (see
+rate_limiter.SharedLane), not in the lane of whoever started it: a prefetch
+started in the background lane is raised to the interactive lane as soon
+as a user request joins it.
+"""
+
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from rate_limiter import upstream_priority, current_lane, SharedLane
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one execution"""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, Tuple[asyncio.Task, SharedLane]] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs `fn` once per key while a call for that key is in flight
+
+        Args:
+            key: Tuple (endpoint, symbol, interval, window)
+            fn: Coroutine function performing the upstream fetch
+
+        Returns:
+            The shared result. Callers must treat it as read-only.
+        """
+        endpoint = str(key[0]) if isinstance(key, tuple) else str(key)
+        stats = self.stats.setdefault(endpoint, {"calls": 0, "executions": 0, "coalesced": 0})
+        stats["calls"] += 1
+
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            task, lane = flight
+            lane.raise_to(current_lane())
+            stats["coalesced"] += 1
+        else:
+            # La petición corre en su propia tarea: cancelar a cualquier llamador,
+            # también al primero, no la cancela para los demás
+            lane = SharedLane(current_lane())
+            context = contextvars.copy_context()
+            context.run(upstream_priority.set, lane)
+            task = asyncio.create_task(fn(), context=context)
+            self._in_flight[key] = (task, lane)
+            task.add_done_callback(lambda t: self._done(key, t))
+            stats["executions"] += 1
+
+        # Dentro de otro trabajo compartido: este hereda sus subidas de carril
+        caller = upstream_priority.get()
+        if isinstance(caller, SharedLane):
+            caller.follow(lane)
+
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        flight = self._in_flight.get(key)
+        if flight is not None and flight[0] is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Marcar como leída si todos los llamadores se cancelaron
+
+    def get_stats(self) -> Dict:
+        """Per-endpoint and total call / execution / coalesced counters"""
+        totals = {"calls": 0, "executions": 0, "coalesced": 0}
+        for stats in self.stats.values():
+            for name in totals:
+                totals[name] += stats[name]
+
+        return {
+            "in_flight": len(self._in_flight),
+            "totals": totals,
+            "by_endpoint": {name: dict(stats) for name, stats in self.stats.items()}
+        }
+
+
+# Global instance shared by every upstream path
+upstream_flight = SingleFlight()
@@ -0,0 +1,617 @@
+"""
+SQLite Store Module
+
+Local SQLite database (WAL mode) for the time series the API serves: raw
+klines, open interest, taker buy/sell volume aggregated from trades
+(trade_aggregator.py). Every table is keyed by
+(symbol, interval, timestamp), so a request reads only its range through the
+primary-key index and a refresh upserts only the rows it downloaded. The
+`series` table records, per (kind, symbol, interval), how far back the stored
+rows reach and when they were last fetched.
+
+Each process opens its own connection. WAL lets readers run while a writer
+commits, and every write is a short BEGIN IMMEDIATE transaction with a busy
+timeout, so several uvicorn workers can share the same file. The `kv`,
+`leases` and `generations` tables back the "sqlite" cache backend (see
+cache_backend.py).
+
+If `generation` is set (see cache_namespace.py), get_series treats a series
+fetched at or before the generation of its symbol and kind as missing, so an
+invalidated series is downloaded again and rewritten in place.
+
+Configuration (environment variables):
+    SQLITE_STORE_PATH        Database file (default "cache/watchlist.db")
+    SQLITE_BUSY_TIMEOUT_MS   Wait for a competing writer (default 30000)
+
+Bulk import of the legacy cache folder (also run once at startup):
+    python sqlite_store.py [cache_dir]
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from cache_format import read_cache_file, CACHE_FORMAT_SUFFIX
+
+SQLITE_STORE_PATH = os.getenv("SQLITE_STORE_PATH", "cache/watchlist.db")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+
+LEGACY_IMPORT_KEY = "legacy_cache_import"
+# Cuándo se importaron por última vez series del cache antiguo (segundos epoch)
+LEGACY_IMPORTED_AT_KEY = "legacy_cache_imported_at"
+
+# Versión del esquema en la tabla meta; migrate_once lleva la base hasta SCHEMA_VERSION
+# 2: los indicadores derivados de velas ya no se guardan (candle_indicators.py)
+SCHEMA_VERSION_KEY = "schema_version"
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS series (
+    kind TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    covered_from INTEGER NOT NULL,
+    fetched_at INTEGER NOT NULL,
+    PRIMARY KEY (kind, symbol, interval)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS candles (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open TEXT NOT NULL,
+    high TEXT NOT NULL,
+    low TEXT NOT NULL,
+    close TEXT NOT NULL,
+    volume TEXT NOT NULL,
+    turnover TEXT NOT NULL,
+    PRIMARY KEY (symbol, interval, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS open_interest (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open_interest REAL NOT NULL,
+    PRIMARY KEY (symbol, interval, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS trade_volume (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    buy_volume REAL NOT NULL,
+    sell_volume REAL NOT NULL,
+    trades INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    PRIMARY KEY (symbol, interval, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS generations (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# kind de la tabla series -> tabla de filas
+CANDLES = "candles"
+OPEN_INTEREST = "openinterest"
+TRADE_VOLUME = "tradevolume"
+
+
+def kline_rows(klines: Iterable[Dict]) -> List[List[str]]:
+    """Candle rows (ascending) from the klines of a legacy *_volumedelta payload"""
+    return [
+        [str(k["timestamp"]), str(k["open"]), str(k["high"]), str(k["low"]), str(k["close"]), str(k["volume"])]
+        for k in sorted(klines, key=lambda k: k["timestamp"])
+    ]
+
+
+class SQLiteStore:
+    """Range reads and upserts of candles, open interest and trade volume"""
+
+    def __init__(self, path=SQLITE_STORE_PATH, busy_timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS):
+        self.path = Path(path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        # (symbol, kind) -> generation en ms; las series anteriores cuentan como ausentes
+        self.generation: Optional[Callable[[str, str], int]] = None
+        self.stats = {"reads": 0, "writes": 0, "rows_read": 0, "rows_written": 0, "series_superseded": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        # Conexión perezosa: cada worker de uvicorn abre la suya al primer uso
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path),
+                timeout=self.busy_timeout_ms / 1000,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _read(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        self.stats["reads"] += 1
+        self.stats["rows_read"] += len(rows)
+        return rows
+
+    @contextmanager
+    def _write(self):
+        """Short IMMEDIATE transaction: takes the write lock up front, waits busy_timeout for other workers"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self.stats["writes"] += 1
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---------- series ----------
+
+    def get_series(self, kind: str, symbol: str, interval: str) -> Optional[Dict]:
+        """{"covered_from", "fetched_at"} (ms) of a stored series, or None"""
+        rows = self._read(
+            "SELECT covered_from, fetched_at FROM series WHERE kind=? AND symbol=? AND interval=?",
+            (kind, symbol, interval)
+        )
+        if not rows:
+            return None
+        if self.generation is not None and rows[0][1] <= self.generation(symbol, kind):
+            self.stats["series_superseded"] += 1
+            return None
+        return {"covered_from": rows[0][0], "fetched_at": rows[0][1]}
+
+    @staticmethod
+    def _set_series(conn, kind: str, symbol: str, interval: str, covered_from: int, fetched_at: int):
+        conn.execute(
+            "INSERT INTO series (kind, symbol, interval, covered_from, fetched_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (kind, symbol, interval) DO UPDATE SET "
+            "covered_from=excluded.covered_from, fetched_at=excluded.fetched_at",
+            (kind, symbol, interval, int(covered_from), int(fetched_at))
+        )
+
+    # ---------- candles ----------
+
+    def read_candles(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> List[List[str]]:
+        """Raw Bybit rows with open time in [start_ms, end_ms], ascending"""
+        rows = self._read(
+            "SELECT ts, open, high, low, close, volume, turnover FROM candles "
+            "WHERE symbol=? AND interval=? AND ts BETWEEN ? AND ? ORDER BY ts",
+            (symbol, interval, start_ms, end_ms)
+        )
+        return [[str(r[0]), *r[1:]] for r in rows]
+
+    def candle_open_time(self, symbol: str, interval: str, at_most: Optional[int] = None) -> Optional[int]:
+        """Latest open time <= at_most, or the first stored open time when at_most is None"""
+        if at_most is None:
+            rows = self._read("SELECT MIN(ts) FROM candles WHERE symbol=? AND interval=?", (symbol, interval))
+        else:
+            rows = self._read(
+                "SELECT MAX(ts) FROM candles WHERE symbol=? AND interval=? AND ts <= ?",
+                (symbol, interval, at_most)
+            )
+        return rows[0][0]
+
+    def write_candles(
+        self,
+        symbol: str,
+        interval: str,
+        rows: List[List[str]],
+        covered_from: int,
+        fetched_at: int,
+        replace_from: Optional[int] = None,
+        max_candles: Optional[int] = None
+    ):
+        """
+        Upserts raw rows and updates the series metadata in one transaction
+
+        Args:
+            replace_from: Stored rows from this open time on are dropped first
+                (the tail being re-downloaded)
+            max_candles: Keep only the newest max_candles rows; covered_from
+                moves up to the first kept row when anything is trimmed
+        """
+        key = (symbol, interval)
+        with self._write() as conn:
+            if replace_from is not None:
+                conn.execute("DELETE FROM candles WHERE symbol=? AND interval=? AND ts >= ?", (*key, replace_from))
+
+            conn.executemany(
+                "INSERT INTO candles (symbol, interval, ts, open, high, low, close, volume, turnover) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (symbol, interval, ts) DO UPDATE SET open=excluded.open, high=excluded.high, "
+                "low=excluded.low, close=excluded.close, volume=excluded.volume, turnover=excluded.turnover",
+                [(*key, int(r[0]), r[1], r[2], r[3], r[4], r[5], r[6] if len(r) > 6 else "0") for r in rows]
+            )
+
+            if max_candles:
+                trimmed = conn.execute(
+                    "DELETE FROM candles WHERE symbol=? AND interval=? AND ts < ("
+                    "SELECT ts FROM candles WHERE symbol=? AND interval=? ORDER BY ts DESC LIMIT 1 OFFSET ?)",
+                    (*key, *key, max_candles - 1)
+                ).rowcount
+                if trimmed:
+                    first = conn.execute("SELECT MIN(ts) FROM candles WHERE symbol=? AND interval=?", key).fetchone()[0]
+                    covered_from = max(covered_from, first)
+
+            if conn.execute("SELECT 1 FROM candles WHERE symbol=? AND interval=? LIMIT 1", key).fetchone():
+                self._set_series(conn, CANDLES, symbol, interval, covered_from, fetched_at)
+            else:
+                # Serie vacía: sin metadatos, la próxima petición hace la descarga completa
+                conn.execute("DELETE FROM series WHERE kind=? AND symbol=? AND interval=?", (CANDLES, *key))
+        self.stats["rows_written"] += len(rows)
+
+    # ---------- open interest ----------
+
+    def read_open_interest(self, symbol: str, interval: str, start_ms: int) -> List[Tuple[int, float]]:
+        """(timestamp, open interest) with timestamp >= start_ms, ascending"""
+        return self._read(
+            "SELECT ts, open_interest FROM open_interest WHERE symbol=? AND interval=? AND ts >= ? ORDER BY ts",
+            (symbol, interval, start_ms)
+        )
+
+    def write_open_interest(
+        self,
+        symbol: str,
+        interval: str,
+        points: Iterable[Tuple[int, float]],
+        covered_from: int,
+        fetched_at: int
+    ):
+        """Upserts (timestamp, open interest) points and the series metadata"""
+        points = list(points)
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT INTO open_interest (symbol, interval, ts, open_interest) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (symbol, interval, ts) DO UPDATE SET open_interest=excluded.open_interest",
+                [(symbol, interval, int(ts), float(value)) for ts, value in points]
+            )
+            self._set_series(conn, OPEN_INTEREST, symbol, interval, covered_from, fetched_at)
+        self.stats["rows_written"] += len(points)
+
+    # ---------- volumen taker por vela (trades) ----------
+
+    def read_trade_volume(self, symbol: str, interval: str, start_ms: int) -> List[Tuple]:
+        """(open time, buy volume, sell volume, trades, complete) with open time >= start_ms, ascending"""
+        return self._read(
+            "SELECT ts, buy_volume, sell_volume, trades, complete FROM trade_volume "
+            "WHERE symbol=? AND interval=? AND ts >= ? ORDER BY ts",
+            (symbol, interval, start_ms)
+        )
+
+    def write_trade_volume(self, rows: List[Tuple], fetched_at: int, keep_from: Optional[int] = None):
+        """
+        Upserts closed buckets (symbol, interval, open time, buy, sell, trades,
+        complete) and their series metadata. A partial bucket never replaces a
+        complete one; keep_from drops older buckets of the written series.
+        """
+        series = {(row[0], row[1]) for row in rows}
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT INTO trade_volume (symbol, interval, ts, buy_volume, sell_volume, trades, complete) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (symbol, interval, ts) DO UPDATE SET buy_volume=excluded.buy_volume, "
+                "sell_volume=excluded.sell_volume, trades=excluded.trades, complete=excluded.complete "
+                "WHERE excluded.complete >= trade_volume.complete",
+                [(*row[:6], int(row[6])) for row in rows]
+            )
+            for symbol, interval in series:
+                if keep_from is not None:
+                    conn.execute(
+                        "DELETE FROM trade_volume WHERE symbol=? AND interval=? AND ts < ?", (symbol, interval, keep_from)
+                    )
+                first = conn.execute(
+                    "SELECT MIN(ts) FROM trade_volume WHERE symbol=? AND interval=?", (symbol, interval)
+                ).fetchone()[0]
+                if first is not None:
+                    self._set_series(conn, TRADE_VOLUME, symbol, interval, first, fetched_at)
+        self.stats["rows_written"] += len(rows)
+
+    # ---------- clave-valor y leases (backend de cache "sqlite") ----------
+
+    def kv_get(self, key: str) -> Optional[bytes]:
+        rows = self._read(
+            "SELECT value FROM kv WHERE key=? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+        )
+        return rows[0][0] if rows else None
+
+    def kv_set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value=excluded.value, expires_at=excluded.expires_at",
+                (key, value, time.time() + ttl if ttl else None)
+            )
+
+    def kv_delete(self, key: str) -> bool:
+        with self._write() as conn:
+            return conn.execute("DELETE FROM kv WHERE key=?", (key,)).rowcount > 0
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Takes (or renews) the lease unless another owner holds an unexpired one"""
+        now = time.time()
+        with self._write() as conn:
+            return conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner=excluded.owner, expires_at=excluded.expires_at "
+                "WHERE leases.expires_at <= ? OR leases.owner = excluded.owner",
+                (name, owner, now + ttl, now)
+            ).rowcount > 0
+
+    def release_lease(self, name: str, owner: str):
+        with self._write() as conn:
+            conn.execute("DELETE FROM leases WHERE name=? AND owner=?", (name, owner))
+
+    def lease_held(self, name: str) -> bool:
+        return bool(self._read("SELECT 1 FROM leases WHERE name=? AND expires_at > ?", (name, time.time())))
+
+    def purge_expired_leases(self) -> int:
+        with self._write() as conn:
+            return conn.execute("DELETE FROM leases WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def kv_purge_expired(self) -> int:
+        with self._write() as conn:
+            return conn.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def load_generations(self) -> Dict[str, int]:
+        return dict(self._read("SELECT name, value FROM generations"))
+
+    def bump_generation(self, name: str, value: int) -> int:
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO generations (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value=max(generations.value, excluded.value)",
+                (name, int(value))
+            )
+            return conn.execute("SELECT value FROM generations WHERE name=?", (name,)).fetchone()[0]
+
+    # ---------- mantenimiento ----------
+
+    def clear(self, kind: Optional[str] = None) -> int:
+        """Drops every series (or every series of one kind); returns how many"""
+        with self._write() as conn:
+            if kind is None:
+                deleted = conn.execute("DELETE FROM series").rowcount
+                for table in ("candles", "open_interest", "trade_volume", "kv"):
+                    conn.execute(f"DELETE FROM {table}")
+            else:
+                deleted = conn.execute("DELETE FROM series WHERE kind=?", (kind,)).rowcount
+                if kind == CANDLES:
+                    conn.execute("DELETE FROM candles")
+                elif kind == OPEN_INTEREST:
+                    conn.execute("DELETE FROM open_interest")
+                elif kind == TRADE_VOLUME:
+                    conn.execute("DELETE FROM trade_volume")
+        return deleted
+
+    def list_series(self) -> List[Tuple[str, str, str, int]]:
+        """(kind, symbol, interval, fetched_at) of every stored series"""
+        return self._read("SELECT kind, symbol, interval, fetched_at FROM series")
+
+    def delete_series(self, kind: str, symbol: str, interval: str) -> int:
+        """Drops one series and its rows; returns the number of rows deleted"""
+        key = (symbol, interval)
+        with self._write() as conn:
+            conn.execute("DELETE FROM series WHERE kind=? AND symbol=? AND interval=?", (kind, *key))
+            if kind == CANDLES:
+                return conn.execute("DELETE FROM candles WHERE symbol=? AND interval=?", key).rowcount
+            if kind == OPEN_INTEREST:
+                return conn.execute("DELETE FROM open_interest WHERE symbol=? AND interval=?", key).rowcount
+            if kind == TRADE_VOLUME:
+                return conn.execute("DELETE FROM trade_volume WHERE symbol=? AND interval=?", key).rowcount
+            return 0
+
+    def used_bytes(self) -> int:
+        """Bytes of the database actually holding data (pages freed by deletes are reused, not returned)"""
+        page_count = self._read("PRAGMA page_count")[0][0]
+        freelist = self._read("PRAGMA freelist_count")[0][0]
+        page_size = self._read("PRAGMA page_size")[0][0]
+        return (page_count - freelist) * page_size
+
+    def count_series(self, kind: Optional[str] = None) -> int:
+        if kind is None:
+            return self._read("SELECT COUNT(*) FROM series")[0][0]
+        return self._read("SELECT COUNT(*) FROM series WHERE kind=?", (kind,))[0][0]
+
+    def get_stats(self) -> Dict:
+        series = dict(self._read("SELECT kind, COUNT(*) FROM series GROUP BY kind"))
+        rows = {
+            table: self._read(f"SELECT COUNT(*) FROM {table}")[0][0]
+            for table in ("candles", "open_interest", "trade_volume")
+        }
+        size = sum(
+            p.stat().st_size for p in (self.path, self.path.with_name(self.path.name + "-wal")) if p.exists()
+        )
+        return {"path": str(self.path), "bytes": size, "series": series, "rows": rows, **self.stats}
+
+    # ---------- importación del cache antiguo ----------
+
+    def import_cache_dir(self, directory: Path) -> Dict:
+        """
+        Bulk-imports the legacy cache folder: candles/*_candles.json, the
+        *_openinterest files and the klines of the *_volumedelta files (.wlc
+        or .json). Source files are left in place; support/resistance caches
+        are not time series and stay in the file cache.
+        """
+        directory = Path(directory)
+        result = {"candles": 0, "openinterest": 0, "volumedelta": 0, "failed": 0, "rows": 0}
+
+        for path in sorted((directory / "candles").glob("*_candles.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    series = json.load(f)
+                if series.get("candles"):
+                    self.write_candles(
+                        series["symbol"], series["interval"], series["candles"],
+                        series["covered_from"], series["fetched_at"]
+                    )
+                    result["candles"] += 1
+                    result["rows"] += len(series["candles"])
+            except Exception as e:
+                print(f"[SQLITE IMPORT ERROR] {path.name}: {str(e)}")
+                result["failed"] += 1
+
+        for name, count in self.import_volume_delta(directory).items():
+            result[name] += count
+
+        for base in self._legacy_bases(directory):
+            indicator = base.name.rsplit("_", 1)[-1]
+            if indicator != "openinterest":
+                continue
+            try:
+                payload, _ = read_cache_file(base)
+                fetched_at = int(payload.get("timestamp", 0) * 1000)
+                if payload.get("data"):
+                    points = [(p["timestamp"], p["openInterest"]) for p in payload["data"]]
+                    self.write_open_interest(payload["symbol"], payload["interval"], points, points[0][0], fetched_at)
+                    result["openinterest"] += 1
+                    result["rows"] += len(points)
+            except Exception as e:
+                print(f"[SQLITE IMPORT ERROR] {base.name}: {str(e)}")
+                result["failed"] += 1
+
+        return result
+
+    @staticmethod
+    def _legacy_bases(directory: Path) -> List[Path]:
+        # Un .wlc y un .json con la misma base cuentan una sola vez (read_cache_file prefiere .wlc)
+        return sorted({p.with_suffix("") for p in directory.glob("*") if p.suffix in (CACHE_FORMAT_SUFFIX, ".json")})
+
+    def import_volume_delta(self, directory: Path) -> Dict:
+        """
+        Imports the OHLCV klines of the legacy *_volumedelta files as candle
+        series. A candle series already stored is newer than these files and
+        is kept as is.
+        """
+        result = {"volumedelta": 0, "failed": 0, "rows": 0}
+        for base in self._legacy_bases(Path(directory)):
+            if base.name.rsplit("_", 1)[-1] != "volumedelta":
+                continue
+            try:
+                payload, _ = read_cache_file(base)
+                symbol, interval = payload["symbol"], payload["timeframe"]
+                if not payload.get("klines") or self.get_series(CANDLES, symbol, interval):
+                    continue
+                rows = kline_rows(payload["klines"])
+                self.write_candles(symbol, interval, rows, int(rows[0][0]), int(payload.get("timestamp", 0) * 1000))
+                result["volumedelta"] += 1
+                result["rows"] += len(rows)
+            except Exception as e:
+                print(f"[SQLITE IMPORT ERROR] {base.name}: {str(e)}")
+                result["failed"] += 1
+        return result
+
+    def import_legacy_cache_once(self, directory: Path) -> Optional[Dict]:
+        """Runs import_cache_dir the first time this database sees the folder; None if already done"""
+        with self._write() as conn:
+            # Reclamar la importación dentro de la transacción: solo un worker la hace
+            claimed = conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)", (LEGACY_IMPORT_KEY, "running")
+            ).rowcount
+        if not claimed:
+            return None
+
+        result = self.import_cache_dir(directory)
+        with self._write() as conn:
+            conn.execute("UPDATE meta SET value=? WHERE key=?", (json.dumps(result), LEGACY_IMPORT_KEY))
+            self._set_meta(conn, LEGACY_IMPORTED_AT_KEY, str(time.time()))
+        return result
+
+    @staticmethod
+    def _set_meta(conn, key: str, value: str):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value=excluded.value",
+            (key, value)
+        )
+
+    def legacy_imported_at(self) -> float:
+        """
+        When series were last imported from the legacy cache (0 if never);
+        they keep the fetched_at of their files, so the janitor counts this
+        as their last use
+        """
+        rows = self._read("SELECT value FROM meta WHERE key=?", (LEGACY_IMPORTED_AT_KEY,))
+        return float(rows[0][0]) if rows else 0.0
+
+    def schema_version(self) -> int:
+        rows = self._read("SELECT value FROM meta WHERE key=?", (SCHEMA_VERSION_KEY,))
+        return int(rows[0][0]) if rows else 1
+
+    def migrate_once(self, directory: Path) -> Optional[Dict]:
+        """
+        Brings the database to SCHEMA_VERSION (one worker does it); None if
+        already there or another worker is migrating
+
+        Version 2 first imports the klines of the legacy *_volumedelta files
+        as candle series (unless the legacy import already did), then drops
+        the indicators table and its series rows. Run it after
+        import_legacy_cache_once.
+        """
+        if self.schema_version() >= SCHEMA_VERSION:
+            return None
+        claim = f"{SCHEMA_VERSION_KEY}_{SCHEMA_VERSION}"
+        with self._write() as conn:
+            claimed = conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)", (claim, "running")
+            ).rowcount
+        if not claimed:
+            return None
+
+        legacy = self._read("SELECT value FROM meta WHERE key=?", (LEGACY_IMPORT_KEY,))
+        if legacy and legacy[0][0] != "running" and "volumedelta" in json.loads(legacy[0][0]):
+            result = {"volumedelta": 0, "failed": 0, "rows": 0}
+        else:
+            result = self.import_volume_delta(directory)
+
+        with self._write() as conn:
+            conn.execute("DROP TABLE IF EXISTS indicators")
+            result["series_dropped"] = conn.execute(
+                "DELETE FROM series WHERE kind NOT IN (?, ?, ?)", (CANDLES, OPEN_INTEREST, TRADE_VOLUME)
+            ).rowcount
+            conn.execute("UPDATE meta SET value=? WHERE key=?", (json.dumps(result), claim))
+            if result["volumedelta"]:
+                self._set_meta(conn, LEGACY_IMPORTED_AT_KEY, str(time.time()))
+            self._set_meta(conn, SCHEMA_VERSION_KEY, str(SCHEMA_VERSION))
+        return result
+
+
+sqlite_store = SQLiteStore()
+
+
+if __name__ == "__main__":
+    cache_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("cache")
+    print(json.dumps(sqlite_store.import_cache_dir(cache_dir), indent=2))
+    print(json.dumps(sqlite_store.get_stats(), indent=2))
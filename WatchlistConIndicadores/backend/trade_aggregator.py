@@ -0,0 +1,397 @@
+"""
+Trade Aggregator Module
+
+Taker buy / sell volume per candle from Bybit's public trade stream
+(publicTrade.{symbol}), for a true volume delta instead of assigning the
+whole candle volume by its colour.
+
+Each trade only touches the open 1-minute bucket of its symbol; when that
+minute closes it is added to the open bucket of every larger interval, so
+the per-trade cost does not depend on how many intervals are kept. Memory
+is one fixed-size bucket per (symbol, interval) plus the closed buckets
+waiting for the next flush. A background task closes buckets whose time has
+passed even without new trades and persists closed buckets to the SQLite
+store behind the candle store (trade_volume table).
+
+A bucket is complete only if the aggregator was listening to the symbol for
+the whole bucket: listening starts at the first trade received after the
+subscription (or after the stream reconnected), not when the subscribe is
+sent, and that trade must be no later than the bucket's open time.
+
+Offline use, from the backend folder:
+    python trade_aggregator.py --record trades.jsonl --symbols BTCUSDT,ETHUSDT --seconds 60
+    python trade_aggregator.py --replay trades.jsonl
+
+Configuration (environment variables):
+    TRADE_INTERVALS          Intervals aggregated (default "1,5,15,60,240,D"; "1" is always kept)
+    TRADE_SYMBOLS            Symbols tracked from startup (default none: on first request)
+    TRADE_MAX_SYMBOLS        Max symbols tracked (default 50)
+    TRADE_FLUSH_SECONDS      Seconds between closing/persisting buckets (default 2)
+    TRADE_RETENTION_DAYS     Days of closed buckets kept in the store (default 30)
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from candle_time import candle_open_time, MINUTE_MS
+from sqlite_store import SQLiteStore
+
+TRADE_INTERVALS = os.getenv("TRADE_INTERVALS", "1,5,15,60,240,D")
+TRADE_SYMBOLS = os.getenv("TRADE_SYMBOLS", "")
+TRADE_MAX_SYMBOLS = int(os.getenv("TRADE_MAX_SYMBOLS", "50"))
+TRADE_FLUSH_SECONDS = float(os.getenv("TRADE_FLUSH_SECONDS", "2"))
+TRADE_RETENTION_DAYS = float(os.getenv("TRADE_RETENTION_DAYS", "30"))
+
+BASE_INTERVAL = "1"
+# Espera tras el cierre de un bucket por trades que lleguen con retraso
+CLOSE_GRACE_MS = 2000
+# Tope de buckets cerrados sin persistir si el store falla
+MAX_PENDING = 100_000
+
+# Bucket: [start, end, buy_volume, sell_volume, trades]
+START, END, BUY, SELL, TRADES = range(5)
+
+
+def interval_minutes(interval: str) -> int:
+    return {"D": 1440, "W": 10080}.get(interval) or int(interval)
+
+
+class TradeAggregator:
+    """Per-candle taker buy/sell volume from public trades, in fixed-size buckets"""
+
+    def __init__(
+        self,
+        db: SQLiteStore,
+        intervals: str = TRADE_INTERVALS,
+        max_symbols: int = TRADE_MAX_SYMBOLS,
+        flush_seconds: float = TRADE_FLUSH_SECONDS,
+        retention_days: float = TRADE_RETENTION_DAYS,
+        subscribe=None
+    ):
+        self.db = db
+        self.rollup_intervals = [i.strip() for i in intervals.split(",") if i.strip() and i.strip() != BASE_INTERVAL]
+        self.intervals = [BASE_INTERVAL] + self.rollup_intervals
+        self.max_symbols = max_symbols
+        self.flush_seconds = flush_seconds
+        self.retention_ms = int(retention_days * 24 * 60 * MINUTE_MS)
+        self.subscribe = subscribe
+
+        self.symbols: Set[str] = set()
+        self.listening_since: Dict[str, int] = {}
+        self._base: Dict[str, List] = {}
+        self._rollup: Dict[Tuple[str, str], List] = {}
+        # Buckets cerrados: (symbol, interval, start, buy, sell, trades, complete)
+        self._pending: List[Tuple] = []
+        self._flushing: List[Tuple] = []
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"messages": 0, "trades": 0, "late_trades": 0, "buckets_closed": 0,
+                      "buckets_persisted": 0, "dropped_buckets": 0, "flush_errors": 0}
+
+    # ---------- símbolos ----------
+
+    def track(self, symbol: str) -> bool:
+        """Starts aggregating a symbol (subscribes its trade topic); False if over max_symbols"""
+        if symbol in self.symbols:
+            return True
+        if len(self.symbols) >= self.max_symbols:
+            return False
+        self.symbols.add(symbol)
+        if self.subscribe is not None:
+            self.subscribe(symbol)
+        return True
+
+    def reset(self):
+        """Stream reconnected: trades may have been missed, open buckets become partial"""
+        # Se vuelve a escuchar con el primer trade tras la nueva suscripción
+        self.listening_since.clear()
+
+    def on_stream_update(self, kind: str, symbol: Optional[str], interval: Optional[str], data):
+        """Listener for BybitKlineStream"""
+        if kind == "trades":
+            self.add_trades(symbol, data)
+        elif kind == "reset":
+            self.reset()
+
+    # ---------- ruta caliente ----------
+
+    def add_trades(self, symbol: str, trades: List[Dict]):
+        """Adds one publicTrade message (trades ascending, as Bybit sends them)"""
+        if symbol not in self.symbols:
+            return
+        self.stats["messages"] += 1
+        if trades and symbol not in self.listening_since:
+            # Primer trade recibido: la suscripción ya está activa
+            self.listening_since[symbol] = int(trades[0]["T"])
+        bucket = self._base.get(symbol)
+        if bucket is None:
+            if not trades:
+                return
+            start = candle_open_time(1, int(trades[0]["T"]))
+            bucket = self._base[symbol] = [start, start + MINUTE_MS, 0.0, 0.0, 0]
+
+        start, end = bucket[START], bucket[END]
+        buy, sell, count = bucket[BUY], bucket[SELL], bucket[TRADES]
+        late = 0
+        for trade in trades:
+            ts = trade["T"]
+            if ts >= end:
+                bucket[BUY], bucket[SELL], bucket[TRADES] = buy, sell, count
+                self._close_base(symbol, bucket)
+                start = candle_open_time(1, ts)
+                end = start + MINUTE_MS
+                bucket = self._base[symbol] = [start, end, 0.0, 0.0, 0]
+                buy = sell = 0.0
+                count = 0
+            elif ts < start:
+                late += 1
+                continue
+            if trade["S"] == "Buy":
+                buy += float(trade["v"])
+            else:
+                sell += float(trade["v"])
+            count += 1
+        bucket[BUY], bucket[SELL], bucket[TRADES] = buy, sell, count
+
+        self.stats["trades"] += len(trades) - late
+        self.stats["late_trades"] += late
+
+    # ---------- cierre de buckets ----------
+
+    def _emit(self, symbol: str, interval: str, bucket: List):
+        since = self.listening_since.get(symbol)
+        complete = since is not None and bucket[START] >= since
+        self._pending.append((symbol, interval, bucket[START], bucket[BUY], bucket[SELL], bucket[TRADES], complete))
+        self.stats["buckets_closed"] += 1
+        if len(self._pending) > MAX_PENDING:
+            drop = len(self._pending) - MAX_PENDING
+            del self._pending[:drop]
+            self.stats["dropped_buckets"] += drop
+
+    def _close_base(self, symbol: str, minute: List):
+        """Emits a closed 1-minute bucket and adds it to the larger intervals"""
+        self._emit(symbol, BASE_INTERVAL, minute)
+        for interval in self.rollup_intervals:
+            key = (symbol, interval)
+            bucket = self._rollup.get(key)
+            if bucket is not None and minute[START] >= bucket[END]:
+                self._emit(symbol, interval, bucket)
+                bucket = None
+            if bucket is None:
+                minutes = interval_minutes(interval)
+                start = candle_open_time(minutes, minute[START])
+                bucket = self._rollup[key] = [start, start + minutes * MINUTE_MS, 0.0, 0.0, 0]
+            bucket[BUY] += minute[BUY]
+            bucket[SELL] += minute[SELL]
+            bucket[TRADES] += minute[TRADES]
+
+    def close_expired(self, now_ms: Optional[int] = None):
+        """Closes buckets whose time has passed (plus grace) although no newer trade arrived"""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        for symbol, bucket in list(self._base.items()):
+            if bucket[END] + CLOSE_GRACE_MS <= now_ms:
+                self._close_base(symbol, bucket)
+                del self._base[symbol]
+        for key, bucket in list(self._rollup.items()):
+            if bucket[END] + CLOSE_GRACE_MS <= now_ms and key[0] not in self._base:
+                self._emit(key[0], key[1], bucket)
+                del self._rollup[key]
+
+    def _persist(self, rows: List[Tuple]):
+        """Writes closed buckets (blocking); pruning buckets older than the retention"""
+        wall_ms = int(time.time() * 1000)
+        self.db.write_trade_volume(rows, wall_ms, keep_from=wall_ms - self.retention_ms)
+
+    def _take_pending(self) -> List[Tuple]:
+        # Los buckets en escritura siguen visibles para get_buckets
+        self._flushing, self._pending = self._pending, []
+        return self._flushing
+
+    def _settle(self, persisted: bool):
+        if persisted:
+            self.stats["buckets_persisted"] += len(self._flushing)
+        else:
+            # Se reintenta en el próximo flush
+            self._pending = self._flushing + self._pending
+        self._flushing = []
+
+    def flush(self, now_ms: Optional[int] = None) -> int:
+        """
+        Closes buckets expired at now_ms (default: now) and persists every
+        closed one (blocking; the background task does the same with the
+        write in a worker thread). Returns the buckets written.
+        """
+        self.close_expired(now_ms)
+        rows = self._take_pending()
+        try:
+            if rows:
+                self._persist(rows)
+        except Exception:
+            self._settle(False)
+            raise
+        self._settle(True)
+        return len(rows)
+
+    # ---------- lecturas ----------
+
+    def get_buckets(self, symbol: str, interval: str, start_ms: int) -> List[Tuple[int, float, float, int, bool]]:
+        """
+        (open time, buy volume, sell volume, trades, complete) ascending since
+        start_ms: persisted buckets, closed ones not yet persisted and the
+        bucket in progress
+        """
+        buckets = {row[0]: (row[0], row[1], row[2], row[3], bool(row[4]))
+                   for row in self.db.read_trade_volume(symbol, interval, start_ms)}
+
+        for row in self._flushing + self._pending:
+            if row[0] == symbol and row[1] == interval and row[2] >= start_ms:
+                buckets[row[2]] = row[2:]
+
+        since = self.listening_since.get(symbol)
+        minute = self._base.get(symbol)
+        if interval == BASE_INTERVAL:
+            live = [minute] if minute else []
+        else:
+            live = []
+            bucket = self._rollup.get((symbol, interval))
+            if bucket is not None:
+                live = [list(bucket)]
+            if minute is not None:
+                # El minuto en curso aún no se sumó al intervalo mayor
+                if live and minute[START] < live[0][END]:
+                    for field in (BUY, SELL, TRADES):
+                        live[0][field] += minute[field]
+                else:
+                    minutes = interval_minutes(interval)
+                    start = candle_open_time(minutes, minute[START])
+                    live.append([start, start + minutes * MINUTE_MS, minute[BUY], minute[SELL], minute[TRADES]])
+        for bucket in live:
+            if bucket[START] >= start_ms:
+                buckets[bucket[START]] = (bucket[START], bucket[BUY], bucket[SELL], bucket[TRADES], since is not None and bucket[START] >= since)
+
+        return [buckets[ts] for ts in sorted(buckets)]
+
+    # ---------- tarea en segundo plano ----------
+
+    async def start(self):
+        for symbol in TRADE_SYMBOLS.split(","):
+            if symbol.strip():
+                self.track(symbol.strip().upper())
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Lo ya cerrado se guarda; los buckets abiertos quedarían incompletos
+        if self._pending:
+            await asyncio.to_thread(self._persist, self._take_pending())
+            self._settle(True)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            # Cerrar y tomar los buckets en el event loop, donde llegan los trades;
+            # el hilo solo escribe en SQLite
+            self.close_expired()
+            rows = self._take_pending()
+            if not rows:
+                self._settle(True)
+                continue
+            try:
+                await asyncio.to_thread(self._persist, rows)
+                self._settle(True)
+            except Exception as e:
+                self._settle(False)
+                self.stats["flush_errors"] += 1
+                print(f"[TRADE AGGREGATOR ERROR] {str(e)}")
+
+    def get_stats(self) -> Dict:
+        return {
+            "symbols": len(self.symbols),
+            "max_symbols": self.max_symbols,
+            "intervals": self.intervals,
+            "open_buckets": len(self._base) + len(self._rollup),
+            "pending_buckets": len(self._pending),
+            **self.stats
+        }
+
+
+def replay_messages(aggregator: TradeAggregator, lines: Iterable, flush_every: int = 0) -> int:
+    """
+    Feeds recorded stream messages (one JSON message per line) to the
+    aggregator, tracking every symbol seen; flush_every > 0 persists closed
+    buckets every that many messages, at the time of the replayed trades.
+    Returns the number of trade messages.
+    """
+    count = 0
+    for line in lines:
+        payload = json.loads(line)
+        topic = payload.get("topic", "")
+        if not topic.startswith("publicTrade."):
+            continue
+        symbol = topic.split(".", 1)[1]
+        if symbol not in aggregator.symbols:
+            aggregator.track(symbol)
+            aggregator.listening_since[symbol] = 0
+        aggregator.add_trades(symbol, payload.get("data", []))
+        count += 1
+        if flush_every and count % flush_every == 0:
+            aggregator.flush(payload.get("ts"))
+    return count
+
+
+async def record(path: str, symbols: List[str], seconds: float, url: str):
+    """Writes the raw publicTrade messages of symbols to path for seconds"""
+    import websockets
+
+    deadline = time.monotonic() + seconds
+    written = 0
+    async with websockets.connect(url, ping_interval=20) as ws:
+        topics = [f"publicTrade.{s}" for s in symbols]
+        for i in range(0, len(topics), 10):
+            await ws.send(json.dumps({"op": "subscribe", "args": topics[i:i + 10]}))
+        with open(path, "w", encoding="utf-8") as f:
+            while time.monotonic() < deadline:
+                try:
+                    message = await asyncio.wait_for(ws.recv(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+                if '"publicTrade.' in message:
+                    f.write(message.strip() + "\n")
+                    written += 1
+    print(f"{written} messages written to {path}")
+
+
+if __name__ == "__main__":
+    from bybit_stream import BYBIT_WS_URL
+    from sqlite_store import sqlite_store
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", help="Record publicTrade messages to this file")
+    parser.add_argument("--symbols", default="BTCUSDT,ETHUSDT")
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--replay", help="Aggregate a recorded file into the SQLite store")
+    args = parser.parse_args()
+
+    if args.record:
+        asyncio.run(record(args.record, args.symbols.upper().split(","), args.seconds, BYBIT_WS_URL))
+    elif args.replay:
+        aggregator = TradeAggregator(sqlite_store, max_symbols=10 ** 6)
+        with open(args.replay, "r", encoding="utf-8") as f:
+            replay_messages(aggregator, f, flush_every=1000)
+        # Fin de la grabación: se cierra todo lo abierto
+        aggregator.flush(now_ms=2 ** 62)
+        print(json.dumps(aggregator.get_stats(), indent=2))
+    else:
+        parser.print_help()
+        sys.exit(1)
@@ -0,0 +1,213 @@
+"""
+WebSocket Fan-out Module
+
+Backend /ws endpoint for browser clients. Clients subscribe by topic,
+symbol and interval; every upstream update from the single Bybit stream is
+parsed and serialised once, then fanned out to all subscribers.
+
+Each client has its own sender task with drop-to-latest backpressure: while
+a slow client is still sending, newer updates for the same (topic, symbol,
+interval) replace the pending one instead of queueing up.
+
+Client protocol (JSON text frames):
+    -> {"op": "subscribe",   "args": [{"topic": "kline", "symbol": "BTCUSDT", "interval": "15"}]}
+    -> {"op": "unsubscribe", "args": [...]}
+    -> {"op": "ping"}
+    <- {"t": "kline", "s": "BTCUSDT", "i": "15", "d": [ts, open, high, low, close, volume]}
+    <- {"t": "vd",    "s": "BTCUSDT", "i": "15", "d": [ts, volumeDelta]}
+    <- {"t": "ticker", "s": "BTCUSDT", "d": {"p": lastPrice, "oi": openInterest, ...}}
+
+Topics: "kline", "vd" (per-candle volume delta) and "ticker".
+"""
+
+import json
+import asyncio
+import logging
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+logger = logging.getLogger(__name__)
+
+TOPICS = {"kline", "vd", "ticker"}
+
+SubscriptionKey = Tuple[str, str, str]
+
+
+class FanoutClient:
+    """One browser connection with a conflating (drop-to-latest) outbox"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.subscriptions: Set[SubscriptionKey] = set()
+        self.pending: Dict[SubscriptionKey, str] = {}
+        self.has_pending = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, key: SubscriptionKey, message: str):
+        if key in self.pending:
+            self.dropped += 1  # El cliente no ha enviado la anterior: se reemplaza
+        self.pending[key] = message
+        self.has_pending.set()
+
+    async def sender(self):
+        try:
+            while True:
+                await self.has_pending.wait()
+                self.has_pending.clear()
+                batch, self.pending = self.pending, {}
+                for message in batch.values():
+                    await self.websocket.send_text(message)
+                    self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            pass  # Conexión cerrada: serve() limpia al cliente
+
+
+class FanoutHub:
+    """Subscription index and broadcaster for /ws clients"""
+
+    def __init__(
+        self,
+        on_subscribe: Optional[Callable[[str, str], None]] = None,
+        normalize_interval: Optional[Callable[[str], str]] = None
+    ):
+        self.on_subscribe = on_subscribe
+        self.normalize_interval = normalize_interval
+        self.clients: Set[FanoutClient] = set()
+        self.index: Dict[SubscriptionKey, Set[FanoutClient]] = {}
+        self.stats = {"connections": 0, "published": 0, "delivered": 0, "sent_closed": 0, "dropped_closed": 0}
+
+    def _key(self, topic: str, symbol: str, interval: Optional[str]) -> SubscriptionKey:
+        # El ticker no depende del intervalo
+        if topic == "ticker":
+            return (topic, symbol.upper(), "")
+        interval = str(interval or "")
+        if self.normalize_interval and interval:
+            interval = self.normalize_interval(interval)
+        return (topic, symbol.upper(), interval)
+
+    # ---------- Publishing ----------
+
+    def publish(self, topic: str, symbol: str, interval: Optional[str], payload: Dict):
+        """Serialises once and offers the message to every subscriber"""
+        key = self._key(topic, symbol, interval)
+        subscribers = self.index.get(key)
+        if not subscribers:
+            return
+
+        message = json.dumps(payload, separators=(',', ':'))
+        for client in subscribers:
+            client.offer(key, message)
+        self.stats["published"] += 1
+        self.stats["delivered"] += len(subscribers)
+
+    def on_stream_update(self, kind: str, symbol: str, interval: Optional[str], data):
+        """Listener for BybitKlineStream: compacts and fans out each update"""
+        if kind == "kline":
+            ts = int(data[0])
+            o, h, l, c, v = (float(x) for x in data[1:6])
+            self.publish("kline", symbol, interval, {"t": "kline", "s": symbol, "i": interval, "d": [ts, o, h, l, c, v]})
+            # Mismo criterio que cvd_engine.compute_volume_delta
+            delta = v if c >= o else -v
+            self.publish("vd", symbol, interval, {"t": "vd", "s": symbol, "i": interval, "d": [ts, delta]})
+        elif kind == "ticker":
+            compact = {
+                "p": data.get("lastPrice"),
+                "mp": data.get("markPrice"),
+                "oi": data.get("openInterest"),
+                "fr": data.get("fundingRate"),
+                "v24": data.get("volume24h"),
+                "pc24": data.get("price24hPcnt")
+            }
+            self.publish("ticker", symbol, None, {"t": "ticker", "s": symbol, "d": compact})
+
+    # ---------- Subscriptions ----------
+
+    def subscribe(self, client: FanoutClient, topic: str, symbol: str, interval: Optional[str]):
+        if topic not in TOPICS or not symbol:
+            return
+        key = self._key(topic, symbol, interval)
+        client.subscriptions.add(key)
+        self.index.setdefault(key, set()).add(client)
+        if self.on_subscribe and topic != "ticker":
+            self.on_subscribe(key[1], key[2])
+
+    def unsubscribe(self, client: FanoutClient, topic: str, symbol: str, interval: Optional[str]):
+        key = self._key(topic, symbol, interval)
+        client.subscriptions.discard(key)
+        subscribers = self.index.get(key)
+        if subscribers:
+            subscribers.discard(client)
+            if not subscribers:
+                del self.index[key]
+
+    def _drop_client(self, client: FanoutClient):
+        for key in list(client.subscriptions):
+            subscribers = self.index.get(key)
+            if subscribers:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.index[key]
+        client.subscriptions.clear()
+        self.clients.discard(client)
+        self.stats["sent_closed"] += client.sent
+        self.stats["dropped_closed"] += client.dropped
+
+    # ---------- Connection ----------
+
+    async def serve(self, websocket: WebSocket):
+        """Handles one /ws connection until it closes"""
+        await websocket.accept()
+        client = FanoutClient(websocket)
+        self.clients.add(client)
+        self.stats["connections"] += 1
+        sender = asyncio.create_task(client.sender())
+
+        try:
+            while True:
+                try:
+                    message = json.loads(await websocket.receive_text())
+                except ValueError:
+                    continue
+                # Cualquier JSON que no sea un objeto se ignora
+                if not isinstance(message, dict):
+                    continue
+
+                op = message.get("op")
+                if op == "ping":
+                    client.offer(("pong", "", ""), '{"op":"pong"}')
+                    continue
+
+                args = message.get("args")
+                for arg in args if isinstance(args, list) else []:
+                    if not isinstance(arg, dict):
+                        continue
+                    topic, symbol, interval = arg.get("topic"), arg.get("symbol", ""), arg.get("interval")
+                    if not isinstance(symbol, str):
+                        continue
+                    if op == "subscribe":
+                        self.subscribe(client, topic, symbol, interval)
+                    elif op == "unsubscribe":
+                        self.unsubscribe(client, topic, symbol, interval)
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ /ws client error: {str(e)}")
+        finally:
+            sender.cancel()
+            self._drop_client(client)
+
+    def get_stats(self) -> Dict:
+        return {
+            "clients": len(self.clients),
+            "subscriptions": sum(len(c.subscriptions) for c in self.clients),
+            "pending_messages": sum(len(c.pending) for c in self.clients),
+            "sent": self.stats["sent_closed"] + sum(c.sent for c in self.clients),
+            "dropped_for_slow_clients": self.stats["dropped_closed"] + sum(c.dropped for c in self.clients),
+            "connections": self.stats["connections"],
+            "published": self.stats["published"],
+            "delivered": self.stats["delivered"]
+        }
@@ -0,0 +1,71 @@
+import { API_BASE_URL } from "../config";
+
+// Agrupa las peticiones de histórico hechas casi a la vez (p. ej. al abrir una
+// watchlist con 50 MiniCharts) en un solo POST /api/historical/batch.
+// El backend devuelve NDJSON: cada gráfico se resuelve en cuanto llega su línea.
+class HistoricalBatchLoader {
+  constructor(delayMs = 25) {
+    this.delayMs = delayMs;
+    this.pending = [];
+    this.timer = null;
+  }
+
+  load(symbol, interval, days, since = null) {
+    return new Promise((resolve, reject) => {
+      this.pending.push({ request: { symbol, interval, days, since }, resolve, reject, settled: false });
+      if (!this.timer) {
+        this.timer = setTimeout(() => this.flush(), this.delayMs);
+      }
+    });
+  }
+
+  async flush() {
+    const batch = this.pending;
+    this.pending = [];
+    this.timer = null;
+
+    try {
+      const res = await fetch(`${API_BASE_URL}/api/historical/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ requests: batch.map(entry => entry.request) })
+      });
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+          const line = buffer.slice(0, newline);
+          buffer = buffer.slice(newline + 1);
+          if (!line) continue;
+
+          const result = JSON.parse(line);
+          const entry = batch[result.index];
+          if (entry && !entry.settled) {
+            entry.settled = true;
+            entry.resolve(result);
+          }
+        }
+      }
+
+      batch.forEach(entry => {
+        if (!entry.settled) entry.reject(new Error('Símbolo sin respuesta en el batch'));
+      });
+    } catch (err) {
+      batch.forEach(entry => {
+        if (!entry.settled) entry.reject(err);
+      });
+    }
+  }
+}
+
+// Instancia única global
+const historicalLoader = new HistoricalBatchLoader();
+export default historicalLoader;
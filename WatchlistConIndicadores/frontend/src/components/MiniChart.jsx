@@ -2,8 +2,8 @@
 // ✅ SOLUCIÓN COMPLETA: Sincronización automática de indicadores + Detección de gaps
 
 import React, { useEffect, useRef, useState } from "react";
-import { API_BASE_URL } from "../config";
 import wsManager from "./WebSocketManager";
+import historicalLoader from "./HistoricalBatchLoader";
 import IndicatorManager from "./indicators/IndicatorManager";
 import FixedRangeProfilesManager from "./FixedRangeProfilesManager";
 import VolumeProfileFixedSettings from "./VolumeProfileFixedSettings";
@@ -481,22 +481,26 @@ const MiniChart = ({ symbol, interval, days, indicatorStates, vpConfig, vpFixedR
   
   const loadHistoricalData = async () => {
     try {
-      const timestamp = Date.now();
-      const url = `${API_BASE_URL}/api/historical/${symbol}?interval=${interval}&days=${days}&t=${timestamp}`;
+      // Con histórico ya cargado solo se piden las velas desde la última (since=)
+      const previousCandles = candlesRef.current;
+      const since = previousCandles.length > 0 ? previousCandles[previousCandles.length - 1].timestamp : null;
       
-      log.candle(symbol, `Solicitando histórico: ${days} días @ ${interval}`);
+      log.candle(symbol, since !== null
+        ? `Solicitando velas nuevas desde ${since} @ ${interval}`
+        : `Solicitando histórico: ${days} días @ ${interval}`);
       
-      const res = await fetch(url, {
-        cache: 'no-cache',
-        headers: {
-          'Cache-Control': 'no-cache',
-          'Pragma': 'no-cache'
-        }
-      });
-      const json = await res.json();
+      // Las peticiones de todos los gráficos se agrupan en /api/historical/batch
+      const json = await historicalLoader.load(symbol, interval, days, since);
       
       if (json.success && json.data && json.data.length > 0) {
         let historicalCandles = json.data;
+
+        if (since !== null) {
+          historicalCandles = previousCandles
+            .filter(c => c.timestamp < since)
+            .concat(historicalCandles)
+            .slice(-json.requested_candles);
+        }
         
         const now = Date.now();
         const lastCandle = historicalCandles[historicalCandles.length - 1];